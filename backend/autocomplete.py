@@ -0,0 +1,373 @@
+"""In-memory prefix index for search-box autocomplete.
+
+Suggestions are restaurant names, cuisine types and special titles, deduplicated
+by normalized text. Each suggestion is reachable from every word it contains:
+the index is one sorted array of ``"<text from that word on>\\0<kind>\\0<text>"``
+keys with a parallel array of suggestion records, so a lookup is a bisect plus a
+short forward scan.
+
+Ranking combines the suggestion kind, its popularity (how many restaurants use
+it plus how often it was searched) and how many of those restaurants fall in the
+caller's proximity bucket (a ~25 km grid cell). Prefixes matching at most
+DIRECT_RANK_KEYS keys are ranked per request. Wider ranges (the first
+keystrokes) keep a ``PrefixRanking``: the top RANKING_DEPTH suggestions by their
+location-independent score. The answer for a cell is ranked from those plus the
+suggestions present in that cell, found in the cell's own sorted key array, so
+only a prefix's first use scans the whole range. Answers are cached per
+(prefix, cell) until the next write.
+
+Writes update the index incrementally with ``upsert_restaurant`` /
+``remove_restaurant``; only suggestions a restaurant gains or loses touch the
+sorted arrays, and only the prefix rankings of the suggestions it touches are
+updated in place.
+"""
+import heapq
+import math
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from text_index import words
+
+KIND_WEIGHTS = {'restaurant': 1.0, 'cuisine': 0.9, 'special': 0.7}
+PROXIMITY_WEIGHT = 1.5
+PHRASE_START_BONUS = 0.5
+CELL_DEGREES = 0.25
+DIRECT_RANK_KEYS = 128
+RANKING_DEPTH = 32
+MAX_PREFIX_RANKINGS = 4096
+MAX_RANKED = 4096
+SEPARATOR = '\x00'
+MAX_CHAR = '\uffff'
+
+
+def normalize(text: str) -> str:
+    return ' '.join(words(text))
+
+
+def proximity_cell(latitude: float, longitude: float) -> Tuple[int, int]:
+    return int(math.floor(latitude / CELL_DEGREES)), int(math.floor(longitude / CELL_DEGREES))
+
+
+def suggestion_texts(restaurant: dict) -> Iterable[Tuple[str, str]]:
+    """(kind, display text) pairs a restaurant contributes"""
+    if restaurant.get('name'):
+        yield 'restaurant', restaurant['name']
+    for cuisine in restaurant.get('cuisine_type', []) or []:
+        yield 'cuisine', cuisine
+    for special in restaurant.get('specials', []) or []:
+        if special.get('is_active', True) and special.get('title'):
+            yield 'special', special['title']
+
+
+class Suggestion:
+    __slots__ = ('kind', 'text', 'normalized', 'restaurant_ids', 'cells', 'hits')
+
+    def __init__(self, kind: str, text: str, normalized: str):
+        self.kind = kind
+        self.text = text
+        self.normalized = normalized
+        self.restaurant_ids = set()
+        self.cells: Dict[Tuple[int, int], int] = {}
+        self.hits = 0
+
+    def base_score(self) -> float:
+        return KIND_WEIGHTS[self.kind] * (1.0 + math.log1p(len(self.restaurant_ids) + self.hits))
+
+    def keys(self) -> List[str]:
+        parts = self.normalized.split(' ')
+        suffix = f"{SEPARATOR}{self.kind}{SEPARATOR}{self.normalized}"
+        return list(dict.fromkeys(' '.join(parts[i:]) + suffix for i in range(len(parts))))
+
+
+def _key_text(key: str) -> str:
+    return key.split(SEPARATOR, 1)[0]
+
+
+class PrefixRanking:
+    """Top suggestions of one prefix by location-independent score.
+
+    Every suggestion of the prefix not in ``scores`` scores at most ``floor``
+    (-inf when ``scores`` holds them all), so the list answers any limit whose
+    last score is still at least the floor.
+    """
+
+    __slots__ = ('scores', 'floor')
+
+    def __init__(self, scores: Dict[Suggestion, float], floor: float):
+        self.scores = scores
+        self.floor = floor
+
+    def top(self, limit: int) -> Optional[List[Tuple[Suggestion, float]]]:
+        """The ``limit`` best suggestions, or None when the list can no longer tell"""
+        top = heapq.nlargest(limit, self.scores.items(), key=lambda item: item[1])
+        if self.floor != -math.inf and (len(top) < limit or top[-1][1] < self.floor):
+            return None
+        return top
+
+    def update(self, suggestion: Suggestion, score: Optional[float]):
+        """Apply a suggestion's new score, or its removal when ``score`` is None"""
+        if score is None:
+            self.scores.pop(suggestion, None)
+        elif suggestion in self.scores or score > self.floor:
+            self.scores[suggestion] = score
+            if len(self.scores) > 2 * RANKING_DEPTH:
+                ranked = sorted(self.scores.items(), key=lambda item: item[1], reverse=True)
+                self.scores = dict(ranked[:RANKING_DEPTH])
+                self.floor = max(self.floor, ranked[RANKING_DEPTH][1])
+
+
+class AutocompleteIndex:
+    def __init__(self):
+        self._keys: List[str] = []
+        self._refs: List[Suggestion] = []
+        self._suggestions: Dict[Tuple[str, str], Suggestion] = {}
+        # restaurant id -> (cell, suggestion keys it contributes to)
+        self._restaurants: Dict[str, Tuple[Optional[Tuple[int, int]], List[Tuple[str, str]]]] = {}
+        # cell -> sorted keys and suggestions of the suggestions present in that cell
+        self._cells: Dict[Tuple[int, int], Tuple[List[str], List[Suggestion]]] = {}
+        # prefix -> its top suggestions, for prefixes matching many keys
+        self._prefix_rankings: "OrderedDict[str, PrefixRanking]" = OrderedDict()
+        # (prefix, cell, limit) -> ranked suggestions of a wide range; cleared on writes, and
+        # per prefix when a query changes a suggestion's hits, since ranking one again from
+        # its prefix ranking costs a few milliseconds
+        self._ranked: "OrderedDict[tuple, List[Tuple[Suggestion, float]]]" = OrderedDict()
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._suggestions)
+
+    @classmethod
+    def build(cls, restaurants: Iterable[dict], version: int = 0) -> "AutocompleteIndex":
+        index = cls()
+        for restaurant in restaurants:
+            index._upsert(restaurant, insert_keys=False)
+        pairs = sorted((key, suggestion) for suggestion in index._suggestions.values()
+                       for key in suggestion.keys())
+        index._keys = [key for key, _ in pairs]
+        index._refs = [suggestion for _, suggestion in pairs]
+        by_cell = defaultdict(list)
+        for key, suggestion in pairs:
+            for cell in suggestion.cells:
+                by_cell[cell].append((key, suggestion))
+        index._cells = {cell: ([key for key, _ in cell_pairs], [suggestion for _, suggestion in cell_pairs])
+                        for cell, cell_pairs in by_cell.items()}
+        index.version = version
+        return index
+
+    def carry_hits_from(self, other: "AutocompleteIndex"):
+        """Keep search popularity across a rebuild"""
+        for key, suggestion in other._suggestions.items():
+            if suggestion.hits and key in self._suggestions:
+                self._suggestions[key].hits += suggestion.hits
+
+    # ---- writes ---------------------------------------------------------
+
+    @staticmethod
+    def _insert_keys(keys: List[str], refs: List[Suggestion], suggestion: Suggestion):
+        for key in suggestion.keys():
+            position = bisect_left(keys, key)
+            keys.insert(position, key)
+            refs.insert(position, suggestion)
+
+    @staticmethod
+    def _delete_keys(keys: List[str], refs: List[Suggestion], suggestion: Suggestion):
+        for key in suggestion.keys():
+            position = bisect_left(keys, key)
+            if position < len(keys) and keys[position] == key:
+                del keys[position]
+                del refs[position]
+
+    def _touch(self, suggestion: Suggestion, removed: bool = False):
+        """Update the prefix rankings a suggestion appears in after its score changed"""
+        if not self._prefix_rankings:
+            return
+        for key in suggestion.keys():
+            text = _key_text(key)
+            for end in range(1, len(text) + 1):
+                prefix = text[:end]
+                ranking = self._prefix_rankings.get(prefix)
+                if ranking is not None:
+                    ranking.update(suggestion, None if removed else self._static_score(suggestion, prefix))
+
+    def _attach(self, key: Tuple[str, str], text: str, restaurant_id: str, cell, insert_keys: bool):
+        suggestion = self._suggestions.get(key)
+        if suggestion is None:
+            suggestion = self._suggestions[key] = Suggestion(key[0], text, key[1])
+            if insert_keys:
+                self._insert_keys(self._keys, self._refs, suggestion)
+        suggestion.restaurant_ids.add(restaurant_id)
+        if cell is not None:
+            suggestion.cells[cell] = suggestion.cells.get(cell, 0) + 1
+            if insert_keys and suggestion.cells[cell] == 1:
+                self._insert_keys(*self._cells.setdefault(cell, ([], [])), suggestion)
+        if insert_keys:
+            self._touch(suggestion)
+
+    def _detach(self, key: Tuple[str, str], restaurant_id: str, cell):
+        suggestion = self._suggestions.get(key)
+        if suggestion is None:
+            return
+        suggestion.restaurant_ids.discard(restaurant_id)
+        if cell is not None and cell in suggestion.cells:
+            suggestion.cells[cell] -= 1
+            if suggestion.cells[cell] <= 0:
+                del suggestion.cells[cell]
+                if cell in self._cells:
+                    self._delete_keys(*self._cells[cell], suggestion)
+        if not suggestion.restaurant_ids:
+            self._delete_keys(self._keys, self._refs, suggestion)
+            del self._suggestions[key]
+        self._touch(suggestion, removed=not suggestion.restaurant_ids)
+
+    def _upsert(self, restaurant: dict, insert_keys: bool):
+        restaurant_id = restaurant.get('id')
+        if not restaurant_id:
+            return
+        location = restaurant.get('location') or {}
+        cell = None
+        if location.get('latitude') is not None and location.get('longitude') is not None:
+            cell = proximity_cell(location['latitude'], location['longitude'])
+        texts = {}
+        for kind, text in suggestion_texts(restaurant):
+            normalized = normalize(text)
+            if normalized:
+                texts.setdefault((kind, normalized), text)
+
+        old_cell, old_keys = self._restaurants.get(restaurant_id, (None, []))
+        # Only suggestions the restaurant gained or lost touch the sorted key arrays
+        for key in old_keys:
+            if key not in texts or old_cell != cell:
+                self._detach(key, restaurant_id, old_cell)
+        for key, text in texts.items():
+            if key not in old_keys or old_cell != cell:
+                self._attach(key, text, restaurant_id, cell, insert_keys)
+        self._restaurants[restaurant_id] = (cell, list(texts))
+
+    def upsert_restaurant(self, restaurant: dict):
+        """Apply a restaurant's current name, cuisines and specials after a write"""
+        self._upsert(restaurant, insert_keys=True)
+        self._ranked.clear()
+
+    def remove_restaurant(self, restaurant_id: str):
+        previous = self._restaurants.pop(restaurant_id, None)
+        if previous is None:
+            return
+        cell, keys = previous
+        for key in keys:
+            self._detach(key, restaurant_id, cell)
+        self._ranked.clear()
+
+    def record_query(self, query: str):
+        """Count a search for an exact suggestion text towards its popularity"""
+        normalized = normalize(query)
+        for kind in KIND_WEIGHTS:
+            suggestion = self._suggestions.get((kind, normalized))
+            if suggestion is not None:
+                suggestion.hits += 1
+                self._touch(suggestion)
+                self._forget_ranked(suggestion)
+
+    def _forget_ranked(self, suggestion: Suggestion):
+        """Drop the cached rankings of the prefixes a suggestion appears under"""
+        if not self._ranked:
+            return
+        prefixes = {text[:end] for text in map(_key_text, suggestion.keys()) for end in range(1, len(text) + 1)}
+        for cache_key in [cache_key for cache_key in self._ranked if cache_key[0] in prefixes]:
+            del self._ranked[cache_key]
+
+    # ---- reads ----------------------------------------------------------
+
+    @staticmethod
+    def _static_score(suggestion: Suggestion, prefix: str) -> float:
+        score = suggestion.base_score()
+        if suggestion.normalized.startswith(prefix):
+            score += PHRASE_START_BONUS
+        return score
+
+    @staticmethod
+    def _score(suggestion: Suggestion, static_score: float, cell) -> float:
+        if cell is None:
+            return static_score
+        return static_score + PROXIMITY_WEIGHT * math.log1p(suggestion.cells.get(cell, 0))
+
+    def _rank(self, prefix: str, start: int, end: int, cell, limit: int) -> List[Tuple[Suggestion, float]]:
+        scored = []
+        for suggestion in dict.fromkeys(self._refs[start:end]):
+            score = suggestion.base_score()
+            if suggestion.normalized.startswith(prefix):
+                score += PHRASE_START_BONUS
+            if cell is not None:
+                score += PROXIMITY_WEIGHT * math.log1p(suggestion.cells.get(cell, 0))
+            scored.append((suggestion, score))
+        return heapq.nlargest(limit, scored, key=lambda item: item[1])
+
+    def _prefix_ranking(self, prefix: str, start: int, end: int) -> PrefixRanking:
+        ranked = self._rank(prefix, start, end, None, RANKING_DEPTH + 1)
+        floor = ranked.pop()[1] if len(ranked) > RANKING_DEPTH else -math.inf
+        ranking = self._prefix_rankings[prefix] = PrefixRanking(dict(ranked), floor)
+        if len(self._prefix_rankings) > MAX_PREFIX_RANKINGS:
+            self._prefix_rankings.popitem(last=False)
+        return ranking
+
+    def _rank_wide(self, prefix: str, start: int, end: int, cell, limit: int) -> List[Tuple[Suggestion, float]]:
+        """Rank a wide range from the prefix's top suggestions and the suggestions in the caller's cell.
+
+        A suggestion outside the cell scores its static score, so if it is not among the
+        ``limit`` best static scores, ``limit`` others outrank it.
+        """
+        ranking = self._prefix_rankings.get(prefix)
+        top = ranking.top(limit) if ranking is not None else None
+        if top is None:
+            # First use of the prefix, or removals emptied the list below the floor
+            top = self._prefix_ranking(prefix, start, end).top(limit)
+        else:
+            self._prefix_rankings.move_to_end(prefix)
+        candidates = dict(top)
+        if cell in self._cells:
+            keys, refs = self._cells[cell]
+            position = bisect_left(keys, prefix)
+            cell_end = bisect_left(keys, prefix + MAX_CHAR, lo=position)
+            for suggestion in refs[position:cell_end]:
+                if suggestion not in candidates:
+                    candidates[suggestion] = self._static_score(suggestion, prefix)
+        scored = ((suggestion, self._score(suggestion, static_score, cell))
+                  for suggestion, static_score in candidates.items())
+        return heapq.nlargest(limit, scored, key=lambda item: item[1])
+
+    def suggest(self, text: str, latitude: Optional[float] = None, longitude: Optional[float] = None,
+                limit: int = 8) -> List[dict]:
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        cell = proximity_cell(latitude, longitude) if latitude is not None and longitude is not None else None
+
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + MAX_CHAR, lo=start)
+        if start == end:
+            return []
+        if end - start <= DIRECT_RANK_KEYS or limit > RANKING_DEPTH:
+            ranked = self._rank(prefix, start, end, cell, limit)
+        else:
+            cache_key = (prefix, cell, limit)
+            ranked = self._ranked.get(cache_key)
+            if ranked is None:
+                ranked = self._ranked[cache_key] = self._rank_wide(prefix, start, end, cell, limit)
+                if len(self._ranked) > MAX_RANKED:
+                    self._ranked.popitem(last=False)
+            else:
+                self._ranked.move_to_end(cache_key)
+
+        results = []
+        for suggestion, score in ranked:
+            result = {
+                "text": suggestion.text,
+                "kind": suggestion.kind,
+                "restaurant_count": len(suggestion.restaurant_ids),
+                "nearby_count": suggestion.cells.get(cell, 0) if cell is not None else None,
+                "score": round(score, 3),
+            }
+            if suggestion.kind == 'restaurant' and len(suggestion.restaurant_ids) == 1:
+                result["restaurant_id"] = next(iter(suggestion.restaurant_ids))
+            results.append(result)
+        return results
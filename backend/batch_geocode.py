@@ -0,0 +1,111 @@
+"""Batch geocoding for bulk jobs such as owner onboarding imports.
+
+A batch is deduplicated on the normalized address (``geocode_cache.normalize_address``)
+so each distinct address is resolved once. Place names known to the offline
+gazetteer are answered first, then cached results are read in one query. The
+remaining addresses are resolved concurrently, with two limits:
+
+* at most BATCH_GEOCODE_CONCURRENCY Google calls at a time;
+* a per-worker budget of BATCH_GEOCODE_BUDGET_PER_MINUTE calls, shared by all
+  batches.
+
+An address that cannot get budget within BATCH_GEOCODE_MAX_WAIT_SECONDS is
+reported as ``rate_limited``, so the client can retry it later.
+
+Results come back in request order with a per-item ``status``:
+
+* ``ok``, with the ``source`` of the result (gazetteer, cache or google);
+* ``not_found``;
+* ``invalid``;
+* ``rate_limited``;
+* ``unavailable``, when the geocoding circuit breaker is open;
+* ``error``.
+"""
+import asyncio
+import logging
+import os
+from collections import Counter
+from time import monotonic
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from geocode_cache import normalize_address
+from warming import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_ADDRESSES = int(os.environ.get('BATCH_GEOCODE_MAX_ADDRESSES', '500'))
+
+OK = 'ok'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+RATE_LIMITED = 'rate_limited'
+UNAVAILABLE = 'unavailable'
+ERROR = 'error'
+
+
+class BatchGeocoder:
+    def __init__(self, resolve: Callable[[str], Awaitable[Optional[dict]]]):
+        self.resolve = resolve
+        self.concurrency = int(os.environ.get('BATCH_GEOCODE_CONCURRENCY', '8'))
+        self.budget = TokenBucket(float(os.environ.get('BATCH_GEOCODE_BUDGET_PER_MINUTE', '300')))
+        self.max_wait = float(os.environ.get('BATCH_GEOCODE_MAX_WAIT_SECONDS', '10'))
+
+    async def _acquire_budget(self, deadline: float) -> bool:
+        while not self.budget.try_acquire():
+            wait = self.budget.seconds_until_available()
+            if monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+        return True
+
+    async def _resolve_one(self, address: str, slots: asyncio.Semaphore, deadline: float) -> Tuple[str, Optional[dict]]:
+        async with slots:
+            if not await self._acquire_budget(deadline):
+                return RATE_LIMITED, None
+            try:
+                result = await self.resolve(address)
+            except Exception as e:
+                # resolve raises HTTPException(503) while the circuit breaker is open
+                if getattr(e, 'status_code', None) == 503:
+                    return UNAVAILABLE, None
+                logger.warning(f"Batch geocoding failed for '{address}': {e}")
+                return ERROR, None
+        return (OK, result) if result is not None else (NOT_FOUND, None)
+
+    async def geocode(self, addresses: List[str], cached: Dict[str, dict]) -> Tuple[List[dict], Dict[str, dict]]:
+        """Per-address results in request order, and the newly resolved address -> result to cache.
+
+        ``cached`` maps normalized address keys to known results; one with its own
+        ``source`` (e.g. a gazetteer match) keeps it.
+        """
+        first_address: Dict[str, str] = {}
+        for address in addresses:
+            key = normalize_address(address)
+            if key and key not in cached:
+                first_address.setdefault(key, address)
+
+        slots = asyncio.Semaphore(self.concurrency)
+        deadline = monotonic() + self.max_wait
+        outcomes = await asyncio.gather(*(self._resolve_one(address, slots, deadline)
+                                          for address in first_address.values()))
+        resolved = dict(zip(first_address, outcomes))
+
+        results = []
+        for address in addresses:
+            key = normalize_address(address)
+            if not key:
+                results.append({"address": address, "status": INVALID})
+            elif key in cached:
+                results.append({"address": address, "status": OK, "source": "cache", **cached[key]})
+            else:
+                status, result = resolved[key]
+                item = {"address": address, "status": status}
+                if result is not None:
+                    item.update(source="google", **result)
+                results.append(item)
+        fetched = {first_address[key]: result for key, (status, result) in resolved.items() if result is not None}
+        return results, fetched
+
+
+def summarize(results: List[dict]) -> Dict[str, int]:
+    return dict(Counter(result['status'] for result in results))
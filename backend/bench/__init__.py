@@ -0,0 +1,4 @@
+"""Microbenchmarks with regression gates for hot server helpers.
+
+Run from the backend directory:  python -m bench.run --help
+"""
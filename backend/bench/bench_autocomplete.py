@@ -0,0 +1,112 @@
+"""Benchmarks for the autocomplete prefix index at 100k suggestions."""
+import random
+
+from autocomplete import AutocompleteIndex
+from bench.registry import benchmark
+from loadtest.synthetic import METRO_CENTERS, NAME_PREFIXES, NAME_SUFFIXES, random_point, synthetic_special
+
+ENTRIES = 100_000
+SYLLABLES = ["ka", "lo", "mi", "ra", "zen", "tor", "bel", "sa", "vi", "qu", "an", "do", "ri", "ne", "po"]
+
+_index = None
+
+
+def _word(rng: random.Random) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def _restaurants(count: int, seed: int = 11):
+    rng = random.Random(seed)
+    for i in range(count):
+        _, latitude, longitude = rng.choice(METRO_CENTERS)
+        latitude, longitude = random_point(rng, latitude, longitude, 30000)
+        yield {
+            "id": f"r{i}",
+            # Unique names so the index really holds ~100k restaurant suggestions
+            "name": f"{rng.choice(NAME_PREFIXES)} {_word(rng)} {rng.choice(NAME_SUFFIXES)} {i}",
+            "cuisine_type": [],
+            "location": {"latitude": latitude, "longitude": longitude},
+            "specials": [synthetic_special(rng) for _ in range(rng.randint(0, 2))],
+        }
+
+
+def autocomplete_index() -> AutocompleteIndex:
+    global _index
+    if _index is None:
+        _index = AutocompleteIndex.build(_restaurants(ENTRIES))
+    return _index
+
+
+def _bench_restaurant(title: str) -> dict:
+    return {
+        "id": "bench-upsert",
+        "name": "Benchmark Bistro",
+        "cuisine_type": ["Bench"],
+        "location": {"latitude": 37.7749, "longitude": -122.4194},
+        "specials": [{"title": title, "is_active": True}],
+    }
+
+
+@benchmark("autocomplete/100k/one_letter")
+def _():
+    index = autocomplete_index()
+    index.suggest("t", 37.7749, -122.4194)
+    return lambda: index.suggest("t", 37.7749, -122.4194)
+
+
+@benchmark("autocomplete/100k/one_letter_after_write")
+def _():
+    index = autocomplete_index()
+    index.suggest("t", 37.7749, -122.4194)
+    versions = [_bench_restaurant(title) for title in ("Tavern Hour", "Taco Tuesday")]
+    state = {"i": 0}
+
+    def run():
+        # The first keystroke after a write touching suggestions under "t"
+        state["i"] ^= 1
+        index.upsert_restaurant(versions[state["i"]])
+        return index.suggest("t", 37.7749, -122.4194)
+    return run
+
+
+@benchmark("autocomplete/100k/one_letter_cold")
+def _():
+    index = autocomplete_index()
+
+    def run():
+        # First use of the prefix: ranks the whole range once
+        index._prefix_rankings.clear()
+        index._ranked.clear()
+        return index.suggest("t", 37.7749, -122.4194)
+    return run
+
+
+@benchmark("autocomplete/100k/three_letters")
+def _():
+    index = autocomplete_index()
+    return lambda: index.suggest("tav", 37.7749, -122.4194)
+
+
+@benchmark("autocomplete/100k/two_words")
+def _():
+    index = autocomplete_index()
+    return lambda: index.suggest("golden ka", 37.7749, -122.4194)
+
+
+@benchmark("autocomplete/100k/no_match")
+def _():
+    index = autocomplete_index()
+    return lambda: index.suggest("xyzzy")
+
+
+@benchmark("autocomplete/100k/upsert_restaurant")
+def _():
+    index = autocomplete_index()
+    # Alternate the special title so every upsert removes one suggestion and adds another
+    versions = [_bench_restaurant(title) for title in ("Benchmark Hour", "Benchmark Brunch")]
+    state = {"i": 0}
+
+    def run():
+        state["i"] ^= 1
+        index.upsert_restaurant(versions[state["i"]])
+    return run
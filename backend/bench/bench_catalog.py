@@ -0,0 +1,45 @@
+"""Benchmarks for selecting a search page from the compact catalog at 100k restaurants."""
+from datetime import datetime
+
+from bench.registry import benchmark
+from compact_catalog import CompactCatalog
+from loadtest.synthetic import synthetic_catalog
+from map_clusters import cluster_tile, tile_coordinates
+from ranking import SORTS
+
+RESTAURANTS = 100_000
+FRIDAY_5_30PM = datetime(2026, 10, 23, 17, 30)
+
+_catalog = None
+
+
+def compact_catalog() -> CompactCatalog:
+    global _catalog
+    if _catalog is None:
+        _catalog = CompactCatalog.build(synthetic_catalog(RESTAURANTS))
+    return _catalog
+
+
+@benchmark("compact_catalog/100k/page_active_now")
+def _():
+    catalog = compact_catalog()
+    return lambda: catalog.nearest(37.7749, -122.4194, 8047, FRIDAY_5_30PM)
+
+
+@benchmark("compact_catalog/100k/page_happy_hour")
+def _():
+    catalog = compact_catalog()
+    return lambda: catalog.nearest(37.7749, -122.4194, 8047, FRIDAY_5_30PM, "happy_hour")
+
+
+@benchmark("compact_catalog/100k/page_recommended")
+def _():
+    catalog = compact_catalog()
+    return lambda: catalog.nearest(37.7749, -122.4194, 8047, FRIDAY_5_30PM, scorer=SORTS['recommended'])
+
+
+@benchmark("map_clusters/100k/zoom10_tile")
+def _():
+    catalog = compact_catalog()
+    x, y = (int(value) for value in tile_coordinates(37.7749, -122.4194, 10))
+    return lambda: cluster_tile(catalog, 10, x, y, FRIDAY_5_30PM)
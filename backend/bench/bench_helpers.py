@@ -0,0 +1,121 @@
+"""Benchmarks for the per-request helpers in server.py."""
+import random
+from datetime import datetime, timezone
+
+from bench.registry import benchmark
+from facets import count_facets
+from gazetteer import get_gazetteer
+from loadtest.synthetic import synthetic_catalog, synthetic_restaurant
+from server import (
+    SpecialType,
+    calculate_distance,
+    create_access_token,
+    is_special_active_now,
+    prepare_for_mongo,
+    prepare_from_mongo,
+    verify_token,
+)
+
+SPECIAL_COUNTS = [1, 10, 50, 200]
+
+
+def restaurant_with_specials(count: int, seed: int = 7) -> dict:
+    return synthetic_restaurant(random.Random(seed), specials=count)
+
+
+def nested_document(depth: int, fanout: int) -> dict:
+    """A document nested ``depth`` levels deep with ``fanout`` children per level"""
+    if depth == 0:
+        return {"value": 1.5, "label": "leaf", "at": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+    return {
+        "_id": f"node-{depth}",
+        "children": [nested_document(depth - 1, fanout) for _ in range(fanout)],
+        "meta": {"depth": depth, "tags": ["a", "b", "c"]},
+    }
+
+
+@benchmark("calculate_distance/single")
+def _():
+    return lambda: calculate_distance(37.7749, -122.4194, 37.8044, -122.2712)
+
+
+@benchmark("calculate_distance/1000_points")
+def _():
+    rng = random.Random(1)
+    points = [(37.7 + rng.random() * 0.2, -122.5 + rng.random() * 0.2) for _ in range(1000)]
+
+    def run():
+        for lat, lon in points:
+            calculate_distance(37.7749, -122.4194, lat, lon)
+    return run
+
+
+for _count in SPECIAL_COUNTS:
+    @benchmark(f"is_special_active_now/{_count}_specials")
+    def _(count=_count):
+        specials = restaurant_with_specials(count)["specials"]
+
+        def run():
+            for special in specials:
+                is_special_active_now(special)
+        return run
+
+    @benchmark(f"prepare_from_mongo/{_count}_specials")
+    def _(count=_count):
+        document = restaurant_with_specials(count)
+        document["_id"] = "5f1d7c0e9b1e8a3d4c2b1a00"
+        return lambda: prepare_from_mongo(document)
+
+    @benchmark(f"prepare_for_mongo/{_count}_specials")
+    def _(count=_count):
+        document = restaurant_with_specials(count)
+        for special in document["specials"]:
+            special["created_at"] = datetime.now(timezone.utc)
+        return lambda: prepare_for_mongo(document)
+
+
+@benchmark("count_facets/1000_restaurants")
+def _():
+    restaurants = list(synthetic_catalog(1000))
+    special_types = [special_type.value for special_type in SpecialType]
+
+    def run():
+        now = datetime.now()
+        count_facets(restaurants, special_types, lambda special: is_special_active_now(special, now))
+    return run
+
+
+@benchmark("gazetteer/exact")
+def _():
+    gazetteer = get_gazetteer()
+    return lambda: gazetteer.geocode("Mission District, San Francisco, CA")
+
+
+@benchmark("gazetteer/misspelled")
+def _():
+    gazetteer = get_gazetteer()
+    return lambda: gazetteer.geocode("Sacremento")
+
+
+@benchmark("prepare_from_mongo/nested_depth6_fanout4")
+def _():
+    document = nested_document(6, 4)
+    return lambda: prepare_from_mongo(document)
+
+
+@benchmark("prepare_for_mongo/nested_depth6_fanout4")
+def _():
+    document = nested_document(6, 4)
+    return lambda: prepare_for_mongo(document)
+
+
+@benchmark("create_access_token")
+def _():
+    claims = {"user_id": "0b9f4c1e-3a52-4c1e-9a0b-2f4d1c3e5a6b", "email": "user@example.com", "user_type": "user"}
+    return lambda: create_access_token(claims)
+
+
+@benchmark("verify_token")
+def _():
+    token = create_access_token({"user_id": "0b9f4c1e", "email": "user@example.com", "user_type": "user"})
+    return lambda: verify_token(token)
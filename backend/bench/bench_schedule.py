@@ -0,0 +1,33 @@
+"""Benchmarks for the weekly special-window index at 100k restaurants."""
+from itertools import islice
+
+from bench.registry import benchmark
+from loadtest.synthetic import synthetic_catalog
+from schedule_index import DAY_MINUTES, ScheduleIndex
+
+RESTAURANTS = 100_000
+FRIDAY_5PM = 4 * DAY_MINUTES + 17 * 60
+SUNDAY_11PM = 6 * DAY_MINUTES + 23 * 60
+
+_index = None
+
+
+def schedule_index() -> ScheduleIndex:
+    global _index
+    if _index is None:
+        _index = ScheduleIndex.build(synthetic_catalog(RESTAURANTS))
+    return _index
+
+
+@benchmark("special_windows/100k/first_20_next_2h")
+def _():
+    index = schedule_index()
+    return lambda: list(islice(index.overlapping(37.7749, -122.4194, 8047, FRIDAY_5PM, FRIDAY_5PM + 120), 20))
+
+
+@benchmark("special_windows/100k/first_20_next_24h_over_week_boundary")
+def _():
+    index = schedule_index()
+    return lambda: list(islice(
+        index.overlapping(37.7749, -122.4194, 8047, SUNDAY_11PM, SUNDAY_11PM + DAY_MINUTES), 20))
+
@@ -0,0 +1,22 @@
+"""Benchmark case registry.
+
+A case is a zero-argument callable returned by a setup function, so expensive
+fixture construction is not timed. Register cases with ``@benchmark``:
+
+    @benchmark("calculate_distance/single")
+    def _():
+        return lambda: calculate_distance(37.77, -122.41, 37.80, -122.27)
+"""
+from typing import Callable, Dict
+
+CASES: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    """Register a setup function that returns the callable to time"""
+    def decorator(setup: Callable[[], Callable[[], object]]):
+        if name in CASES:
+            raise ValueError(f"Duplicate benchmark case: {name}")
+        CASES[name] = setup
+        return setup
+    return decorator
@@ -0,0 +1,175 @@
+"""Run the microbenchmarks and gate on regressions against stored baselines.
+
+    python -m bench.run                     # run and compare with bench/baseline.json
+    python -m bench.run --save              # record a new baseline
+    python -m bench.run -k prepare_         # only cases whose name contains the filter
+    python -m bench.run --threshold 0.25    # allow 25% slowdown before failing
+
+Each case is timed REPEATS times in each of several interleaved rounds. Its
+result is the median time per call over all repeats, with its spread: the
+median absolute deviation, relative to the median. A case fails when its
+median is slower than the baseline by more than the threshold plus
+NOISE_FACTOR times the larger spread, so noisy cases need a larger slowdown to
+fail.
+
+Baselines hold raw times and only compare on the machine and Python version
+that recorded them. Anywhere else the run reports the changes but does not
+fail; record a local baseline with --save first.
+"""
+import argparse
+import gc
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from statistics import median
+from typing import Callable, Dict, List, Optional, Tuple
+
+# server.py reads these at import time; the benchmarks never touch the database
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'on_the_cheap_bench')
+
+from bench.registry import CASES  # noqa: E402
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+BENCH_MODULES = ["bench.bench_helpers", "bench.bench_autocomplete", "bench.bench_schedule", "bench.bench_catalog"]
+
+TARGET_REPEAT_SECONDS = 0.02
+REPEATS = 7
+NOISE_FACTOR = 3.0
+
+
+def load_cases():
+    for module in BENCH_MODULES:
+        importlib.import_module(module)
+
+
+def measure(func: Callable[[], object], repeats: int = REPEATS) -> List[float]:
+    """Nanoseconds per call of each repeat, auto-ranging the inner loop count"""
+    number = 1
+    while True:
+        started = time.perf_counter_ns()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter_ns() - started
+        if elapsed >= TARGET_REPEAT_SECONDS * 1e9 or number >= 1 << 20:
+            break
+        number *= 2
+
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            started = time.perf_counter_ns()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter_ns() - started) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return samples
+
+
+def summarize(samples: List[float]) -> Tuple[float, float]:
+    """Median of the samples and their median absolute deviation relative to it"""
+    middle = median(samples)
+    return middle, median(abs(sample - middle) for sample in samples) / middle
+
+
+def run_cases(name_filter: Optional[str] = None, rounds: int = 3) -> Dict[str, Tuple[float, float]]:
+    """Median time per call and relative spread of each case, over several interleaved rounds.
+
+    Interleaving spreads transient machine noise across cases instead of
+    letting one busy second inflate a single case.
+    """
+    selected = {name: setup() for name, setup in sorted(CASES.items())
+                if not name_filter or name_filter in name}
+    samples: Dict[str, List[float]] = {name: [] for name in selected}
+    for _ in range(rounds):
+        for name, func in selected.items():
+            samples[name].extend(measure(func))
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+def format_ns(value: float) -> str:
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if value >= scale:
+            return f"{value / scale:.2f}{unit}"
+    return f"{value:.0f}ns"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=float(os.environ.get("BENCH_THRESHOLD", "0.20")),
+                        help="allowed relative slowdown before failing (default 0.20)")
+    parser.add_argument("--rounds", type=int, default=3, help="interleaved rounds, all repeats feed the median")
+    parser.add_argument("-k", dest="name_filter", help="only run cases containing this substring")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    load_cases()
+    results = run_cases(args.name_filter, args.rounds)
+
+    baseline, comparable = {}, True
+    if args.baseline.exists() and not args.save:
+        stored = json.loads(args.baseline.read_text())
+        baseline = stored.get("cases", {})
+        recorded_on = (stored.get("python"), stored.get("machine"))
+        comparable = recorded_on == (platform.python_version(), platform.machine())
+        if not comparable:
+            print(f"Baseline was recorded on Python {recorded_on[0]} / {recorded_on[1]}; "
+                  f"reporting changes without failing (record a local one with --save)\n")
+
+    regressions = []
+    print(f"{'case':48} {'median':>10} {'spread':>7} {'vs baseline':>12}")
+    for name, (value, spread) in results.items():
+        line = f"{name:48} {format_ns(value):>10} {spread:>7.1%}"
+        previous = baseline.get(name)
+        if isinstance(previous, dict):
+            change = value / previous["median_ns"] - 1
+            allowed = args.threshold + NOISE_FACTOR * max(spread, previous.get("spread", 0.0))
+            line += f" {change:>+11.1%}"
+            if change > allowed:
+                line += f"  REGRESSION (allowed {allowed:+.0%})"
+                if comparable:
+                    regressions.append((name, change, allowed))
+        elif baseline:
+            line += f" {'new':>12}"
+        print(line)
+
+    payload = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cases": {name: {"median_ns": round(value, 1), "spread": round(spread, 4)}
+                  for name, (value, spread) in results.items()},
+    }
+    if args.json:
+        args.json.write_text(json.dumps(payload, indent=2))
+
+    if args.save:
+        if args.name_filter and args.baseline.exists():
+            # Partial runs only update the cases they measured
+            existing = json.loads(args.baseline.read_text())
+            existing["cases"].update(payload["cases"])
+            payload["cases"] = dict(sorted(existing["cases"].items()))
+        args.baseline.write_text(json.dumps(payload, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed beyond their noise-adjusted threshold:")
+        for name, change, allowed in regressions:
+            print(f"  {name}: {change:+.1%} (allowed {allowed:+.0%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
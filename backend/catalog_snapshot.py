@@ -0,0 +1,409 @@
+"""Read-only restaurant catalog snapshot shared by every worker process.
+
+The snapshot is one file (on /dev/shm when available) that each worker mmaps,
+so the pages are shared through the OS page cache instead of being copied into
+every process. A small pointer file holds the current catalog version; writers
+publish a new file and bump the pointer, readers notice the change and remap.
+
+File layout:
+    header  : magic, format version, catalog version, record count
+    index   : one fixed-width (latitude, longitude, offset, length) entry per restaurant
+    payload : JSON-encoded restaurant documents
+
+Searches scan the fixed-width index straight out of the shared pages and only
+decode the JSON of restaurants that fall inside the search bounding box. Text
+queries first resolve to snapshot positions through a per-process inverted
+index (see text_index.py), so only matching restaurants are looked at; upcoming
+specials queries do the same through a weekly interval index (schedule_index.py).
+Searches select their page from a per-process struct-of-arrays copy of the
+fields they filter on (compact_catalog.py) and decode only that page. Each
+mapped version is a ``SnapshotView`` that owns those indexes; a request pins one
+view, so every step of it reads the same version.
+"""
+import fcntl
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from compact_catalog import CompactCatalog
+from ranking import Signals
+from schedule_index import ScheduleIndex, Window
+from text_index import TextIndex
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"OTCS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHQI")
+INDEX_ENTRY = struct.Struct("<ddQI")
+METERS_PER_DEGREE = 111320.0
+
+POINTER_FILE = "catalog.current"
+LOCK_FILE = "catalog.lock"
+# Set by the gunicorn master to when it started publishing; workers reuse snapshots published since
+FRESH_SINCE_ENV = 'CATALOG_SNAPSHOT_FRESH_SINCE'
+PROCESS_STARTED = time.time()
+
+
+def snapshot_enabled() -> bool:
+    """Whether searches should read from the shared snapshot"""
+    return os.environ.get('CATALOG_SNAPSHOT', 'true').lower() in ('1', 'true', 'yes')
+
+
+def snapshot_dir() -> Path:
+    """Directory holding the snapshot files (shared memory when available)"""
+    configured = os.environ.get('CATALOG_SNAPSHOT_DIR')
+    if configured:
+        path = Path(configured)
+    elif os.path.isdir('/dev/shm'):
+        path = Path('/dev/shm') / 'on-the-cheap'
+    else:
+        path = Path(tempfile.gettempdir()) / 'on-the-cheap'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+@contextmanager
+def snapshot_lock(directory: Optional[Path] = None):
+    """Exclusive cross-process lock serializing snapshot builds"""
+    directory = directory or snapshot_dir()
+    with open(directory / LOCK_FILE, 'a+') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def read_current_version(directory: Optional[Path] = None) -> int:
+    """Return the published catalog version, or 0 if nothing is published"""
+    directory = directory or snapshot_dir()
+    try:
+        return int((directory / POINTER_FILE).read_text().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def published_this_run(directory: Optional[Path] = None) -> bool:
+    """Whether the current snapshot was published by this deployment rather than left by an earlier one.
+
+    That is, since the gunicorn master started publishing (CATALOG_SNAPSHOT_FRESH_SINCE),
+    or without a master, since this process started.
+    """
+    directory = directory or snapshot_dir()
+    try:
+        published_at = os.stat(directory / POINTER_FILE).st_mtime
+    except FileNotFoundError:
+        return False
+    fresh_since = float(os.environ.get(FRESH_SINCE_ENV) or PROCESS_STARTED)
+    return read_current_version(directory) > 0 and published_at >= fresh_since
+
+
+def _snapshot_path(directory: Path, version: int) -> Path:
+    return directory / f"catalog-{version}.bin"
+
+
+def encode_snapshot(restaurants: Iterable[dict], version: int) -> bytes:
+    """Serialize restaurants into the snapshot file format"""
+    index = []
+    blobs = []
+    offset = 0
+    for restaurant in restaurants:
+        location = restaurant.get('location') or {}
+        blob = json.dumps(restaurant, default=str, separators=(',', ':')).encode()
+        index.append((
+            float(location.get('latitude', 0) or 0),
+            float(location.get('longitude', 0) or 0),
+            offset,
+            len(blob)
+        ))
+        blobs.append(blob)
+        offset += len(blob)
+
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, version, len(index))]
+    parts.extend(INDEX_ENTRY.pack(*entry) for entry in index)
+    parts.extend(blobs)
+    return b"".join(parts)
+
+
+def write_snapshot(restaurants: Iterable[dict], directory: Optional[Path] = None) -> int:
+    """Publish a new snapshot and return its version.
+
+    Callers must hold ``snapshot_lock`` so concurrent builders cannot hand out
+    the same version number.
+    """
+    directory = directory or snapshot_dir()
+    version = read_current_version(directory) + 1
+    data = encode_snapshot(restaurants, version)
+
+    target = _snapshot_path(directory, version)
+    tmp_target = target.with_suffix('.tmp')
+    tmp_target.write_bytes(data)
+    os.replace(tmp_target, target)
+
+    pointer_tmp = directory / f"{POINTER_FILE}.tmp"
+    pointer_tmp.write_text(str(version))
+    os.replace(pointer_tmp, directory / POINTER_FILE)
+
+    # The previous version stays on disk for readers that read the old pointer but have not
+    # opened its file yet; readers that still map an older file keep it alive until they remap
+    keep = {target, _snapshot_path(directory, version - 1)}
+    for old in directory.glob("catalog-*.bin"):
+        if old not in keep:
+            try:
+                old.unlink()
+            except FileNotFoundError:
+                pass
+
+    logger.info(f"Published catalog snapshot v{version} ({len(data)} bytes)")
+    return version
+
+
+def build_snapshot_sync(mongo_url: str, db_name: str) -> int:
+    """Build the snapshot from MongoDB with a blocking client.
+
+    Used by the gunicorn master so the catalog is read once, before any
+    worker is forked.
+    """
+    from pymongo import MongoClient
+
+    mongo = MongoClient(mongo_url)
+    try:
+        with snapshot_lock():
+            restaurants = mongo[db_name].restaurants.find({}, {'_id': 0})
+            return write_snapshot(restaurants)
+    finally:
+        mongo.close()
+
+
+class SnapshotView:
+    """One mapped snapshot version and the per-process indexes built from it.
+
+    A view never changes once loaded, so a request that pins one (see
+    ``CatalogSnapshot.current``) reads positions, indexes and restaurants of a
+    single version even while a newer version is mapped concurrently. Indexes
+    are built on first use from a streaming decode of the snapshot.
+    """
+
+    def __init__(self, mapped: mmap.mmap, version: int, count: int):
+        self._map = mapped
+        self.version = version
+        self._count = count
+        self._payload_start = HEADER.size + INDEX_ENTRY.size * count
+        self._lock = threading.Lock()
+        self._text_index: Optional[TextIndex] = None
+        self._schedule_index: Optional[ScheduleIndex] = None
+        self._compact: Optional[CompactCatalog] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def restaurants(self) -> Iterator[dict]:
+        """Decode the restaurants one at a time, in position order"""
+        mapped, payload_start = self._map, self._payload_start
+        index = memoryview(mapped)[HEADER.size:payload_start]
+        try:
+            for _, _, offset, length in INDEX_ENTRY.iter_unpack(index):
+                start = payload_start + offset
+                yield json.loads(mapped[start:start + length])
+        finally:
+            index.release()
+
+    def all(self) -> List[dict]:
+        """Decode every restaurant in the snapshot"""
+        return list(self.restaurants())
+
+    def restaurant_at(self, position: int) -> Optional[dict]:
+        """Decode the restaurant at one snapshot position"""
+        if not 0 <= position < self._count:
+            return None
+        _, _, offset, length = INDEX_ENTRY.unpack_from(self._map, HEADER.size + INDEX_ENTRY.size * position)
+        start = self._payload_start + offset
+        return json.loads(self._map[start:start + length])
+
+    @property
+    def text_index_ready(self) -> bool:
+        return self._text_index is not None
+
+    def search_text(self, query: str) -> Dict[int, float]:
+        """Snapshot positions matching a text query, with relevance scores"""
+        with self._lock:
+            # Built on the first text query that needs it
+            if self._text_index is None:
+                self._text_index = TextIndex.build(self.restaurants())
+            text_index = self._text_index
+        return text_index.search(query)
+
+    @property
+    def schedule_index_ready(self) -> bool:
+        return self._schedule_index is not None
+
+    def special_windows(self, latitude: float, longitude: float, radius: float,
+                        start: int, end: int) -> Iterator[Window]:
+        """Weekly special windows near a location overlapping [start, end] (see schedule_index.py)"""
+        with self._lock:
+            if self._schedule_index is None:
+                self._schedule_index = ScheduleIndex.build(self.restaurants())
+            schedule_index = self._schedule_index
+        return schedule_index.overlapping(latitude, longitude, radius, start, end)
+
+    @property
+    def compact_ready(self) -> bool:
+        return self._compact is not None
+
+    def compact_catalog(self) -> CompactCatalog:
+        """Struct-of-arrays view of this snapshot version, built on first use"""
+        with self._lock:
+            if self._compact is None:
+                self._compact = CompactCatalog.build(self.restaurants())
+            return self._compact
+
+    def nearest(self, latitude: float, longitude: float, radius: float, now: datetime,
+                special_type: Optional[str] = None, after: Optional[Tuple] = None, limit: int = 20,
+                text_scores: Optional[Dict[int, float]] = None,
+                scorer: Optional[Callable[[Signals], float]] = None) -> List[dict]:
+        """Decoded restaurants of one search page (see CompactCatalog.nearest).
+
+        Only the ``limit + 1`` selected restaurants are decoded; each gets its
+        rounded ``distance``, with ``text_scores`` its ``relevance`` and with a
+        ``scorer`` its ``score``.
+        """
+        compact = self.compact_catalog()
+        positions = relevance = None
+        if text_scores is not None:
+            relevance = {position: round(value, 3) for position, value in text_scores.items()
+                         if position < len(compact)}
+            positions = list(relevance)
+        restaurants = []
+        for key, _, position, distance in compact.nearest(latitude, longitude, radius, now, special_type,
+                                                          after, limit, positions, scorer, relevance):
+            restaurant = self.restaurant_at(position)
+            restaurant['distance'] = distance
+            if relevance is not None:
+                restaurant['relevance'] = relevance[position]
+            if scorer is not None:
+                restaurant['score'] = key
+            restaurants.append(restaurant)
+        return restaurants
+
+    def candidates(self, latitude: float, longitude: float, radius: float,
+                   text_scores: Optional[Dict[int, float]] = None) -> List[dict]:
+        """Decode restaurants inside the bounding box of a search circle.
+
+        This is a cheap prefilter; callers still apply the exact distance check.
+        With ``text_scores`` from ``search_text`` only the matching index entries
+        are read, and each result gets its score as ``relevance``.
+        """
+        mapped, count, payload_start = self._map, self._count, self._payload_start
+
+        lat_delta = radius / METERS_PER_DEGREE
+        cos_lat = math.cos(math.radians(latitude))
+        lon_delta = 180.0 if cos_lat < 1e-6 else min(180.0, lat_delta / cos_lat)
+
+        index = memoryview(mapped)[HEADER.size:payload_start]
+        if text_scores is None:
+            entries = enumerate(INDEX_ENTRY.iter_unpack(index))
+        else:
+            entries = ((position, INDEX_ENTRY.unpack_from(index, INDEX_ENTRY.size * position))
+                       for position in sorted(text_scores) if position < count)
+        restaurants = []
+        for position, (rest_lat, rest_lon, offset, length) in entries:
+            if abs(rest_lat - latitude) > lat_delta:
+                continue
+            lon_diff = abs(rest_lon - longitude)
+            if lon_diff > 180.0:
+                lon_diff = 360.0 - lon_diff
+            if lon_diff > lon_delta:
+                continue
+            start = payload_start + offset
+            restaurant = json.loads(mapped[start:start + length])
+            if text_scores is not None:
+                restaurant['relevance'] = round(text_scores[position], 3)
+            restaurants.append(restaurant)
+        index.release()
+        return restaurants
+
+
+class CatalogSnapshot:
+    """Per-process reader over the shared, mmap'd catalog snapshot.
+
+    ``refresh`` maps the newest published version; ``current`` returns it as an
+    immutable ``SnapshotView``. Request handlers pin one view and use it for
+    every step of the request.
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._pointer_key = None
+        self._view: Optional[SnapshotView] = None
+
+    @property
+    def directory(self) -> Path:
+        if self._directory is None:
+            self._directory = snapshot_dir()
+        return self._directory
+
+    @property
+    def version(self) -> int:
+        view = self._view
+        return view.version if view is not None else 0
+
+    def __len__(self) -> int:
+        view = self._view
+        return len(view) if view is not None else 0
+
+    def current(self) -> Optional[SnapshotView]:
+        """The mapped version, or None before one is loaded"""
+        return self._view
+
+    def refresh(self) -> bool:
+        """Remap if a newer version was published; return True if a snapshot is loaded"""
+        try:
+            stat = os.stat(self.directory / POINTER_FILE)
+        except FileNotFoundError:
+            return self._view is not None
+
+        # The pointer is replaced atomically, so a new inode means a new version
+        pointer_key = (stat.st_ino, stat.st_mtime_ns)
+        if pointer_key == self._pointer_key:
+            return self._view is not None
+
+        with self._lock:
+            if pointer_key == self._pointer_key:
+                return self._view is not None
+            version = read_current_version(self.directory)
+            # Only a pointer whose version is mapped is remembered, so a failed load is retried
+            if version and (version == self.version or self._load(version)):
+                self._pointer_key = pointer_key
+        return self._view is not None
+
+    def _load(self, version: int) -> bool:
+        try:
+            with open(_snapshot_path(self.directory, version), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError) as e:
+            logger.warning(f"Catalog snapshot v{version} unavailable: {e}")
+            return False
+
+        magic, format_version, file_version, count = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            logger.warning(f"Ignoring catalog snapshot v{version} with unknown format")
+            mapped.close()
+            return False
+
+        # Old maps are not closed explicitly: in-flight searches may still be
+        # reading them, and the GC releases them once unreferenced.
+        self._view = SnapshotView(mapped, file_version, count)
+        logger.info(f"Loaded catalog snapshot v{file_version} ({count} restaurants)")
+        return True
@@ -0,0 +1,228 @@
+"""Compact struct-of-arrays view of the restaurant catalog for the search hot path.
+
+Searches only need a restaurant's coordinates, id and special schedules to decide
+whether it belongs on a page. Those live here in contiguous typed arrays, one
+slot per snapshot position: coordinates, rating and price level per restaurant,
+and per active special its type, a weekday bitmask, start/end minutes, first/last
+day and discount, compiled once instead of re-parsed from "HH:MM" strings on every
+search.
+Restaurants are additionally ordered by latitude so a search bisects to its
+latitude band instead of scanning the whole catalog.
+
+A search returns snapshot positions for one page; only those restaurants are
+decoded into dicts (see ``SnapshotView.nearest``).
+"""
+import heapq
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ranking import Signals, score, special_discount
+from schedule_index import WEEKDAYS, parse_date, parse_minutes
+
+SPECIAL_TYPES = ("happy_hour", "lunch_special", "dinner_special", "blue_plate", "daily_special", "weekend_special")
+UNKNOWN_TYPE = 255
+NO_TIME = -1
+FIRST_DAY = 0
+LAST_DAY = date.max.toordinal()
+EARTH_RADIUS_METERS = 6371000
+METERS_PER_DEGREE = 111320.0
+
+_TYPE_CODES = {special_type: code for code, special_type in enumerate(SPECIAL_TYPES)}
+_DAY_BITS = {day: 1 << index for index, day in enumerate(WEEKDAYS)}
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distance in meters; the same formula as server.calculate_distance"""
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * math.asin(math.sqrt(a)) * EARTH_RADIUS_METERS
+
+
+class CompactCatalog:
+    __slots__ = ('ids', 'latitudes', 'longitudes', 'ratings', 'price_levels',
+                 'special_offsets', 'special_types', 'special_days', 'special_starts', 'special_ends',
+                 'special_first_days', 'special_last_days', 'special_discounts', 'dated',
+                 '_by_latitude', '_sorted_latitudes')
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.ratings = array('d')
+        self.price_levels = array('b')
+        # Specials of restaurant i are special_offsets[i]:special_offsets[i + 1]
+        self.special_offsets = array('i', [0])
+        self.special_types = array('B')
+        self.special_days = array('B')
+        self.special_starts = array('h')
+        self.special_ends = array('h')
+        # Date ordinals of start_date/end_date; FIRST_DAY/LAST_DAY when open
+        self.special_first_days = array('i')
+        self.special_last_days = array('i')
+        self.special_discounts = array('d')
+        self.dated = False
+        self._by_latitude = array('i')
+        self._sorted_latitudes = array('d')
+
+    @classmethod
+    def build(cls, restaurants: Iterable[dict]) -> "CompactCatalog":
+        catalog = cls()
+        for restaurant in restaurants:
+            catalog._append(restaurant)
+        order = sorted(range(len(catalog.ids)), key=catalog.latitudes.__getitem__)
+        catalog._by_latitude = array('i', order)
+        catalog._sorted_latitudes = array('d', (catalog.latitudes[position] for position in order))
+        return catalog
+
+    def _append(self, restaurant: dict):
+        location = restaurant.get('location') or {}
+        self.ids.append(str(restaurant.get('id', '')))
+        self.latitudes.append(location.get('latitude', 0) or 0)
+        self.longitudes.append(location.get('longitude', 0) or 0)
+        self.ratings.append(restaurant.get('rating') or 0)
+        self.price_levels.append(restaurant.get('price_level') or 0)
+        for special in restaurant.get('specials', []) or []:
+            if not special.get('is_active', True):
+                continue
+            days = 0
+            for day in special.get('days_available', []) or []:
+                days |= _DAY_BITS.get(day, 0)
+            start, end = parse_minutes(special.get('time_start')), parse_minutes(special.get('time_end'))
+            if start is None or end is None:
+                # server.is_special_active_now counts unparsable times as active all day
+                start = end = NO_TIME
+            self.special_types.append(_TYPE_CODES.get(special.get('special_type'), UNKNOWN_TYPE))
+            self.special_days.append(days)
+            self.special_starts.append(start)
+            self.special_ends.append(end)
+            first_day, last_day = parse_date(special.get('start_date')), parse_date(special.get('end_date'))
+            self.special_first_days.append(first_day.toordinal() if first_day else FIRST_DAY)
+            self.special_last_days.append(last_day.toordinal() if last_day else LAST_DAY)
+            self.dated = self.dated or bool(first_day or last_day)
+            self.special_discounts.append(special_discount(special))
+        self.special_offsets.append(len(self.special_types))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _in_season(self, i: int, today: int) -> bool:
+        return not self.dated or self.special_first_days[i] <= today <= self.special_last_days[i]
+
+    def _has_special(self, position: int, type_code: Optional[int], day_bit: int, seconds: float, today: int) -> bool:
+        first, last = self.special_offsets[position], self.special_offsets[position + 1]
+        if type_code is not None:
+            if not self.dated:
+                return type_code in self.special_types[first:last]
+            types = self.special_types
+            return any(types[i] == type_code and self._in_season(i, today) for i in range(first, last))
+        days, starts, ends = self.special_days, self.special_starts, self.special_ends
+        for i in range(first, last):
+            if (days[i] & day_bit and (starts[i] == NO_TIME or starts[i] * 60 <= seconds <= ends[i] * 60)
+                    and self._in_season(i, today)):
+                return True
+        return False
+
+    def _signals(self, position: int, distance: float, radius: float, type_code: Optional[int], day_bit: int,
+                 seconds: float, today: int, relevance: Optional[float]) -> Optional[Signals]:
+        """Ranking signals over the specials the result is shown with; None when there are none"""
+        types, days, starts, ends = self.special_types, self.special_days, self.special_starts, self.special_ends
+        shown = False
+        discount = 0.0
+        minutes_left = None
+        for i in range(self.special_offsets[position], self.special_offsets[position + 1]):
+            running = days[i] & day_bit and (starts[i] == NO_TIME or starts[i] * 60 <= seconds <= ends[i] * 60)
+            if type_code is not None and types[i] != type_code or type_code is None and not running:
+                continue
+            if not self._in_season(i, today):
+                continue
+            shown = True
+            discount = max(discount, self.special_discounts[i])
+            if starts[i] != NO_TIME and starts[i] * 60 <= seconds <= ends[i] * 60:
+                left = ends[i] - seconds / 60
+                minutes_left = left if minutes_left is None else min(minutes_left, left)
+        if not shown:
+            return None
+        return Signals(distance, radius, self.ratings[position], discount, minutes_left, relevance)
+
+    def nearest(self, latitude: float, longitude: float, radius: float, now: datetime,
+                special_type: Optional[str] = None, after: Optional[Tuple] = None, limit: int = 20,
+                positions: Optional[Iterable[int]] = None, scorer: Optional[Callable[[Signals], float]] = None,
+                relevance: Optional[Dict[int, float]] = None) -> List[Tuple]:
+        """Up to ``limit + 1`` (key, id, position, rounded distance) entries of the page after ``after``.
+
+        A restaurant qualifies when it lies within ``radius`` and has an active
+        special of ``special_type`` or, without a type, one running at ``now``,
+        matching the rules the search endpoint applies to decoded restaurants.
+        ``positions`` restricts the search to e.g. text query matches.
+
+        Without a ``scorer`` the key is the rounded distance and entries come
+        nearest first; with one it is the score, highest first (ties by id,
+        descending), computed from ``ranking.Signals``.
+        """
+        type_code = _TYPE_CODES.get(special_type, UNKNOWN_TYPE) if special_type else None
+        day_bit = 1 << now.weekday()
+        seconds = now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+        today = now.toordinal()
+
+        lat_delta = radius / METERS_PER_DEGREE
+        if positions is None:
+            low = bisect_left(self._sorted_latitudes, latitude - lat_delta)
+            high = bisect_right(self._sorted_latitudes, latitude + lat_delta)
+            positions = self._by_latitude[low:high]
+        cos_lat = math.cos(math.radians(latitude))
+        lon_delta = 180.0 if cos_lat < 1e-6 else min(180.0, lat_delta / cos_lat)
+
+        latitudes, longitudes, ids = self.latitudes, self.longitudes, self.ids
+        matches = []
+        for position in positions:
+            rest_lat = latitudes[position]
+            if abs(rest_lat - latitude) > lat_delta:
+                continue
+            rest_lon = longitudes[position]
+            lon_diff = abs(rest_lon - longitude)
+            if lon_diff > 180.0:
+                lon_diff = 360.0 - lon_diff
+            if lon_diff > lon_delta:
+                continue
+            distance = haversine(latitude, longitude, rest_lat, rest_lon)
+            if distance > radius:
+                continue
+            distance = round(distance)
+            if scorer is None:
+                key = (distance, ids[position])
+                if after is not None and key <= after:
+                    continue
+                if not self._has_special(position, type_code, day_bit, seconds, today):
+                    continue
+            else:
+                signals = self._signals(position, distance, radius, type_code, day_bit, seconds, today,
+                                        relevance.get(position) if relevance is not None else None)
+                if signals is None:
+                    continue
+                key = (score(scorer, signals), ids[position])
+                if after is not None and key >= after:
+                    continue
+            matches.append((key[0], key[1], position, distance))
+        if scorer is None:
+            return heapq.nsmallest(limit + 1, matches)
+        return heapq.nlargest(limit + 1, matches)
+
+    def deals(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, now: datetime,
+              special_type: Optional[str] = None) -> Iterator[Tuple[int, float]]:
+        """(position, best discount) of restaurants inside a box that a search would show"""
+        type_code = _TYPE_CODES.get(special_type, UNKNOWN_TYPE) if special_type else None
+        day_bit = 1 << now.weekday()
+        seconds = now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+        today = now.toordinal()
+        low = bisect_left(self._sorted_latitudes, min_lat)
+        high = bisect_right(self._sorted_latitudes, max_lat)
+        longitudes = self.longitudes
+        for position in self._by_latitude[low:high]:
+            if not min_lon <= longitudes[position] <= max_lon:
+                continue
+            signals = self._signals(position, 0, 1, type_code, day_bit, seconds, today, None)
+            if signals is not None:
+                yield position, signals.discount
@@ -0,0 +1,93 @@
+"""MongoDB clients per route class.
+
+Public read paths (anonymous search, restaurant details, specials listings, map
+tiles) use the ``public`` client: secondary-preferred reads with a bounded
+staleness, so search load spreads over the replica set's secondaries.
+Everything else uses the ``primary`` client: writes, auth and user lookups, and
+reads that must observe a write that was just made, such as catalog snapshot
+rebuilds. Owner portal handlers also run their writes and the reads that follow
+them in a causally consistent session (``causal_session``).
+
+Each class has its own client, and so its own connection pool. Both are sized
+with ``MONGO_<CLASS>_*`` environment variables, where CLASS is PRIMARY or
+PUBLIC:
+
+* MAX_POOL_SIZE
+* MIN_POOL_SIZE
+* MAX_IDLE_TIME_MS
+* WAIT_QUEUE_TIMEOUT_MS
+* SERVER_SELECTION_TIMEOUT_MS
+* CONNECT_TIMEOUT_MS
+* SOCKET_TIMEOUT_MS
+
+MONGO_PUBLIC_URL can send public reads to another host list (MONGO_URL by
+default). MONGO_PUBLIC_READ_PREFERENCE and MONGO_MAX_STALENESS_SECONDS choose
+the read preference. The staleness cannot be below the 90 seconds that MongoDB
+accepts.
+"""
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorClientSession
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'primary'
+PUBLIC = 'public'
+MIN_MAX_STALENESS_SECONDS = 90
+
+# Environment suffix -> MongoClient keyword argument
+_POOL_OPTIONS = {
+    'MAX_POOL_SIZE': 'maxPoolSize',
+    'MIN_POOL_SIZE': 'minPoolSize',
+    'MAX_IDLE_TIME_MS': 'maxIdleTimeMS',
+    'WAIT_QUEUE_TIMEOUT_MS': 'waitQueueTimeoutMS',
+    'SERVER_SELECTION_TIMEOUT_MS': 'serverSelectionTimeoutMS',
+    'CONNECT_TIMEOUT_MS': 'connectTimeoutMS',
+    'SOCKET_TIMEOUT_MS': 'socketTimeoutMS',
+}
+# Public reads are short and should fail over quickly; the primary keeps driver defaults
+_DEFAULTS = {
+    PRIMARY: {},
+    PUBLIC: {'maxPoolSize': 200, 'waitQueueTimeoutMS': 2000, 'serverSelectionTimeoutMS': 5000,
+             'socketTimeoutMS': 10000},
+}
+
+
+def route_class_options(route_class: str) -> Dict[str, object]:
+    """MongoClient keyword arguments of a route class, from MONGO_<CLASS>_* settings"""
+    options = dict(_DEFAULTS[route_class])
+    prefix = f"MONGO_{route_class.upper()}_"
+    for suffix, option in _POOL_OPTIONS.items():
+        value = os.environ.get(prefix + suffix)
+        if value:
+            options[option] = int(value)
+    if route_class == PUBLIC:
+        read_preference = os.environ.get('MONGO_PUBLIC_READ_PREFERENCE', 'secondaryPreferred')
+        options['readPreference'] = read_preference
+        if read_preference != 'primary':
+            staleness = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', str(MIN_MAX_STALENESS_SECONDS)))
+            if staleness < MIN_MAX_STALENESS_SECONDS:
+                logger.warning(f"MONGO_MAX_STALENESS_SECONDS={staleness} is below the MongoDB minimum, "
+                               f"using {MIN_MAX_STALENESS_SECONDS}")
+                staleness = MIN_MAX_STALENESS_SECONDS
+            options['maxStalenessSeconds'] = staleness
+    return options
+
+
+def create_clients(mongo_url: str, event_listeners: Optional[List] = None) -> Dict[str, AsyncIOMotorClient]:
+    """One client (and connection pool) per route class"""
+    public_url = os.environ.get('MONGO_PUBLIC_URL') or mongo_url
+    return {
+        route_class: AsyncIOMotorClient(url, event_listeners=event_listeners or [], **route_class_options(route_class))
+        for route_class, url in ((PRIMARY, mongo_url), (PUBLIC, public_url))
+    }
+
+
+@asynccontextmanager
+async def causal_session(client: AsyncIOMotorClient) -> AsyncIterator[AsyncIOMotorClientSession]:
+    """A causally consistent session: reads made with it observe the writes made before them"""
+    async with await client.start_session(causal_consistency=True) as session:
+        yield session
@@ -0,0 +1,48 @@
+"""Facet counts for the search filter chips.
+
+One pass over the restaurants in a search area yields, for every special type,
+the number of restaurants a ``special_type`` search would return, plus the
+number with a special running right now and price-level and cuisine histograms
+of the restaurants that have any active special. Specials outside their
+start/end dates are not counted.
+"""
+from collections import Counter
+from datetime import date
+from typing import Callable, Iterable, Optional, Sequence
+
+from schedule_index import in_season
+
+MAX_CUISINES = 20
+
+
+def count_facets(restaurants: Iterable[dict], special_types: Sequence[str],
+                 is_active_now: Callable[[dict], bool], today: Optional[date] = None) -> dict:
+    today = today or date.today()
+    types = Counter()
+    price_levels = Counter()
+    cuisines = Counter()
+    total = 0
+    active_now = 0
+    for restaurant in restaurants:
+        specials = [special for special in restaurant.get('specials', []) or []
+                    if special.get('is_active', True) and in_season(special, today)]
+        if not specials:
+            continue
+        total += 1
+        # A restaurant counts once per type, however many specials of that type it runs
+        types.update({special.get('special_type') for special in specials})
+        if any(is_active_now(special) for special in specials):
+            active_now += 1
+        price_levels[restaurant.get('price_level')] += 1
+        cuisines.update(set(restaurant.get('cuisine_type', []) or []))
+
+    return {
+        "total": total,
+        "active_now": active_now,
+        "special_types": {special_type: types.get(special_type, 0) for special_type in special_types},
+        "price_levels": {
+            ("unknown" if level is None else str(level)): count
+            for level, count in sorted(price_levels.items(), key=lambda item: (item[0] is None, item[0] or 0))
+        },
+        "cuisines": [{"cuisine": cuisine, "count": count} for cuisine, count in cuisines.most_common(MAX_CUISINES)],
+    }
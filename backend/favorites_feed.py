@@ -0,0 +1,277 @@
+"""Precomputed per-user favorites feed.
+
+Each favorite is stored as one small ``favorite_feed`` document per
+(user, restaurant) holding a compact summary of the restaurant and the weekly
+schedule of its live specials, with times pre-parsed to minutes. Opening the
+favorites tab is then a single indexed read on ``user_id``; which specials are
+active now and which one starts next is evaluated on the compact schedule at
+read time, so the feed never goes stale between writes.
+
+Entries are kept up to date incrementally: adding or removing a favorite
+upserts or deletes one entry, and every special write refreshes the entries of
+the affected restaurant across all users with one ``update_many``. A favorite
+we cannot resolve (e.g. a Google place not in the catalog yet) is stored once as
+unavailable, and filled in by ``resolve_places`` when the place is ingested.
+Backfills and resolves load what they need with one query and write all
+entries with one bulk write.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from pymongo import UpdateMany, UpdateOne
+
+from schedule_index import in_season
+
+logger = logging.getLogger(__name__)
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MAX_ACTIVE_SPECIALS = 3
+
+
+def _minutes(value: str) -> Optional[int]:
+    try:
+        hours, minutes = value.split(':')
+        return int(hours) * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        return None
+
+
+def compact_special(special: dict) -> dict:
+    """The fields of a special the feed needs, with its window in minutes"""
+    return {
+        "id": special.get('id'),
+        "title": special.get('title', ''),
+        "special_type": special.get('special_type'),
+        "price": special.get('price'),
+        "original_price": special.get('original_price'),
+        "days": [day for day in special.get('days_available', []) if day in DAYS],
+        "time_start": special.get('time_start'),
+        "time_end": special.get('time_end'),
+        "start_minute": _minutes(special.get('time_start')),
+        "end_minute": _minutes(special.get('time_end')),
+        "start_date": special.get('start_date'),
+        "end_date": special.get('end_date'),
+    }
+
+
+def summarize_restaurant(restaurant: dict) -> dict:
+    """Compact feed summary of a stored restaurant or catalog place"""
+    specials = [compact_special(s) for s in restaurant.get('specials', []) if s.get('is_active', True)]
+    return {
+        "name": restaurant.get('name', ''),
+        "address": restaurant.get('address', ''),
+        "rating": restaurant.get('rating'),
+        "price_level": restaurant.get('price_level'),
+        "cuisine_type": restaurant.get('cuisine_type', []),
+        "location": restaurant.get('location'),
+        "specials_count": len(specials),
+        "schedule": specials,
+        "updated_at": datetime.now(timezone.utc),
+    }
+
+
+def _is_active(special: dict, now: datetime) -> bool:
+    # Same rules as server.is_special_active_now: inclusive window, unparsable times count as active
+    if DAYS[now.weekday()] not in special['days'] or not in_season(special, now.date()):
+        return False
+    start, end = special['start_minute'], special['end_minute']
+    if start is None or end is None:
+        return True
+    minute = now.hour * 60 + now.minute
+    return start <= minute <= end
+
+
+def _next_start(special: dict, now: datetime) -> Optional[datetime]:
+    start = special['start_minute']
+    if start is None or not special['days']:
+        return None
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    for offset in range(8):
+        day = midnight + timedelta(days=offset)
+        if DAYS[day.weekday()] not in special['days'] or not in_season(special, day.date()):
+            continue
+        starts_at = day + timedelta(minutes=start)
+        if starts_at > now:
+            return starts_at
+    return None
+
+
+def _public_special(special: dict) -> dict:
+    return {key: special[key] for key in
+            ("id", "title", "special_type", "price", "original_price", "time_start", "time_end")}
+
+
+def render_entry(entry: dict, now: Optional[datetime] = None) -> dict:
+    """Feed entry as returned by the API, with active and next-active specials"""
+    now = now or datetime.now()
+    schedule = entry.get('schedule', [])
+    active = [special for special in schedule if _is_active(special, now)]
+    upcoming = None
+    for special in schedule:
+        if special in active:
+            continue
+        starts_at = _next_start(special, now)
+        if starts_at and (upcoming is None or starts_at < upcoming[0]):
+            upcoming = (starts_at, special)
+    next_special = None
+    if upcoming:
+        next_special = _public_special(upcoming[1])
+        next_special['starts_at'] = upcoming[0].isoformat()
+    return {
+        "id": entry['restaurant_id'],
+        "name": entry.get('name', ''),
+        "address": entry.get('address', ''),
+        "rating": entry.get('rating'),
+        "price_level": entry.get('price_level'),
+        "cuisine_type": entry.get('cuisine_type', []),
+        "location": entry.get('location'),
+        "specials_count": entry.get('specials_count', 0),
+        "active_specials_count": len(active),
+        "active_specials": [_public_special(special) for special in active[:MAX_ACTIVE_SPECIALS]],
+        "next_special": next_special,
+        "available": entry.get('available', True),
+    }
+
+
+async def ensure_indexes(database):
+    await database.favorite_feed.create_index([("user_id", 1), ("restaurant_id", 1)], unique=True)
+    await database.favorite_feed.create_index("restaurant_id")
+
+
+async def load_restaurant(database, restaurant_id: str) -> Optional[dict]:
+    """Stored restaurant for a favorite id, falling back to the places catalog for google_ ids"""
+    projection = {"_id": 0}
+    restaurant = await database.restaurants.find_one({"id": restaurant_id}, projection)
+    if restaurant is None and restaurant_id.startswith('google_'):
+        place_id = restaurant_id[len('google_'):]
+        # A claimed place gets its own restaurant record carrying its specials
+        restaurant = await database.restaurants.find_one({"google_place_id": place_id}, projection)
+        if restaurant is None:
+            restaurant = await database.places.find_one({"id": restaurant_id}, projection)
+    return restaurant
+
+
+async def load_restaurants(database, restaurant_ids: List[str]) -> Dict[str, dict]:
+    """``load_restaurant`` for many favorite ids: one restaurants query, and one places query if needed"""
+    if not restaurant_ids:
+        return {}
+    place_ids = {restaurant_id[len('google_'):]: restaurant_id
+                 for restaurant_id in restaurant_ids if restaurant_id.startswith('google_')}
+    by_id, by_place = {}, {}
+    async for restaurant in database.restaurants.find(
+            {"$or": [{"id": {"$in": list(restaurant_ids)}}, {"google_place_id": {"$in": list(place_ids)}}]},
+            {"_id": 0}):
+        by_id.setdefault(restaurant.get('id'), restaurant)
+        if restaurant.get('google_place_id') in place_ids:
+            by_place.setdefault(place_ids[restaurant['google_place_id']], restaurant)
+    found = {}
+    for restaurant_id in restaurant_ids:
+        # Same precedence as load_restaurant: own record, then a claimed place's record
+        restaurant = by_id.get(restaurant_id) or by_place.get(restaurant_id)
+        if restaurant is not None:
+            found[restaurant_id] = restaurant
+    unresolved = [restaurant_id for restaurant_id in place_ids.values() if restaurant_id not in found]
+    if unresolved:
+        async for place in database.places.find({"id": {"$in": unresolved}}, {"_id": 0}):
+            found.setdefault(place['id'], place)
+    return found
+
+
+def _entry_fields(restaurant: Optional[dict]) -> dict:
+    if restaurant is None:
+        # Unknown to us (e.g. a Google place not in the catalog): keep the entry so
+        # the favorite still lists
+        return {"specials_count": 0, "schedule": [], "available": False,
+                "updated_at": datetime.now(timezone.utc)}
+    fields = summarize_restaurant(restaurant)
+    fields['available'] = True
+    return fields
+
+
+async def add_entry(database, user_id: str, restaurant_id: str):
+    restaurant = await load_restaurant(database, restaurant_id)
+    await database.favorite_feed.update_one(
+        {"user_id": user_id, "restaurant_id": restaurant_id},
+        {"$set": _entry_fields(restaurant), "$setOnInsert": {"added_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+
+async def remove_entry(database, user_id: str, restaurant_id: str):
+    await database.favorite_feed.delete_one({"user_id": user_id, "restaurant_id": restaurant_id})
+
+
+def _feed_ids(restaurant_id: str, google_place_id: Optional[str]) -> List[str]:
+    """Favorite ids a restaurant is listed under: its own, and its Google place's when claimed"""
+    ids = [restaurant_id]
+    if google_place_id and f"google_{google_place_id}" != restaurant_id:
+        ids.append(f"google_{google_place_id}")
+    return ids
+
+
+async def refresh_restaurant(database, restaurant_id: str, google_place_id: Optional[str] = None,
+                             restaurant: Optional[dict] = None):
+    """Rewrite every user's entry for a restaurant after its specials changed"""
+    try:
+        if restaurant is None:
+            restaurant = await load_restaurant(database, restaurant_id)
+        fields = _entry_fields(restaurant)
+        await database.favorite_feed.update_many(
+            {"restaurant_id": {"$in": _feed_ids(restaurant_id, google_place_id)}}, {"$set": fields})
+    except Exception as e:
+        logger.error(f"Favorites feed refresh failed for {restaurant_id}: {e}")
+
+
+async def refresh_restaurants(database, restaurants: List[dict]):
+    """Rewrite every user's entries for restaurants written together, in one bulk write"""
+    operations = [
+        UpdateMany({"restaurant_id": {"$in": _feed_ids(restaurant['id'], restaurant.get('google_place_id'))}},
+                   {"$set": _entry_fields(restaurant)})
+        for restaurant in restaurants
+    ]
+    if not operations:
+        return
+    try:
+        await database.favorite_feed.bulk_write(operations, ordered=False)
+    except Exception as e:
+        logger.error(f"Favorites feed refresh failed for {len(operations)} restaurants: {e}")
+
+
+async def resolve_places(database, places: List[dict]):
+    """Fill in the unavailable entries of places that have just entered the catalog"""
+    by_id = {place['id']: place for place in places if place.get('id')}
+    if not by_id:
+        return
+    try:
+        waiting = await database.favorite_feed.distinct(
+            "restaurant_id", {"restaurant_id": {"$in": list(by_id)}, "available": False})
+        if waiting:
+            await database.favorite_feed.bulk_write([
+                UpdateMany({"restaurant_id": restaurant_id, "available": False},
+                           {"$set": _entry_fields(by_id[restaurant_id])})
+                for restaurant_id in waiting
+            ], ordered=False)
+    except Exception as e:
+        logger.error(f"Favorites feed resolve failed: {e}")
+
+
+async def load_feed(database, user_id: str, favorite_ids: List[str]) -> List[dict]:
+    """Rendered feed in favorites order, backfilling entries that predate the feed"""
+    entries = await database.favorite_feed.find({"user_id": user_id}, {"_id": 0}).to_list(length=None)
+    by_id = {entry['restaurant_id']: entry for entry in entries}
+    # Only favorites without an entry are resolved; unavailable entries wait for resolve_places
+    missing = list(dict.fromkeys(restaurant_id for restaurant_id in favorite_ids if restaurant_id not in by_id))
+    if missing:
+        restaurants = await load_restaurants(database, missing)
+        added_at = datetime.now(timezone.utc)
+        operations = []
+        for restaurant_id in missing:
+            fields = _entry_fields(restaurants.get(restaurant_id))
+            operations.append(UpdateOne(
+                {"user_id": user_id, "restaurant_id": restaurant_id},
+                {"$set": fields, "$setOnInsert": {"added_at": added_at}}, upsert=True))
+            by_id[restaurant_id] = dict(fields, user_id=user_id, restaurant_id=restaurant_id, added_at=added_at)
+        await database.favorite_feed.bulk_write(operations, ordered=False)
+    now = datetime.now()
+    return [render_entry(by_id[restaurant_id], now) for restaurant_id in favorite_ids if restaurant_id in by_id]
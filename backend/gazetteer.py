@@ -0,0 +1,364 @@
+"""Offline gazetteer of city and neighborhood names.
+
+Most geocode requests are plain place names ("San Francisco", "Mission District,
+SF"). These are answered from a local tab-separated dataset (data/gazetteer.tsv,
+or GAZETTEER_PATH; ``.gz`` files are read too). Each row holds:
+
+* name, ``|``-separated aliases, region and country;
+* latitude, longitude and a radius that bounds the place;
+* population, used to rank places that share a name.
+
+The file is loaded on first use. Every entry contributes lookup keys for its
+name and aliases, alone and followed by its region (state code or name; the
+city and state of a neighborhood). The keys are kept in one sorted list with
+parallel typed arrays.
+
+A query is looked up in three ways:
+
+* an exact key;
+* a prefix of a key, for 4+ characters;
+* a close spelling of the name alone, among names with the same first letter and
+  a similar length. A trailing region ("Dalas TX") is split off first, and then
+  only places in exactly that region can match.
+
+Confidence falls for incomplete prefixes, misspellings and names shared by
+places of similar population. A neighborhood named without its city or state
+("Chinatown", "Mission") is capped at UNQUALIFIED_NEIGHBORHOOD_CONFIDENCE: many
+cities have one of that name, and the dataset only lists a few of them. Only matches of at least GAZETTEER_MIN_CONFIDENCE
+are used. Anything else goes to Google, and so does any query that contains
+digits (street addresses, postcodes) or a street type after its first word
+("Castro St", "Oakland Ave").
+
+Larger datasets can be generated from a GeoNames ``cities*.txt`` dump:
+
+    python -m gazetteer import-geonames cities15000.txt --countries US >> data/gazetteer.tsv
+"""
+import argparse
+import gzip
+import logging
+import math
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from geocode_cache import normalize_address
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = Path(__file__).parent / 'data' / 'gazetteer.tsv'
+MIN_PREFIX_LENGTH = 4
+FUZZY_LENGTH_SLACK = 2
+MIN_FUZZY_RATIO = 0.8
+# Below the default GAZETTEER_MIN_CONFIDENCE, so a bare neighborhood name goes to Google
+UNQUALIFIED_NEIGHBORHOOD_CONFIDENCE = 0.6
+COUNTRY_SUFFIXES = ('united states of america', 'united states', 'usa', 'us')
+COUNTRY_NAMES = {'US': 'USA'}
+# A query with one of these after its first word names a street, not a place ("St Louis" is a place)
+STREET_TYPES = frozenset({
+    'st', 'street', 'ave', 'av', 'avenue', 'blvd', 'boulevard', 'rd', 'road', 'dr', 'drive', 'ln', 'lane',
+    'way', 'ct', 'court', 'pl', 'pkwy', 'parkway', 'hwy', 'highway', 'ter', 'terrace', 'cir', 'circle',
+    'expy', 'expressway', 'fwy', 'freeway', 'aly', 'alley',
+})
+US_STATES = {
+    'AL': 'alabama', 'AK': 'alaska', 'AZ': 'arizona', 'AR': 'arkansas', 'CA': 'california', 'CO': 'colorado',
+    'CT': 'connecticut', 'DE': 'delaware', 'DC': 'district of columbia', 'FL': 'florida', 'GA': 'georgia',
+    'HI': 'hawaii', 'ID': 'idaho', 'IL': 'illinois', 'IN': 'indiana', 'IA': 'iowa', 'KS': 'kansas',
+    'KY': 'kentucky', 'LA': 'louisiana', 'ME': 'maine', 'MD': 'maryland', 'MA': 'massachusetts',
+    'MI': 'michigan', 'MN': 'minnesota', 'MS': 'mississippi', 'MO': 'missouri', 'MT': 'montana',
+    'NE': 'nebraska', 'NV': 'nevada', 'NH': 'new hampshire', 'NJ': 'new jersey', 'NM': 'new mexico',
+    'NY': 'new york', 'NC': 'north carolina', 'ND': 'north dakota', 'OH': 'ohio', 'OK': 'oklahoma',
+    'OR': 'oregon', 'PA': 'pennsylvania', 'RI': 'rhode island', 'SC': 'south carolina', 'SD': 'south dakota',
+    'TN': 'tennessee', 'TX': 'texas', 'UT': 'utah', 'VT': 'vermont', 'VA': 'virginia', 'WA': 'washington',
+    'WV': 'west virginia', 'WI': 'wisconsin', 'WY': 'wyoming',
+}
+
+
+def gazetteer_enabled() -> bool:
+    return os.environ.get('GAZETTEER', 'true').lower() in ('1', 'true', 'yes')
+
+
+def normalize_place(text: str) -> str:
+    """Lookup key of a place name: the geocode cache key without apostrophes, hyphens or a trailing country"""
+    key = normalize_address(text.replace("'", "").replace("’", "").replace('-', ' '))
+    for suffix in COUNTRY_SUFFIXES:
+        if key.endswith(' ' + suffix):
+            return key[:-len(suffix) - 1]
+    return key
+
+
+class Place(NamedTuple):
+    name: str
+    aliases: Tuple[str, ...]
+    region: str
+    country: str
+    latitude: float
+    longitude: float
+    radius_meters: int
+    population: int
+
+
+class GazetteerMatch(NamedTuple):
+    name: str
+    region: str
+    country: str
+    latitude: float
+    longitude: float
+    radius_meters: int
+    confidence: float
+
+    def as_geocode(self) -> dict:
+        """The /api/geocode result shape"""
+        parts = [self.name, self.region, COUNTRY_NAMES.get(self.country, self.country)]
+        return {
+            "coordinates": {"latitude": self.latitude, "longitude": self.longitude},
+            "formatted_address": ", ".join(part for part in parts if part),
+            "radius_meters": self.radius_meters,
+            "source": "gazetteer",
+            "confidence": round(self.confidence, 3),
+        }
+
+
+def read_places(path: Path) -> Iterator[Place]:
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            if not line.strip() or line.startswith('#'):
+                continue
+            name, aliases, region, country, latitude, longitude, radius, population = line.rstrip('\n').split('\t')
+            yield Place(name, tuple(alias for alias in aliases.split('|') if alias), region, country,
+                        float(latitude), float(longitude), int(radius), int(population or 0))
+
+
+def _qualifiers(region: str, city_names: Dict[Tuple[str, str], List[str]]) -> List[str]:
+    """Normalized ways of writing a region: "CA", "California", "San Francisco, CA", "SF"..."""
+    parts = [part.strip() for part in region.split(',') if part.strip()]
+    if not parts:
+        return []
+    state = parts[-1]
+    states = [normalize_place(state)]
+    if state.upper() in US_STATES:
+        states.append(US_STATES[state.upper()])
+    if len(parts) == 1:
+        return states
+    city = normalize_place(parts[0])
+    cities = city_names.get((city, state.upper()), [city])
+    return [*cities, *(f"{city} {state}" for city in cities for state in states)]
+
+
+class Gazetteer:
+    __slots__ = ('names', 'regions', 'countries', 'latitudes', 'longitudes', 'radii', 'populations',
+                 '_keys', '_key_places', '_names', '_name_places', '_place_qualifiers', '_qualifiers',
+                 'min_confidence')
+
+    def __init__(self, min_confidence: float = 0.85):
+        self.names: List[str] = []
+        self.regions: List[str] = []
+        self.countries: List[str] = []
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.radii = array('i')
+        self.populations = array('q')
+        # Sorted lookup keys; _key_places[i] is the place of _keys[i]
+        self._keys: List[str] = []
+        self._key_places = array('i')
+        # Sorted names and aliases alone, for the fuzzy pass
+        self._names: List[str] = []
+        self._name_places = array('i')
+        # Ways of writing each place's region, and all of them (plus every US state)
+        self._place_qualifiers: List[frozenset] = []
+        self._qualifiers: set = {code.lower() for code in US_STATES} | set(US_STATES.values())
+        self.min_confidence = min_confidence
+
+    @classmethod
+    def build(cls, places: List[Place], min_confidence: float = 0.85) -> "Gazetteer":
+        gazetteer = cls(min_confidence)
+        city_names: Dict[Tuple[str, str], List[str]] = {}
+        for place in places:
+            if ',' not in place.region:
+                names = [normalize_place(name) for name in (place.name, *place.aliases)]
+                city_names.setdefault((names[0], place.region.upper()), names)
+
+        keyed, named = [], []
+        for position, place in enumerate(places):
+            gazetteer.names.append(place.name)
+            gazetteer.regions.append(place.region)
+            gazetteer.countries.append(place.country)
+            gazetteer.latitudes.append(place.latitude)
+            gazetteer.longitudes.append(place.longitude)
+            gazetteer.radii.append(place.radius_meters)
+            gazetteer.populations.append(place.population)
+            qualifiers = _qualifiers(place.region, city_names)
+            gazetteer._place_qualifiers.append(frozenset(qualifiers))
+            gazetteer._qualifiers.update(qualifiers)
+            keys = set()
+            for name in (place.name, *place.aliases):
+                name = normalize_place(name)
+                if name:
+                    named.append((name, position))
+                keys.add(name)
+                keys.update(f"{name} {qualifier}" for qualifier in qualifiers)
+            keyed.extend((key, position) for key in keys if key)
+        keyed.sort()
+        gazetteer._keys = [key for key, _ in keyed]
+        gazetteer._key_places = array('i', (position for _, position in keyed))
+        named = sorted(set(named))
+        gazetteer._names = [name for name, _ in named]
+        gazetteer._name_places = array('i', (position for _, position in named))
+        return gazetteer
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "Gazetteer":
+        path = Path(path or os.environ.get('GAZETTEER_PATH') or DEFAULT_PATH)
+        gazetteer = cls.build(list(read_places(path)), float(os.environ.get('GAZETTEER_MIN_CONFIDENCE', '0.85')))
+        logger.info(f"Loaded gazetteer from {path} ({len(gazetteer)} places, {len(gazetteer._keys)} keys)")
+        return gazetteer
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _dominance(self, places: List[int]) -> Tuple[int, float]:
+        """The most populous of places sharing a key, and its share of their population"""
+        weights = {place: math.sqrt(self.populations[place] + 1) for place in places}
+        best = max(weights, key=weights.get)
+        return best, weights[best] / sum(weights.values())
+
+    def _match(self, place: int, confidence: float, qualified: bool = True) -> GazetteerMatch:
+        if not qualified and ',' in self.regions[place]:
+            # A neighborhood (its region is "City, ST") named without a city or state
+            confidence = min(confidence, UNQUALIFIED_NEIGHBORHOOD_CONFIDENCE)
+        return GazetteerMatch(self.names[place], self.regions[place], self.countries[place],
+                              self.latitudes[place], self.longitudes[place], self.radii[place], confidence)
+
+    def _is_name_of(self, key: str, place: int) -> bool:
+        """Whether a key is the place's name or an alias alone, without a region"""
+        low = bisect_left(self._names, key)
+        return any(self._name_places[i] == place for i in range(low, bisect_right(self._names, key, lo=low)))
+
+    def _places_between(self, low: int, high: int) -> List[int]:
+        return list(dict.fromkeys(self._key_places[low:high]))
+
+    def _split_region(self, key: str) -> Tuple[str, Optional[str]]:
+        """The name and the longest trailing region qualifier of a key ("dalas tx" -> "dalas", "tx")"""
+        words = key.split()
+        for split in range(1, len(words)):
+            region = ' '.join(words[split:])
+            if region in self._qualifiers:
+                return ' '.join(words[:split]), region
+        return key, None
+
+    def match(self, query: str) -> Optional[GazetteerMatch]:
+        """The best match for a place name with its confidence, whatever the threshold"""
+        key = normalize_place(query)
+        if not key or any(character.isdigit() for character in key):
+            return None
+        keys = self._keys
+
+        low = bisect_left(keys, key)
+        exact_high = bisect_right(keys, key)
+        if exact_high > low:
+            place, share = self._dominance(self._places_between(low, exact_high))
+            return self._match(place, share, qualified=not self._is_name_of(key, place))
+        if any(word in STREET_TYPES for word in key.split()[1:]):
+            return None
+
+        candidates = []
+        if len(key) >= MIN_PREFIX_LENGTH:
+            high = bisect_left(keys, key + '\uffff')
+            if high > low:
+                place, share = self._dominance(self._places_between(low, high))
+                completion = len(key) / min(len(keys[i]) for i in range(low, high) if self._key_places[i] == place)
+                candidates.append(self._match(place, (0.5 + 0.5 * completion) * share,
+                                              qualified=self._split_region(key)[1] is not None))
+
+        # Misspellings: fuzz the name alone, among places in the query's region if it has one
+        name, region = self._split_region(key)
+        names = self._names
+        ratios: Dict[int, float] = {}
+        first = bisect_left(names, name[0])
+        last = bisect_left(names, name[0] + '\uffff')
+        matcher = SequenceMatcher(None, b=name, autojunk=False)
+        for i in range(first, last):
+            if abs(len(names[i]) - len(name)) > FUZZY_LENGTH_SLACK:
+                continue
+            place = self._name_places[i]
+            if region is not None and region not in self._place_qualifiers[place]:
+                continue
+            matcher.set_seq1(names[i])
+            if matcher.real_quick_ratio() < MIN_FUZZY_RATIO or matcher.quick_ratio() < MIN_FUZZY_RATIO:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= MIN_FUZZY_RATIO:
+                ratios[place] = max(ratio, ratios.get(place, 0.0))
+        if ratios:
+            best_ratio = max(ratios.values())
+            place, share = self._dominance([place for place, ratio in ratios.items() if ratio >= best_ratio - 0.02])
+            candidates.append(self._match(place, ratios[place] * share, qualified=region is not None))
+        return max(candidates, key=lambda candidate: candidate.confidence, default=None)
+
+    def geocode(self, query: str) -> Optional[dict]:
+        """A geocode result for a confidently matched place name, else None"""
+        match = self.match(query)
+        if match is None or match.confidence < self.min_confidence:
+            return None
+        return match.as_geocode()
+
+
+_gazetteer: Optional[Gazetteer] = None
+
+
+def gazetteer_loaded() -> bool:
+    return _gazetteer is not None
+
+
+def get_gazetteer() -> Gazetteer:
+    """The process-wide gazetteer, loaded on first use"""
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer.load()
+    return _gazetteer
+
+
+def geonames_rows(path: Path, countries: Optional[List[str]] = None, min_population: int = 0) -> Iterator[str]:
+    """Gazetteer rows of a GeoNames cities dump; the radius grows with population"""
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 15:
+                continue
+            name, latitude, longitude, country, admin1 = fields[1], fields[4], fields[5], fields[8], fields[10]
+            population = int(fields[14] or 0)
+            if countries and country not in countries or population < min_population:
+                continue
+            radius = int(min(max(10 * math.sqrt(population), 1500), 30000))
+            yield '\t'.join([name, '', admin1, country, latitude, longitude, str(radius), str(population)])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline gazetteer tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    importer = subcommands.add_parser("import-geonames", help="print gazetteer rows for a GeoNames cities dump")
+    importer.add_argument("path", type=Path)
+    importer.add_argument("--countries", help="comma-separated ISO country codes to keep")
+    importer.add_argument("--min-population", type=int, default=0)
+    lookup = subcommands.add_parser("lookup", help="show the best match for a place name")
+    lookup.add_argument("query")
+    args = parser.parse_args(argv)
+
+    if args.command == "import-geonames":
+        countries = args.countries.split(',') if args.countries else None
+        for row in geonames_rows(args.path, countries, args.min_population):
+            print(row)
+    else:
+        gazetteer = get_gazetteer()
+        match = gazetteer.match(args.query)
+        print(match, "(used)" if match and match.confidence >= gazetteer.min_confidence else "(falls back to Google)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
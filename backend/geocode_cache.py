@@ -0,0 +1,77 @@
+"""Shared cache of geocoding results in the ``geocode_cache`` collection.
+
+Entries are keyed by a normalized address and expire through a TTL index on
+``expires_at``, so every worker shares the same cached lookups.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from pymongo import UpdateOne
+
+GEOCODE_CACHE_TTL = timedelta(hours=float(os.environ.get('GEOCODE_CACHE_TTL_HOURS', '720')))
+
+
+def normalize_address(address: str) -> str:
+    """Case- and punctuation-insensitive cache key for an address"""
+    return " ".join(address.lower().replace(',', ' ').replace('.', ' ').split())
+
+
+async def ensure_indexes(database):
+    await database.geocode_cache.create_index("key", unique=True)
+    await database.geocode_cache.create_index("expires_at", expireAfterSeconds=0)
+
+
+async def get_cached_geocode(database, address: str) -> Optional[dict]:
+    """Cached geocode result for an address, or None when missing or expired"""
+    entry = await database.geocode_cache.find_one(
+        {"key": normalize_address(address), "expires_at": {"$gt": datetime.now(timezone.utc)}},
+        {"_id": 0, "result": 1}
+    )
+    return entry['result'] if entry else None
+
+
+async def get_cached_geocodes(database, keys: Iterable[str]) -> Dict[str, dict]:
+    """Unexpired cached results by normalized address key, in one query"""
+    entries = database.geocode_cache.find(
+        {"key": {"$in": list(keys)}, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+        {"_id": 0, "key": 1, "result": 1}
+    )
+    return {entry['key']: entry['result'] async for entry in entries}
+
+
+def _cache_entry(address: str, result: dict) -> dict:
+    refreshed_at = datetime.now(timezone.utc)
+    return {
+        "address": address,
+        "result": result,
+        "refreshed_at": refreshed_at,
+        "expires_at": refreshed_at + GEOCODE_CACHE_TTL,
+    }
+
+
+async def store_geocode(database, address: str, result: dict):
+    await database.geocode_cache.update_one(
+        {"key": normalize_address(address)},
+        {"$set": _cache_entry(address, result)},
+        upsert=True
+    )
+
+
+async def store_geocodes(database, results: Dict[str, dict]):
+    """Upsert many address -> result entries in one bulk write"""
+    if results:
+        await database.geocode_cache.bulk_write([
+            UpdateOne({"key": normalize_address(address)}, {"$set": _cache_entry(address, result)}, upsert=True)
+            for address, result in results.items()
+        ], ordered=False)
+
+
+async def geocode_expiry(database, address: str) -> Optional[datetime]:
+    entry = await database.geocode_cache.find_one({"key": normalize_address(address)}, {"_id": 0, "expires_at": 1})
+    return _as_utc(entry['expires_at']) if entry else None
+
+
+def _as_utc(value: datetime) -> datetime:
+    # pymongo returns naive UTC datetimes unless the client is tz_aware
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
@@ -0,0 +1,4 @@
+"""End-to-end load testing for the On-the-Cheap API.
+
+Run from the backend directory:  python -m loadtest.run --help
+"""
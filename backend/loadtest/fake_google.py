@@ -0,0 +1,118 @@
+"""Local stand-in for the Google Places (New) and Geocoding APIs.
+
+Serves ``POST /v1/places:searchNearby`` and ``GET /maps/api/geocode/json`` with
+deterministic synthetic data. Latency and failure behaviour are configured with:
+
+    FAKE_GOOGLE_LATENCY_MS        mean added latency per call (default 80)
+    FAKE_GOOGLE_LATENCY_JITTER_MS uniform jitter around the mean (default 40)
+    FAKE_GOOGLE_ERROR_RATE        fraction of calls answered with HTTP 500 (default 0)
+    FAKE_GOOGLE_TIMEOUT_RATE      fraction of calls that hang for 35 seconds (default 0)
+
+Run:  python -m uvicorn loadtest.fake_google:app --port 9100
+"""
+import asyncio
+import hashlib
+import os
+import random
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from loadtest.synthetic import CUISINES, METRO_CENTERS, NAME_PREFIXES, NAME_SUFFIXES, random_point
+
+LATENCY_MS = float(os.environ.get('FAKE_GOOGLE_LATENCY_MS', '80'))
+LATENCY_JITTER_MS = float(os.environ.get('FAKE_GOOGLE_LATENCY_JITTER_MS', '40'))
+ERROR_RATE = float(os.environ.get('FAKE_GOOGLE_ERROR_RATE', '0'))
+TIMEOUT_RATE = float(os.environ.get('FAKE_GOOGLE_TIMEOUT_RATE', '0'))
+
+PLACE_TYPES = ["restaurant", "bar", "cafe", "meal_takeaway"]
+stats = {"places": 0, "geocode": 0, "errors": 0, "timeouts": 0}
+
+
+async def simulate_network():
+    """Sleep for the configured latency; return an error response if this call should fail"""
+    roll = random.random()
+    if roll < TIMEOUT_RATE:
+        stats["timeouts"] += 1
+        await asyncio.sleep(35)
+    delay = max(0.0, LATENCY_MS + random.uniform(-LATENCY_JITTER_MS, LATENCY_JITTER_MS))
+    await asyncio.sleep(delay / 1000)
+    if roll < TIMEOUT_RATE + ERROR_RATE:
+        stats["errors"] += 1
+        return JSONResponse({"error": {"code": 500, "message": "Injected failure"}}, status_code=500)
+    return None
+
+
+def _seeded_rng(*parts) -> random.Random:
+    digest = hashlib.sha1(":".join(str(p) for p in parts).encode()).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+async def search_nearby(request: Request):
+    stats["places"] += 1
+    error = await simulate_network()
+    if error:
+        return error
+
+    body = await request.json()
+    circle = body.get("locationRestriction", {}).get("circle", {})
+    center = circle.get("center", {})
+    latitude = float(center.get("latitude", 0))
+    longitude = float(center.get("longitude", 0))
+    radius = float(circle.get("radius", 5000))
+    count = int(body.get("maxResultCount", 20))
+
+    # Same area -> same places, like the real API
+    rng = _seeded_rng(round(latitude, 3), round(longitude, 3), int(radius), body.get("textQuery"))
+    places = []
+    for i in range(count):
+        place_lat, place_lon = random_point(rng, latitude, longitude, radius)
+        place_id = f"fake{rng.getrandbits(48):012x}"
+        places.append({
+            "id": place_id,
+            "displayName": {"text": f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)}", "languageCode": "en"},
+            "types": rng.sample(PLACE_TYPES, rng.randint(1, 2)) + ["food", "point_of_interest"],
+            "rating": round(rng.uniform(3.0, 5.0), 1),
+            "priceLevel": rng.choice(["PRICE_LEVEL_INEXPENSIVE", "PRICE_LEVEL_MODERATE", None]),
+            "location": {"latitude": place_lat, "longitude": place_lon},
+            "formattedAddress": f"{rng.randint(1, 9999)} {rng.choice(CUISINES)} Ave",
+            "nationalPhoneNumber": f"(555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+            "websiteUri": f"https://{place_id}.example.com",
+        })
+    return JSONResponse({"places": places})
+
+
+async def geocode(request: Request):
+    stats["geocode"] += 1
+    error = await simulate_network()
+    if error:
+        return error
+
+    address = request.query_params.get("address", "")
+    for name, latitude, longitude in METRO_CENTERS:
+        if name.lower() in address.lower():
+            break
+    else:
+        if "nowhere" in address.lower():
+            return JSONResponse({"status": "ZERO_RESULTS", "results": []})
+        _, latitude, longitude = _seeded_rng(address).choice(METRO_CENTERS)
+    return JSONResponse({
+        "status": "OK",
+        "results": [{
+            "formatted_address": address or "Unknown",
+            "geometry": {"location": {"lat": latitude, "lng": longitude}},
+        }],
+    })
+
+
+async def get_stats(request: Request):
+    return JSONResponse(stats)
+
+
+app = Starlette(routes=[
+    Route("/v1/places:searchNearby", search_nearby, methods=["POST"]),
+    Route("/maps/api/geocode/json", geocode, methods=["GET"]),
+    Route("/stats", get_stats, methods=["GET"]),
+])
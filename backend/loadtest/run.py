@@ -0,0 +1,392 @@
+"""Drive a realistic endpoint mix against a locally started API and report latencies.
+
+The harness:
+  1. seeds a MongoDB database with a synthetic catalog (``--restaurants``),
+  2. starts the fake Google server and the API pointed at it and at that database,
+  3. runs ``--concurrency`` clients for ``--duration`` seconds over the endpoint mix,
+  4. prints per-route throughput and p50/p95/p99 and writes them as JSON.
+
+Example (from the backend directory, with a local mongod on the default port):
+
+    python -m loadtest.run --restaurants 100000 --duration 60 --concurrency 64 \\
+        --fake-latency-ms 120 --fake-error-rate 0.02 --output results.json
+
+Pass ``--compare previous.json`` to print the change against an earlier run and
+``--app-url`` to target an API that is already running instead of starting one.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from loadtest.synthetic import CUISINES, METRO_CENTERS, SPECIAL_TYPES, random_point, synthetic_catalog
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Relative weights of each scenario in the endpoint mix
+DEFAULT_MIX = {
+    "search_nearby": 45,
+    "search_special_type": 15,
+    "search_query": 10,
+    "restaurant_detail": 12,
+    "special_types": 3,
+    "geocode": 5,
+    "favorites": 7,
+    "add_favorite": 3,
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed_catalog(mongo_url: str, db_name: str, count: int, seed: int, batch_size: int = 5000) -> None:
+    """Replace the restaurants collection with a synthetic catalog"""
+    from pymongo import MongoClient
+
+    mongo = MongoClient(mongo_url)
+    try:
+        database = mongo[db_name]
+        database.restaurants.drop()
+        batch = []
+        started = time.perf_counter()
+        for restaurant in synthetic_catalog(count, seed=seed):
+            batch.append(restaurant)
+            if len(batch) >= batch_size:
+                database.restaurants.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            database.restaurants.insert_many(batch, ordered=False)
+        database.restaurants.create_index("id")
+        print(f"Seeded {count} restaurants in {time.perf_counter() - started:.1f}s")
+    finally:
+        mongo.close()
+
+
+def sample_restaurant_ids(mongo_url: str, db_name: str, size: int = 2000) -> List[str]:
+    from pymongo import MongoClient
+
+    mongo = MongoClient(mongo_url)
+    try:
+        pipeline = [{"$sample": {"size": size}}, {"$project": {"_id": 0, "id": 1}}]
+        return [doc["id"] for doc in mongo[db_name].restaurants.aggregate(pipeline)]
+    finally:
+        mongo.close()
+
+
+def start_process(args: List[str], env: dict, log_path: Path) -> subprocess.Popen:
+    log_file = open(log_path, "w")
+    return subprocess.Popen(args, cwd=BACKEND_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+async def wait_until_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2.0) as http:
+        while time.monotonic() < deadline:
+            try:
+                response = await http.get(url)
+                if response.status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class Recorder:
+    """Collects per-route latency samples and status codes"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def record(self, route: str, elapsed: float, status: Optional[int]) -> None:
+        self.samples.setdefault(route, []).append(elapsed)
+        statuses = self.statuses.setdefault(route, {})
+        key = str(status) if status is not None else "transport_error"
+        statuses[key] = statuses.get(key, 0) + 1
+        if status is None or status >= 500:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, duration: float) -> dict:
+        routes = {}
+        all_samples = []
+        for route, values in sorted(self.samples.items()):
+            values.sort()
+            all_samples.extend(values)
+            routes[route] = self._stats(values, self.errors.get(route, 0), duration)
+            routes[route]["statuses"] = self.statuses.get(route, {})
+        all_samples.sort()
+        overall = self._stats(all_samples, sum(self.errors.values()), duration)
+        return {"routes": routes, "overall": overall}
+
+    @staticmethod
+    def _stats(values: List[float], errors: int, duration: float) -> dict:
+        count = len(values)
+        return {
+            "requests": count,
+            "errors": errors,
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "throughput_rps": round(count / duration, 2) if duration else 0.0,
+            "mean_ms": round(sum(values) / count * 1000, 2) if count else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+        }
+
+
+class Scenario:
+    """Builds the requests of the endpoint mix"""
+
+    def __init__(self, restaurant_ids: List[str], tokens: List[str], seed: int):
+        self.rng = random.Random(seed)
+        self.restaurant_ids = restaurant_ids or ["missing"]
+        self.tokens = tokens
+
+    def _location(self) -> dict:
+        _, latitude, longitude = self.rng.choice(METRO_CENTERS)
+        latitude, longitude = random_point(self.rng, latitude, longitude, 10000)
+        return {
+            "latitude": latitude,
+            "longitude": longitude,
+            "radius": self.rng.choice([1609, 3219, 8047, 16093]),
+            "limit": self.rng.choice([20, 20, 50]),
+        }
+
+    def _auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"} if self.tokens else {}
+
+    def build(self, name: str):
+        """Return (route label, method, path, params, headers)"""
+        if name == "search_nearby":
+            return "GET /api/restaurants/search", "GET", "/api/restaurants/search", self._location(), {}
+        if name == "search_special_type":
+            params = self._location()
+            params["special_type"] = self.rng.choice(SPECIAL_TYPES)
+            return "GET /api/restaurants/search?special_type", "GET", "/api/restaurants/search", params, {}
+        if name == "search_query":
+            params = self._location()
+            params["query"] = self.rng.choice(CUISINES).lower()
+            return "GET /api/restaurants/search?query", "GET", "/api/restaurants/search", params, {}
+        if name == "restaurant_detail":
+            restaurant_id = self.rng.choice(self.restaurant_ids)
+            return "GET /api/restaurants/{id}", "GET", f"/api/restaurants/{restaurant_id}", {}, {}
+        if name == "special_types":
+            return "GET /api/specials/types", "GET", "/api/specials/types", {}, {}
+        if name == "geocode":
+            city = self.rng.choice(METRO_CENTERS)[0]
+            return "GET /api/geocode", "GET", "/api/geocode", {"address": f"{self.rng.randint(1, 999)} Main St, {city}"}, {}
+        if name == "favorites" and self.tokens:
+            return "GET /api/users/favorites", "GET", "/api/users/favorites", {}, self._auth()
+        if name == "add_favorite" and self.tokens:
+            restaurant_id = self.rng.choice(self.restaurant_ids)
+            return "POST /api/users/favorites/{id}", "POST", f"/api/users/favorites/{restaurant_id}", {}, self._auth()
+        return self.build("search_nearby")
+
+
+async def register_users(http: httpx.AsyncClient, count: int) -> List[str]:
+    tokens = []
+    run_id = int(time.time())
+    for i in range(count):
+        response = await http.post("/api/users/register", json={
+            "email": f"loadtest-{run_id}-{i}@example.com",
+            "password": "loadtest-password",
+            "first_name": "Load",
+            "last_name": f"Tester{i}",
+        })
+        if response.status_code == 200:
+            tokens.append(response.json()["access_token"])
+    return tokens
+
+
+async def drive(app_url: str, mix: Dict[str, int], restaurant_ids: List[str], users: int,
+                concurrency: int, duration: float, warmup: float, seed: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=60.0, limits=limits) as http:
+        tokens = await register_users(http, users)
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        recorder = Recorder()
+        measure_from = time.monotonic() + warmup
+        deadline = measure_from + duration
+
+        async def client_loop(worker: int):
+            scenario = Scenario(restaurant_ids, tokens, seed + worker)
+            while time.monotonic() < deadline:
+                name = scenario.rng.choices(names, weights)[0]
+                route, method, path, params, headers = scenario.build(name)
+                issued_at = time.monotonic()
+                started = time.perf_counter()
+                try:
+                    response = await http.request(method, path, params=params, headers=headers)
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = None
+                elapsed = time.perf_counter() - started
+                if issued_at >= measure_from:
+                    recorder.record(route, elapsed, status)
+
+        await asyncio.gather(*(client_loop(i) for i in range(concurrency)))
+        return recorder.summary(duration)
+
+
+def print_report(results: dict, baseline: Optional[dict] = None) -> None:
+    header = f"{'route':48} {'req':>7} {'rps':>8} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = list(results["routes"].items()) + [("OVERALL", results["overall"])]
+    for route, stats in rows:
+        line = (f"{route:48} {stats['requests']:>7} {stats['throughput_rps']:>8.1f} "
+                f"{stats['error_rate'] * 100:>5.1f}% {stats['p50_ms']:>8.1f}m {stats['p95_ms']:>8.1f}m "
+                f"{stats['p99_ms']:>8.1f}m")
+        if baseline:
+            previous = baseline["overall"] if route == "OVERALL" else baseline.get("routes", {}).get(route)
+            if previous and previous.get("p95_ms"):
+                change = (stats["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100
+                line += f"  p95 {change:+.1f}%"
+        print(line)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, int]:
+    """Parse ``name=weight,name=weight`` overrides on top of the default mix"""
+    mix = dict(DEFAULT_MIX)
+    if value:
+        for item in value.split(","):
+            name, _, weight = item.partition("=")
+            if name.strip() not in DEFAULT_MIX:
+                raise SystemExit(f"Unknown scenario '{name}'. Known: {', '.join(DEFAULT_MIX)}")
+            mix[name.strip()] = int(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.environ.get("LOADTEST_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="on_the_cheap_loadtest")
+    parser.add_argument("--restaurants", type=int, default=100000, help="synthetic catalog size")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the catalog already in --db-name")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--duration", type=float, default=60.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=20, help="registered users for authenticated scenarios")
+    parser.add_argument("--mix", help="weight overrides, e.g. search_nearby=80,geocode=0")
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes (>1 uses gunicorn)")
+    parser.add_argument("--fake-latency-ms", type=float, default=80.0)
+    parser.add_argument("--fake-jitter-ms", type=float, default=40.0)
+    parser.add_argument("--fake-error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-timeout-rate", type=float, default=0.0)
+    parser.add_argument("--app-url", help="target an already running API instead of starting one")
+    parser.add_argument("--output", default="loadtest-results.json")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    processes = []
+    log_dir = Path(args.output).resolve().parent
+    try:
+        app_url = args.app_url
+        if not app_url:
+            if not args.skip_seed:
+                seed_catalog(args.mongo_url, args.db_name, args.restaurants, args.seed)
+
+            fake_port = free_port()
+            fake_env = dict(os.environ,
+                            FAKE_GOOGLE_LATENCY_MS=str(args.fake_latency_ms),
+                            FAKE_GOOGLE_LATENCY_JITTER_MS=str(args.fake_jitter_ms),
+                            FAKE_GOOGLE_ERROR_RATE=str(args.fake_error_rate),
+                            FAKE_GOOGLE_TIMEOUT_RATE=str(args.fake_timeout_rate))
+            processes.append(start_process(
+                [sys.executable, "-m", "uvicorn", "loadtest.fake_google:app", "--port", str(fake_port), "--log-level", "warning"],
+                fake_env, log_dir / "loadtest-fake-google.log"))
+            fake_url = f"http://127.0.0.1:{fake_port}"
+
+            app_port = free_port()
+            app_env = dict(os.environ,
+                           MONGO_URL=args.mongo_url,
+                           DB_NAME=args.db_name,
+                           GOOGLE_PLACES_API_KEY="loadtest-key",
+                           GOOGLE_PLACES_URL=f"{fake_url}/v1/places:searchNearby",
+                           GOOGLE_GEOCODE_URL=f"{fake_url}/maps/api/geocode/json",
+                           CATALOG_SNAPSHOT_DIR=str(log_dir / "loadtest-snapshot"),
+                           PORT=str(app_port),
+                           WEB_CONCURRENCY=str(args.workers))
+            if args.workers > 1:
+                command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "server:app"]
+            else:
+                command = [sys.executable, "-m", "uvicorn", "server:app", "--port", str(app_port), "--log-level", "warning"]
+            processes.append(start_process(command, app_env, log_dir / "loadtest-app.log"))
+            app_url = f"http://127.0.0.1:{app_port}"
+            asyncio.run(wait_until_ready(f"{fake_url}/stats"))
+
+        asyncio.run(wait_until_ready(f"{app_url}/api/", timeout=300.0))
+        restaurant_ids = sample_restaurant_ids(args.mongo_url, args.db_name)
+
+        print(f"Driving {app_url} with {args.concurrency} clients for {args.duration:.0f}s")
+        summary = asyncio.run(drive(app_url, mix, restaurant_ids, args.users, args.concurrency,
+                                    args.duration, args.warmup, args.seed))
+        results = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "git_revision": git_revision(),
+                "restaurants": args.restaurants,
+                "concurrency": args.concurrency,
+                "duration_s": args.duration,
+                "workers": args.workers,
+                "mix": mix,
+                "fake_google": {
+                    "latency_ms": args.fake_latency_ms,
+                    "jitter_ms": args.fake_jitter_ms,
+                    "error_rate": args.fake_error_rate,
+                    "timeout_rate": args.fake_timeout_rate,
+                },
+            },
+            **summary,
+        }
+
+        baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+        print_report(results, baseline)
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}")
+        return 0
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
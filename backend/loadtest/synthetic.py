@@ -0,0 +1,128 @@
+"""Synthetic restaurant catalog generation for load tests and benchmarks."""
+import math
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Tuple
+
+# (name, latitude, longitude) of the metro areas the synthetic catalog is spread over
+METRO_CENTERS: List[Tuple[str, float, float]] = [
+    ("San Francisco", 37.7749, -122.4194),
+    ("Oakland", 37.8044, -122.2712),
+    ("Los Angeles", 34.0522, -118.2437),
+    ("Seattle", 47.6062, -122.3321),
+    ("Chicago", 41.8781, -87.6298),
+    ("New York", 40.7128, -74.0060),
+    ("Austin", 30.2672, -97.7431),
+    ("Denver", 39.7392, -104.9903),
+]
+
+CUISINES = [
+    "American", "Bar", "Italian", "Mexican", "Chinese", "Japanese", "Thai", "Indian",
+    "Diner", "Cafe", "Breakfast", "Sports Bar", "Pizza", "Seafood", "Vegan", "Family",
+]
+NAME_PREFIXES = [
+    "Tony's", "Mama's", "Golden", "Blue", "Sunset", "Lucky", "Harbor", "Old Town",
+    "Corner", "Little", "Big Sky", "Red Door", "Union", "Mission", "Bayside", "Uptown",
+]
+NAME_SUFFIXES = [
+    "Tavern", "Kitchen", "Diner", "Cafe", "Grill", "Bistro", "Cantina", "Pub",
+    "Taqueria", "Noodle House", "Pizzeria", "Sports Bar", "Brasserie", "Eatery",
+]
+SPECIAL_TYPES = [
+    "happy_hour", "lunch_special", "dinner_special", "blue_plate", "daily_special", "weekend_special",
+]
+SPECIAL_TITLES = {
+    "happy_hour": ["Half Price Appetizers", "$3 Well Drinks", "$2 Draft Beers", "Wine Wednesday"],
+    "lunch_special": ["Soup & Sandwich", "Pasta & Salad", "Bento Box Lunch", "Taco Plate"],
+    "dinner_special": ["Steak Night", "Family Pasta Dinner", "Prix Fixe for Two"],
+    "blue_plate": ["Blue Plate Special", "Meatloaf Plate", "Chicken Fried Steak"],
+    "daily_special": ["Taco Tuesday", "Wing Wednesday", "Burger Monday", "Fish Fry Friday"],
+    "weekend_special": ["Weekend Brunch", "Bottomless Mimosas", "Saturday BBQ Platter"],
+}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+WEEKEND = ["saturday", "sunday"]
+METERS_PER_DEGREE = 111320.0
+# Timestamps are drawn from the year before this fixed instant, so a seed always yields the same catalog
+SYNTHETIC_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+YEAR_SECONDS = 365 * 24 * 3600
+
+
+def random_point(rng: random.Random, latitude: float, longitude: float, max_meters: float) -> Tuple[float, float]:
+    """Random point within max_meters of a center (approximate, small radii)"""
+    distance = max_meters * math.sqrt(rng.random())
+    bearing = rng.random() * 2 * math.pi
+    dlat = distance * math.cos(bearing) / METERS_PER_DEGREE
+    dlon = distance * math.sin(bearing) / (METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+    return round(latitude + dlat, 6), round(longitude + dlon, 6)
+
+
+def synthetic_id(rng: random.Random) -> str:
+    """A UUID4-shaped id drawn from ``rng``"""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def synthetic_timestamp(rng: random.Random) -> str:
+    """An ISO timestamp within the year before SYNTHETIC_EPOCH, drawn from ``rng``"""
+    return (SYNTHETIC_EPOCH - timedelta(seconds=rng.randrange(YEAR_SECONDS))).isoformat()
+
+
+def synthetic_special(rng: random.Random) -> dict:
+    """A single special with a realistic schedule"""
+    special_type = rng.choice(SPECIAL_TYPES)
+    if special_type == "weekend_special":
+        days = list(WEEKEND)
+    elif special_type == "daily_special":
+        days = [rng.choice(WEEKDAYS + WEEKEND)]
+    else:
+        days = rng.sample(WEEKDAYS + WEEKEND, rng.randint(3, 7))
+    start_hour = {
+        "happy_hour": rng.randint(15, 17),
+        "lunch_special": 11,
+        "dinner_special": rng.randint(17, 19),
+        "weekend_special": rng.randint(9, 11),
+    }.get(special_type, rng.randint(8, 18))
+    end_hour = min(start_hour + rng.randint(2, 6), 23)
+    original_price = round(rng.uniform(6, 40), 2)
+    return {
+        "id": synthetic_id(rng),
+        "title": rng.choice(SPECIAL_TITLES[special_type]),
+        "description": "Synthetic special generated for load testing",
+        "special_type": special_type,
+        "price": round(original_price * rng.uniform(0.4, 0.85), 2),
+        "original_price": original_price,
+        "days_available": days,
+        "time_start": f"{start_hour:02d}:{rng.choice(['00', '30'])}",
+        "time_end": f"{end_hour:02d}:00",
+        "is_active": rng.random() > 0.05,
+        "created_at": synthetic_timestamp(rng),
+    }
+
+
+def synthetic_restaurant(rng: random.Random, specials: int = None, metro_radius: float = 15000) -> dict:
+    """A single restaurant document in the shape stored in db.restaurants"""
+    _, center_lat, center_lon = rng.choice(METRO_CENTERS)
+    latitude, longitude = random_point(rng, center_lat, center_lon, metro_radius)
+    if specials is None:
+        specials = min(int(rng.expovariate(1 / 3)) + 1, 200)
+    return {
+        "id": synthetic_id(rng),
+        "name": f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)}",
+        "address": f"{rng.randint(1, 9999)} Synthetic St",
+        "location": {"latitude": latitude, "longitude": longitude},
+        "phone": f"+1-555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+        "website": None,
+        "cuisine_type": rng.sample(CUISINES, rng.randint(1, 3)),
+        "rating": round(rng.uniform(3.0, 5.0), 1),
+        "price_level": rng.randint(1, 4),
+        "specials": [synthetic_special(rng) for _ in range(specials)],
+        "is_verified": True,
+        "created_at": synthetic_timestamp(rng),
+    }
+
+
+def synthetic_catalog(count: int, seed: int = 42, specials: int = None) -> Iterator[dict]:
+    """Yield ``count`` deterministic synthetic restaurants"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield synthetic_restaurant(rng, specials=specials)
@@ -0,0 +1,203 @@
+"""Event-loop lag, and a watchdog for callbacks that block the loop.
+
+A heartbeat task on the loop stamps the time every LOOP_WATCHDOG_INTERVAL_MS.
+How late each beat wakes up is the loop lag, reported as
+``event_loop_lag_seconds`` and ``event_loop_lag_current_seconds``. The
+heartbeat always runs; with LOOP_WATCHDOG=false only the thread below is off.
+
+A watchdog thread checks the stamp. When the heartbeat is late by more than
+LOOP_WATCHDOG_THRESHOLD_MS, something is running on the loop without yielding:
+for example hashing, JWT work, a large sort or synchronous I/O. The thread then
+captures the loop thread's stack while that code is still running, and logs it
+once per stall.
+
+When the loop resumes, the stall is counted in ``event_loop_blocks_total`` by
+``site`` (the innermost frame in the backend's own code, e.g.
+``server.py:hash_password``). Its duration goes to
+``event_loop_block_duration_seconds``. The watchdog only reads timestamps and
+frames, so it adds no work to requests.
+
+Strict mode (LOOP_WATCHDOG_STRICT=true) keeps every stall, so tests can fail on
+them. Load this module as a pytest plugin with ``pytest_plugins = ["loop_watchdog"]``
+in conftest.py, as tests/conftest.py does. The plugin turns strict mode on. It
+fails any test whose setup or body blocked the loop, and puts the captured
+stacks in the failure.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import traceback
+from collections import deque
+from pathlib import Path
+from time import monotonic
+from typing import List, Optional
+
+from metrics import EVENT_LOOP_BLOCK_DURATION, EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG, EVENT_LOOP_LAG_CURRENT
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+RECENT_BLOCKS = 50
+# Stalls seen in strict mode, across all watchdogs; tests take them with take_blocks()
+_strict_blocks: List["Block"] = []
+_strict_lock = threading.Lock()
+
+
+def strict_mode() -> bool:
+    return os.environ.get('LOOP_WATCHDOG_STRICT', 'false').lower() in ('1', 'true', 'yes')
+
+
+class Block:
+    """One stall: where the loop was stuck, and for how long once it resumed"""
+
+    __slots__ = ('site', 'stack', 'detected_after', 'duration')
+
+    def __init__(self, site: str, stack: str, detected_after: float):
+        self.site = site
+        self.stack = stack
+        self.detected_after = detected_after
+        self.duration: Optional[float] = None
+
+    def describe(self) -> str:
+        held = f"{self.duration * 1000:.0f}ms" if self.duration is not None else f">{self.detected_after * 1000:.0f}ms"
+        return f"event loop blocked {held} in {self.site}\n{self.stack}"
+
+
+def _site(frame) -> str:
+    """The innermost frame in the backend's own code, else the innermost frame"""
+    innermost = None
+    while frame is not None:
+        code = frame.f_code
+        innermost = innermost or f"{Path(code.co_filename).name}:{code.co_name}"
+        path = Path(code.co_filename)
+        if path.parent == ROOT_DIR and path.name != Path(__file__).name:
+            return f"{path.name}:{code.co_name}"
+        frame = frame.f_back
+    return innermost or 'unknown'
+
+
+class LoopWatchdog:
+    def __init__(self):
+        self.threshold = float(os.environ.get('LOOP_WATCHDOG_THRESHOLD_MS', '100')) / 1000
+        self.interval = float(os.environ.get('LOOP_WATCHDOG_INTERVAL_MS', '20')) / 1000
+        self.recent = deque(maxlen=RECENT_BLOCKS)
+        self._beat = 0.0
+        self._loop_thread: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._stopped: Optional[threading.Event] = None
+
+    @property
+    def strict(self) -> bool:
+        # Read on use, so a test plugin loaded after this module still turns strict mode on
+        return strict_mode()
+
+    @staticmethod
+    def enabled() -> bool:
+        return os.environ.get('LOOP_WATCHDOG', 'true').lower() in ('1', 'true', 'yes')
+
+    async def _heartbeat(self):
+        self._beat = monotonic()
+        while True:
+            await asyncio.sleep(self.interval)
+            beat = monotonic()
+            lag = max(0.0, beat - self._beat - self.interval)
+            self._beat = beat
+            EVENT_LOOP_LAG.observe(lag)
+            EVENT_LOOP_LAG_CURRENT.set(lag)
+
+    def _capture(self, lag: float) -> Optional[Block]:
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return None
+        block = Block(_site(frame), ''.join(traceback.format_stack(frame)), lag)
+        logger.warning(f"Event loop blocked for more than {lag * 1000:.0f}ms in {block.site}:\n{block.stack}")
+        self.recent.append(block)
+        if self.strict:
+            with _strict_lock:
+                _strict_blocks.append(block)
+        return block
+
+    def _finish(self, block: Block, stalled_beat: float):
+        # The heartbeat that ended the stall was due one interval after the last one
+        block.duration = max(block.detected_after, self._beat - stalled_beat - self.interval)
+        EVENT_LOOP_BLOCKS.labels(site=block.site).inc()
+        EVENT_LOOP_BLOCK_DURATION.observe(block.duration)
+
+    def _watch(self, stopped: threading.Event):
+        block, stalled_beat = None, 0.0
+        while not stopped.wait(self.interval):
+            beat = self._beat
+            if block is not None:
+                if beat != stalled_beat:
+                    self._finish(block, stalled_beat)
+                    block = None
+                continue
+            lag = monotonic() - beat - self.interval
+            if lag >= self.threshold:
+                block, stalled_beat = self._capture(lag), beat
+
+    def start(self):
+        if self._heartbeat_task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = monotonic()
+        # A fresh event per run, so a previous thread that has not woken yet still exits
+        self._stopped = threading.Event()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        if self.enabled():
+            threading.Thread(target=self._watch, args=(self._stopped,), name='loop-watchdog', daemon=True).start()
+
+    async def stop(self):
+        if self._heartbeat_task is None:
+            return
+        self._stopped.set()
+        self._heartbeat_task.cancel()
+        try:
+            await self._heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        self._heartbeat_task = None
+
+    def status(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "strict": self.strict,
+            "recent_blocks": [
+                {"site": block.site, "duration_ms": round(block.duration * 1000, 1) if block.duration else None}
+                for block in self.recent
+            ],
+        }
+
+
+def take_blocks() -> List[Block]:
+    """Stalls recorded in strict mode since the last call"""
+    with _strict_lock:
+        blocks = list(_strict_blocks)
+        _strict_blocks.clear()
+    return blocks
+
+
+try:
+    import pytest
+except ImportError:  # only test suites load this module as a plugin
+    pytest = None
+
+if pytest is not None:
+    def pytest_configure(config):
+        os.environ.setdefault('LOOP_WATCHDOG_STRICT', 'true')
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_setup(item):
+        take_blocks()
+        return (yield)
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(item):
+        """Fail the test if the event loop was blocked during its setup or body"""
+        result = yield
+        blocks = take_blocks()
+        if blocks:
+            pytest.fail("\n\n".join(block.describe() for block in blocks), pytrace=False)
+        return result
@@ -0,0 +1,128 @@
+"""Grid clustering of catalog restaurants for zoomed-out map views.
+
+Clusters are cells of the web-mercator tile grid: a tile at zoom z is split into
+CELLS_PER_SIDE x CELLS_PER_SIDE cells (the tiles of zoom z + 3), and every
+restaurant with specials a search would show is counted in the cell it falls
+in. A cluster carries its restaurant count, centroid and the position of the
+restaurant with the best deal (largest discount, then rating).
+
+Computed tiles are kept in a per-process LRU keyed by (zoom, x, y, filter).
+An entry is only served for the catalog snapshot version it was computed from,
+so any restaurant or special write (which publishes a new version) invalidates
+it, and for at most MAP_TILE_TTL_SECONDS because "active now" moves with the
+clock.
+"""
+import math
+import os
+from collections import OrderedDict
+from datetime import datetime
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+from compact_catalog import CompactCatalog
+
+MAX_ZOOM = 20
+CELL_ZOOM_OFFSET = 3
+CELLS_PER_SIDE = 1 << CELL_ZOOM_OFFSET
+MAX_TILES_PER_REQUEST = 64
+MAX_MERCATOR_LATITUDE = 85.05112878
+
+
+def tile_coordinates(latitude: float, longitude: float, zoom: int) -> Tuple[float, float]:
+    """Fractional web-mercator tile x, y of a point"""
+    latitude = max(-MAX_MERCATOR_LATITUDE, min(MAX_MERCATOR_LATITUDE, latitude))
+    scale = 1 << zoom
+    x = (longitude + 180.0) / 360.0 * scale
+    lat_rad = math.radians(latitude)
+    y = (1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * scale
+    return min(max(x, 0.0), scale - 1e-9), min(max(y, 0.0), scale - 1e-9)
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) of a tile"""
+    scale = 1 << zoom
+
+    def latitude(tile_y: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / scale))))
+
+    return latitude(y + 1), x / scale * 360.0 - 180.0, latitude(y), (x + 1) / scale * 360.0 - 180.0
+
+
+def tiles_covering(min_lat: float, min_lon: float, max_lat: float, max_lon: float, zoom: int) -> List[Tuple[int, int]]:
+    """Tiles (x, y) intersecting a bounding box; a box with min_lon > max_lon crosses the antimeridian"""
+    scale = 1 << zoom
+    left, top = tile_coordinates(max_lat, min_lon, zoom)
+    right, bottom = tile_coordinates(min_lat, max_lon, zoom)
+    if min_lon <= max_lon:
+        columns = range(int(left), int(right) + 1)
+    else:
+        columns = [*range(int(left), scale), *range(0, int(right) + 1)]
+    return [(x, y) for x in columns for y in range(int(top), int(bottom) + 1)]
+
+
+def cluster_tile(catalog: CompactCatalog, zoom: int, x: int, y: int, now: datetime,
+                 special_type: Optional[str] = None) -> List[dict]:
+    """Clusters of one tile, each with count, centroid and ``best_position``"""
+    min_lat, min_lon, max_lat, max_lon = tile_bounds(zoom, x, y)
+    cell_zoom = zoom + CELL_ZOOM_OFFSET
+    latitudes, longitudes, ratings = catalog.latitudes, catalog.longitudes, catalog.ratings
+    cells: Dict[Tuple[int, int], list] = {}
+    for position, discount in catalog.deals(min_lat, min_lon, max_lat, max_lon, now, special_type):
+        latitude, longitude = latitudes[position], longitudes[position]
+        cell_x, cell_y = tile_coordinates(latitude, longitude, cell_zoom)
+        # Points on a shared edge belong to the tile that contains them in tile coordinates
+        if int(cell_x) >> CELL_ZOOM_OFFSET != x or int(cell_y) >> CELL_ZOOM_OFFSET != y:
+            continue
+        key = (int(cell_x), int(cell_y))
+        deal = (discount, ratings[position])
+        cell = cells.get(key)
+        if cell is None:
+            cells[key] = [1, latitude, longitude, deal, position]
+            continue
+        cell[0] += 1
+        cell[1] += latitude
+        cell[2] += longitude
+        if deal > cell[3]:
+            cell[3], cell[4] = deal, position
+
+    clusters = []
+    for (cell_x, cell_y), (count, latitude_sum, longitude_sum, deal, position) in sorted(cells.items()):
+        clusters.append({
+            "cell": f"{cell_zoom}/{cell_x}/{cell_y}",
+            "count": count,
+            "latitude": round(latitude_sum / count, 6),
+            "longitude": round(longitude_sum / count, 6),
+            "best_discount": round(deal[0], 3),
+            "best_position": position,
+        })
+    return clusters
+
+
+class TileCache:
+    def __init__(self):
+        self.max_entries = int(os.environ.get('MAP_TILE_CACHE_SIZE', '4096'))
+        self.ttl = float(os.environ.get('MAP_TILE_TTL_SECONDS', '60'))
+        self._entries: "OrderedDict[tuple, Tuple[int, float, List[dict]]]" = OrderedDict()
+
+    def get(self, key: tuple, version: int) -> Optional[List[dict]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry_version, computed_at, clusters = entry
+        if entry_version != version or monotonic() - computed_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return clusters
+
+    def put(self, key: tuple, version: int, clusters: List[dict]):
+        self._entries[key] = (version, monotonic(), clusters)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
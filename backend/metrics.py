@@ -0,0 +1,218 @@
+"""Prometheus instrumentation for the API.
+
+Exposes per-route latency and status counts, MongoDB command timings (via a
+pymongo command listener), outbound Google API calls, cache hit/miss counters
+and event-loop lag (sampled by loop_watchdog.py). Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (done by
+gunicorn.conf.py) so /metrics aggregates every worker.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import monitoring
+from starlette.requests import Request
+from starlette.responses import Response
+
+from query_budget import record_outbound
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ['method', 'route'], buckets=LATENCY_BUCKETS)
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'HTTP responses by route and status',
+    ['method', 'route', 'status'])
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'HTTP requests currently being served',
+    multiprocess_mode='livesum')
+
+MONGO_COMMAND_LATENCY = Histogram(
+    'mongo_command_duration_seconds', 'MongoDB command latency',
+    ['collection', 'operation'], buckets=FAST_BUCKETS)
+MONGO_COMMAND_FAILURES = Counter(
+    'mongo_command_failures_total', 'Failed MongoDB commands',
+    ['collection', 'operation'])
+
+OUTBOUND_LATENCY = Histogram(
+    'outbound_request_duration_seconds', 'Outbound API call latency',
+    ['service'], buckets=LATENCY_BUCKETS)
+OUTBOUND_REQUESTS = Counter(
+    'outbound_requests_total', 'Outbound API calls by outcome',
+    ['service', 'outcome'])
+
+CIRCUIT_STATE = Gauge(
+    'circuit_breaker_state', 'Circuit breaker state (0 closed, 1 half-open, 2 open)',
+    ['service'], multiprocess_mode='max')
+CIRCUIT_TRIPS = Counter(
+    'circuit_breaker_trips_total', 'Times a circuit breaker opened',
+    ['service'])
+CIRCUIT_REJECTIONS = Counter(
+    'circuit_breaker_rejections_total', 'Calls failed fast by an open circuit breaker',
+    ['service'])
+ADAPTIVE_TIMEOUT = Gauge(
+    'outbound_adaptive_timeout_seconds', 'Current adaptive timeout for outbound calls',
+    ['service'], multiprocess_mode='max')
+HEDGED_REQUESTS = Counter(
+    'outbound_hedged_requests_total', 'Hedged second requests and which attempt won',
+    ['service', 'winner'])
+
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by result',
+    ['cache', 'result'])
+
+EVENT_LOOP_LAG = Histogram(
+    'event_loop_lag_seconds', 'Delay between a scheduled wakeup and when it ran',
+    buckets=FAST_BUCKETS)
+EVENT_LOOP_LAG_CURRENT = Gauge(
+    'event_loop_lag_current_seconds', 'Most recent event-loop lag sample',
+    multiprocess_mode='max')
+EVENT_LOOP_BLOCKS = Counter(
+    'event_loop_blocks_total', 'Callbacks that held the event loop past the watchdog threshold',
+    ['site'])
+EVENT_LOOP_BLOCK_DURATION = Histogram(
+    'event_loop_block_duration_seconds', 'How long blocking callbacks held the event loop',
+    buckets=LATENCY_BUCKETS)
+
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    """Count cache hits or misses"""
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc(count)
+
+
+class OutboundCall:
+    """Result holder for ``track_outbound``; set ``status`` once a response arrives"""
+
+    __slots__ = ('status', 'outcome')
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.outcome: Optional[str] = None
+
+
+@contextmanager
+def track_outbound(service: str):
+    """Time an outbound API call and count its outcome.
+
+    The outcome is ``ok`` for 2xx responses, ``http_<status>`` otherwise, or the
+    exception class name when the call raised. Callers may set ``call.outcome``
+    to override it (e.g. an API-level error inside a 200 response).
+    """
+    record_outbound(service)
+    call = OutboundCall()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        call.outcome = call.outcome or type(e).__name__
+        raise
+    finally:
+        OUTBOUND_LATENCY.labels(service=service).observe(time.perf_counter() - started)
+        if call.outcome is None:
+            if call.status is None:
+                call.outcome = 'no_response'
+            elif 200 <= call.status < 300:
+                call.outcome = 'ok'
+            else:
+                call.outcome = f'http_{call.status}'
+        OUTBOUND_REQUESTS.labels(service=service, outcome=call.outcome).inc()
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Records MongoDB command timings by collection and operation"""
+
+    # Commands whose first value is not a collection name
+    _NON_COLLECTION_COMMANDS = {'getMore'}
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event):
+        return (event.request_id, event.connection_id, event.operation_id)
+
+    def started(self, event):
+        command = event.command
+        if event.command_name in self._NON_COLLECTION_COMMANDS:
+            collection = command.get('collection', 'unknown')
+        else:
+            collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.database_name
+        with self._lock:
+            self._pending[self._key(event)] = collection
+
+    def _finish(self, event):
+        with self._lock:
+            return self._pending.pop(self._key(event), 'unknown')
+
+    def succeeded(self, event):
+        collection = self._finish(event)
+        MONGO_COMMAND_LATENCY.labels(collection=collection, operation=event.command_name).observe(
+            event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        MONGO_COMMAND_LATENCY.labels(collection=collection, operation=event.command_name).observe(
+            event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(collection=collection, operation=event.command_name).inc()
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording latency and status per matched route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            # FastAPI stores the matched route in the (shared) scope during routing
+            route = scope.get('route')
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            method = scope.get('method', 'GET')
+            REQUEST_LATENCY.labels(method=method, route=route_path).observe(time.perf_counter() - started)
+            REQUEST_COUNT.labels(method=method, route=route_path, status=str(status_code)).inc()
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Prometheus scrape endpoint"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        data = generate_latest(registry)
+    else:
+        data = generate_latest()
+    return Response(data, media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,114 @@
+"""Opaque keyset cursors for paginated endpoints.
+
+A cursor encodes the sort key of the last item on a page (e.g. created_at and
+id, or distance and id). The next page is the range strictly after that key,
+read from an index in the same order, so pages stay stable while new documents
+are inserted and no page costs more than ``limit`` documents.
+"""
+import base64
+import heapq
+import json
+import math
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+# Cursor value types (see decode_cursor)
+NUMBER = (int, float)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value: Any) -> Any:
+    # Datetimes must round-trip as datetimes to compare correctly in Mongo
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and set(value) == {"$date"}:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def encode_cursor(*key: Any) -> str:
+    raw = json.dumps([_encode_value(value) for value in key], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _matches(value: Any, expected) -> bool:
+    expected = expected if isinstance(expected, tuple) else (expected,)
+    # bool is an int, but never a valid number in a sort key
+    if isinstance(value, bool) and bool not in expected:
+        return False
+    if isinstance(value, float) and not math.isfinite(value):
+        return False
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor: Optional[str], types: Sequence) -> Optional[Tuple]:
+    """Sort key from a cursor, or None for the first page.
+
+    ``types`` holds the type (or tuple of types) of each key value, so a crafted
+    cursor is rejected here instead of failing to compare with stored keys.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw)
+        if not isinstance(key, list) or len(key) != len(types):
+            raise InvalidCursor("Malformed cursor")
+        key = tuple(_decode_value(value) for value in key)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if not all(_matches(value, expected) for value, expected in zip(key, types)):
+        raise InvalidCursor("Malformed cursor")
+    return key
+
+
+def keyset_filter(fields: Sequence[str], key: Optional[Tuple], descending: bool = False) -> dict:
+    """Mongo filter for documents strictly after ``key`` in (fields...) order"""
+    if key is None:
+        return {}
+    op = '$lt' if descending else '$gt'
+    clauses = []
+    for i, field in enumerate(fields):
+        clause = {fields[j]: key[j] for j in range(i)}
+        clause[field] = {op: key[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def keyset_sort(fields: Sequence[str], descending: bool = False) -> List[Tuple[str, int]]:
+    direction = -1 if descending else 1
+    return [(field, direction) for field in fields]
+
+
+def split_page(items: List[dict], fields: Sequence[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """Split ``limit + 1`` fetched items into the page and the cursor for the next one"""
+    if len(items) <= limit:
+        return items, None
+    page = items[:limit]
+    last = page[-1]
+    return page, encode_cursor(*(last.get(field) for field in fields))
+
+
+def page_after(items: Iterable[dict], fields: Sequence[str], key: Optional[Tuple], limit: int,
+               descending: bool = False) -> List[dict]:
+    """In-memory equivalent of a keyset range read for already-computed candidates.
+
+    Returns up to ``limit + 1`` items so the result can be passed to ``split_page``.
+    """
+    def sort_key(item):
+        return tuple(item.get(field) for field in fields)
+
+    if descending:
+        if key is not None:
+            items = [item for item in items if sort_key(item) < key]
+        return heapq.nlargest(limit + 1, items, key=sort_key)
+    if key is not None:
+        items = [item for item in items if sort_key(item) > key]
+    return heapq.nsmallest(limit + 1, items, key=sort_key)
@@ -0,0 +1,264 @@
+"""Local catalog of Google Places results.
+
+Every successful Places search is normalized (the same conversion the live
+search uses) and upserted into the ``places`` collection with a GeoJSON point
+and a ``last_refreshed`` timestamp. Searches without a text query also record a
+``places_coverage`` circle, but only when Google returned fewer places than were
+asked for. A full page (MAX_RESULT_COUNT places at most) may have left places out
+of the circle. Later searches whose circle lies inside a fresh coverage circle
+are answered from the catalog with one ``$geoNear`` query instead of a Google
+round trip.
+
+Regions can be pre-seeded offline from a JSON or NDJSON dump of Places API
+results:
+
+    python -m places_catalog import dump.ndjson --cover 37.7749,-122.4194,20000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PLACE_TYPES = ['restaurant', 'bar', 'cafe', 'meal_takeaway']
+MAX_COVERAGE_RADIUS = 50000  # Google Places max radius
+MAX_RESULT_COUNT = 20  # Google Places maxResultCount limit
+PLACES_CATALOG_TTL = timedelta(hours=float(os.environ.get('PLACES_CATALOG_TTL_HOURS', '168')))
+
+
+def places_catalog_enabled() -> bool:
+    return os.environ.get('PLACES_CATALOG', 'true').lower() in ('1', 'true', 'yes')
+
+
+def normalize_google_place(place: dict, fallback_latitude: float, fallback_longitude: float) -> dict:
+    """Convert a Places API (New) result to our restaurant format"""
+    location = place.get('location', {})
+    display_name = place.get('displayName', {})
+    return {
+        'id': f"google_{place.get('id', str(uuid.uuid4()))}",
+        'name': display_name.get('text', 'Unknown Restaurant'),
+        'address': place.get('formattedAddress', ''),
+        'location': {
+            'latitude': location.get('latitude', fallback_latitude),
+            'longitude': location.get('longitude', fallback_longitude)
+        },
+        'phone': place.get('nationalPhoneNumber'),
+        'website': place.get('websiteUri'),
+        'cuisine_type': [t.replace('_', ' ').title() for t in place.get('types', []) if t in PLACE_TYPES],
+        'rating': place.get('rating'),
+        'price_level': place.get('priceLevel'),
+        'specials': [],  # Real restaurants don't have specials in our system yet
+        'is_verified': True,
+    }
+
+
+def _geo_point(latitude: float, longitude: float) -> dict:
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def to_catalog_document(restaurant: dict, refreshed_at: datetime) -> dict:
+    """Strip per-search fields and add the catalog's geo and freshness fields"""
+    document = {k: v for k, v in restaurant.items() if k not in ('distance', 'source', 'note', 'created_at', '_id')}
+    location = document['location']
+    document['google_place_id'] = document['id'][len('google_'):] if document['id'].startswith('google_') else document['id']
+    document['geo'] = _geo_point(location['latitude'], location['longitude'])
+    document['last_refreshed'] = refreshed_at
+    return document
+
+
+def _upsert_operations(restaurants: Iterable[dict], refreshed_at: datetime):
+    from pymongo import UpdateOne
+
+    for restaurant in restaurants:
+        document = to_catalog_document(restaurant, refreshed_at)
+        yield UpdateOne(
+            {"google_place_id": document['google_place_id']},
+            {"$set": document, "$setOnInsert": {"created_at": refreshed_at.isoformat()}},
+            upsert=True
+        )
+
+
+def _coverage_document(latitude: float, longitude: float, radius: float, refreshed_at: datetime) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "center": _geo_point(latitude, longitude),
+        "radius": float(min(radius, MAX_COVERAGE_RADIUS)),
+        "last_refreshed": refreshed_at,
+    }
+
+
+async def ensure_indexes(database):
+    await database.places.create_index([("geo", "2dsphere")])
+    await database.places.create_index("google_place_id", unique=True)
+    await database.places.create_index("last_refreshed")
+    await database.places_coverage.create_index([("center", "2dsphere")])
+    # Stale coverage disappears on its own; searches then fall back to Google
+    await database.places_coverage.create_index(
+        "last_refreshed", expireAfterSeconds=int(PLACES_CATALOG_TTL.total_seconds()))
+
+
+async def ingest_places(database, restaurants: List[dict], latitude: Optional[float] = None,
+                        longitude: Optional[float] = None, radius: Optional[float] = None,
+                        max_results: int = MAX_RESULT_COUNT) -> int:
+    """Upsert normalized Places results.
+
+    Coverage of the search area is recorded when one is given and the search
+    returned fewer than ``max_results`` places, i.e. everything in the circle.
+    """
+    if not restaurants:
+        return 0
+    refreshed_at = datetime.now(timezone.utc)
+    result = await database.places.bulk_write(list(_upsert_operations(restaurants, refreshed_at)), ordered=False)
+    if radius is not None and len(restaurants) < max_results:
+        await database.places_coverage.insert_one(_coverage_document(latitude, longitude, radius, refreshed_at))
+    return result.upserted_count + result.modified_count
+
+
+async def is_covered(database, latitude: float, longitude: float, radius: float) -> bool:
+    """Whether a fresh coverage circle fully contains the search circle"""
+    cutoff = datetime.now(timezone.utc) - PLACES_CATALOG_TTL
+    pipeline = [
+        {"$geoNear": {
+            "near": _geo_point(latitude, longitude),
+            "distanceField": "distance",
+            "maxDistance": MAX_COVERAGE_RADIUS,
+            "query": {"last_refreshed": {"$gte": cutoff}},
+            "spherical": True,
+        }},
+        {"$match": {"$expr": {"$lte": [{"$add": ["$distance", radius]}, "$radius"]}}},
+        {"$limit": 1},
+        {"$project": {"_id": 0, "id": 1}},
+    ]
+    return bool(await database.places_coverage.aggregate(pipeline).to_list(1))
+
+
+async def coverage_refreshed_at(database, latitude: float, longitude: float, radius: float) -> Optional[datetime]:
+    """Newest refresh time of any coverage circle containing the search circle"""
+    pipeline = [
+        {"$geoNear": {
+            "near": _geo_point(latitude, longitude),
+            "distanceField": "distance",
+            "maxDistance": MAX_COVERAGE_RADIUS,
+            "spherical": True,
+        }},
+        {"$match": {"$expr": {"$lte": [{"$add": ["$distance", radius]}, "$radius"]}}},
+        {"$sort": {"last_refreshed": -1}},
+        {"$limit": 1},
+        {"$project": {"_id": 0, "last_refreshed": 1}},
+    ]
+    coverage = await database.places_coverage.aggregate(pipeline).to_list(1)
+    if not coverage:
+        return None
+    refreshed_at = coverage[0]['last_refreshed']
+    return refreshed_at if refreshed_at.tzinfo else refreshed_at.replace(tzinfo=timezone.utc)
+
+
+async def search_catalog(database, latitude: float, longitude: float, radius: float, limit: int) -> List[dict]:
+    """Nearest catalog places within the radius, in the live search's result format"""
+    pipeline = [
+        {"$geoNear": {
+            "near": _geo_point(latitude, longitude),
+            "distanceField": "distance",
+            "maxDistance": radius,
+            "spherical": True,
+        }},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "geo": 0, "google_place_id": 0, "last_refreshed": 0}},
+    ]
+    restaurants = await database.places.aggregate(pipeline).to_list(limit)
+    for restaurant in restaurants:
+        restaurant['source'] = 'google_places'
+    return restaurants
+
+
+# =================== OFFLINE IMPORT ===================
+
+def iter_dump(path: Path) -> Iterator[dict]:
+    """Yield raw Places API results from a JSON document/array or an NDJSON file"""
+    with open(path) as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == '[' or first == '{':
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError:
+                data = None
+            if data is not None:
+                if isinstance(data, dict):
+                    data = data.get('places', [data])
+                yield from data
+                return
+            f.seek(0)
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, dict) and 'places' in record:
+                yield from record['places']
+            else:
+                yield record
+
+
+def import_dump(database, path: Path, cover: Optional[tuple] = None, batch_size: int = 1000) -> int:
+    """Bulk-import a dump into the catalog with a blocking pymongo database"""
+    refreshed_at = datetime.now(timezone.utc)
+    imported = 0
+    batch = []
+    for place in iter_dump(path):
+        location = place.get('location', {})
+        if 'latitude' not in location or 'longitude' not in location:
+            continue
+        batch.append(normalize_google_place(place, location['latitude'], location['longitude']))
+        if len(batch) >= batch_size:
+            database.places.bulk_write(list(_upsert_operations(batch, refreshed_at)), ordered=False)
+            imported += len(batch)
+            batch = []
+    if batch:
+        database.places.bulk_write(list(_upsert_operations(batch, refreshed_at)), ordered=False)
+        imported += len(batch)
+    if cover:
+        database.places_coverage.insert_one(_coverage_document(*cover, refreshed_at))
+    return imported
+
+
+def main(argv=None) -> int:
+    from dotenv import load_dotenv
+    from pymongo import GEOSPHERE, MongoClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    parser = argparse.ArgumentParser(description="Manage the local Places catalog")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    importer = subcommands.add_parser("import", help="import a JSON/NDJSON dump of Places API results")
+    importer.add_argument("path", type=Path)
+    importer.add_argument("--cover", help="mark LAT,LON,RADIUS_METERS as covered by this import")
+    args = parser.parse_args(argv)
+
+    cover = None
+    if args.cover:
+        latitude, longitude, radius = (float(part) for part in args.cover.split(','))
+        cover = (latitude, longitude, radius)
+
+    mongo = MongoClient(os.environ['MONGO_URL'])
+    try:
+        database = mongo[os.environ['DB_NAME']]
+        database.places.create_index([("geo", GEOSPHERE)])
+        database.places.create_index("google_place_id", unique=True)
+        database.places_coverage.create_index([("center", GEOSPHERE)])
+        imported = import_dump(database, args.path, cover)
+        print(f"Imported {imported} places from {args.path}")
+    finally:
+        mongo.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
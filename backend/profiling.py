@@ -0,0 +1,252 @@
+"""Opt-in per-request sampling profiler with slow-request capture.
+
+A request is profiled when it carries ``X-Profile-Token`` matching PROFILE_TOKEN,
+or at random with probability PROFILE_SAMPLE_RATE. A profiled request gets:
+
+* a statistical profile: a background thread samples the event-loop thread's
+  stack every PROFILE_INTERVAL_MS and attributes each sample to the request
+  whose task is running, as collapsed stacks (flamegraph format);
+* a timeline of every awaited MongoDB command and outbound HTTP call
+  (see tracing.py).
+
+Profiles of header-triggered requests, and of sampled requests slower than
+PROFILE_SLOW_MS, are saved to the ``request_profiles`` collection for
+operators to fetch. When neither PROFILE_TOKEN nor PROFILE_SAMPLE_RATE is set
+the tracing listener is not installed and no request is profiled.
+
+Slow-request capture is opted into separately with SLOW_REQUEST_MS: every
+request that is not profiled is then timed, and one slower than the threshold
+is logged and saved as a ``slow`` record with its route, status and wall time
+but no stacks or timeline. With none of the three settings the middleware is
+not installed, so there is no overhead.
+"""
+import asyncio
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from tracing import end_trace, start_trace
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'x-profile-token'
+PROFILE_ID_HEADER = b'x-profile-id'
+MAX_STACK_DEPTH = 64
+
+
+class ProfilingConfig:
+    __slots__ = ('token', 'sample_rate', 'slow_ms', 'interval', 'retention_seconds', 'slow_request_ms')
+
+    def __init__(self, token: Optional[str], sample_rate: float, slow_ms: float,
+                 interval: float, retention_seconds: int, slow_request_ms: float = 0):
+        self.token = token
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.interval = interval
+        self.retention_seconds = retention_seconds
+        self.slow_request_ms = slow_request_ms
+
+    @classmethod
+    def from_env(cls) -> "ProfilingConfig":
+        return cls(
+            token=os.environ.get('PROFILE_TOKEN') or None,
+            sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+            slow_ms=float(os.environ.get('PROFILE_SLOW_MS', '1000')),
+            interval=float(os.environ.get('PROFILE_INTERVAL_MS', '5')) / 1000,
+            retention_seconds=int(os.environ.get('PROFILE_RETENTION_SECONDS', str(7 * 86400))),
+            slow_request_ms=float(os.environ.get('SLOW_REQUEST_MS', '0')),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    @property
+    def captures_slow_requests(self) -> bool:
+        return self.slow_request_ms > 0
+
+    @property
+    def installed(self) -> bool:
+        """Whether the middleware runs at all: for profiling or for slow-request capture"""
+        return self.enabled or self.captures_slow_requests
+
+    def token_matches(self, candidate: Optional[str]) -> bool:
+        return bool(self.token and candidate) and hmac.compare_digest(self.token, candidate)
+
+
+def _collapse(frame) -> str:
+    """Render a frame and its callers as a root-first collapsed stack"""
+    parts = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+
+class StackSampler:
+    """Samples the event-loop thread while at least one request is being profiled"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._targets: Dict[asyncio.Task, Counter] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._loop = None
+        self._loop_thread_id = None
+
+    def register(self, task: asyncio.Task) -> Counter:
+        samples = Counter()
+        with self._lock:
+            self._targets[task] = samples
+            if self._thread is None:
+                self._loop = task.get_loop()
+                self._loop_thread_id = threading.get_ident()
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+        return samples
+
+    def unregister(self, task: asyncio.Task):
+        with self._lock:
+            self._targets.pop(task, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                targets = self._targets
+                loop = self._loop
+                loop_thread_id = self._loop_thread_id
+            # Only the task executing right now is charged for the sample
+            task = asyncio.current_task(loop)
+            samples = targets.get(task)
+            if samples is None:
+                continue
+            frame = sys._current_frames().get(loop_thread_id)
+            if frame is not None:
+                samples[_collapse(frame)] += 1
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles selected requests and stores slow ones, profiled or not"""
+
+    def __init__(self, app, config: ProfilingConfig, collection):
+        self.app = app
+        self.config = config
+        self.collection = collection
+        self.sampler = StackSampler(config.interval)
+
+    def _trigger(self, scope) -> Optional[str]:
+        if self.config.token:
+            for name, value in scope.get('headers', []):
+                if name == PROFILE_HEADER.encode() and self.config.token_matches(value.decode('latin-1')):
+                    return 'header'
+        if self.config.sample_rate > 0 and random.random() < self.config.sample_rate:
+            return 'sampled'
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope) if self.config.enabled else None
+        if trigger is None:
+            if self.config.captures_slow_requests:
+                await self._timed(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+            return
+
+        profile_id = str(uuid.uuid4())
+        status_code = 500
+        started_at = datetime.now(timezone.utc)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                if trigger == 'header':
+                    message['headers'] = list(message.get('headers', [])) + [
+                        (PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        task = asyncio.current_task()
+        samples = self.sampler.register(task)
+        trace, token = start_trace()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_trace(token)
+            self.sampler.unregister(task)
+            duration_ms = (time.perf_counter() - trace.started) * 1000
+            if trigger == 'header' or duration_ms >= self.config.slow_ms:
+                profile = self._profile(scope, profile_id, trigger, status_code, duration_ms, started_at)
+                profile.update({
+                    "sample_interval_ms": self.config.interval * 1000,
+                    "sample_count": sum(samples.values()),
+                    "samples": [{"stack": stack, "count": count} for stack, count in samples.most_common()],
+                    "timeline": trace.timeline(),
+                })
+                asyncio.create_task(self._store(profile))
+
+    async def _timed(self, scope, receive, send):
+        """Serve an unprofiled request, keeping only its wall time when it is slow"""
+        status_code = 500
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= self.config.slow_request_ms:
+                profile = self._profile(scope, str(uuid.uuid4()), 'slow', status_code, duration_ms, started_at)
+                logger.warning(f"Slow request {profile['method']} {profile['path']} took {duration_ms:.0f}ms "
+                               f"(status {status_code}, profile {profile['id']})")
+                asyncio.create_task(self._store(profile))
+
+    @staticmethod
+    def _profile(scope, profile_id: str, trigger: str, status_code: int, duration_ms: float,
+                 started_at: datetime) -> dict:
+        route = scope.get('route')
+        return {
+            "id": profile_id,
+            "trigger": trigger,
+            "method": scope.get('method'),
+            "path": scope.get('path'),
+            "route": getattr(route, 'path', None),
+            "query_string": scope.get('query_string', b'').decode('latin-1'),
+            "status_code": status_code,
+            "duration_ms": round(duration_ms, 3),
+            # Stored as a datetime (not an ISO string) so the TTL index applies
+            "created_at": started_at,
+        }
+
+    async def _store(self, profile: dict):
+        try:
+            await self.collection.insert_one(profile)
+        except Exception as e:
+            logger.error(f"Failed to store request profile {profile['id']}: {e}")
+
+
+async def ensure_profile_indexes(collection, config: ProfilingConfig):
+    await collection.create_index('id', unique=True)
+    await collection.create_index('created_at', expireAfterSeconds=config.retention_seconds)
@@ -0,0 +1,193 @@
+"""Per-request counts of MongoDB commands and outbound HTTP calls, and an N+1 detector.
+
+``QueryCountMiddleware`` binds a ``RequestQueries`` to each request through a
+context variable. Two sources add to it:
+
+* ``QueryCountListener``, a pymongo command listener, adds every MongoDB
+  command as (operation, collection). Motor runs pymongo with a copy of the
+  caller's context, as in tracing.py.
+* ``metrics.track_outbound`` adds every outbound call by service.
+
+A command issued QUERY_REPEAT_THRESHOLD or more times in one request (getMore
+excluded) is most likely a query inside a loop, and is logged as a warning.
+Outside APP_ENV=production, responses also carry the counts in an
+``X-Query-Counts`` header, for example::
+
+    mongo=3 (find restaurants=2, find restaurant_claims=1); outbound=1 (google_places=1)
+
+Tests assert per-endpoint budgets with ``expect_queries``, or with the
+``query_budget`` pytest fixture. Enable it with ``pytest_plugins = ["query_budget"]``
+in conftest.py. The fixture also fails any test in which a request repeated a
+command::
+
+    def test_search(client, query_budget):
+        with query_budget(mongo=2, outbound=0):
+            client.get("/api/restaurants/search", params={...})
+"""
+import logging
+import os
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = b'x-query-counts'
+REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', '5'))
+# Cursor batches of one query, not separate queries
+_UNREPEATABLE = {'getMore', 'killCursors', 'endSessions'}
+
+_current: ContextVar[Optional["RequestQueries"]] = ContextVar('request_queries', default=None)
+_observers: List[Callable[["RequestQueries"], None]] = []
+
+
+def header_enabled() -> bool:
+    return os.environ.get('APP_ENV', 'development').lower() != 'production'
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestQueries:
+    """MongoDB commands and outbound calls issued while serving one request"""
+
+    __slots__ = ('method', 'path', 'mongo', 'outbound')
+
+    def __init__(self, method: str = '', path: str = ''):
+        self.method = method
+        self.path = path
+        # list.append is atomic, so listener threads can record concurrently
+        self.mongo: List[Tuple[str, str]] = []
+        self.outbound: List[str] = []
+
+    def mongo_counts(self) -> Dict[str, int]:
+        return dict(Counter(f"{operation} {collection}" for operation, collection in self.mongo))
+
+    def outbound_counts(self) -> Dict[str, int]:
+        return dict(Counter(self.outbound))
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD) -> Dict[str, int]:
+        """Commands issued at least ``threshold`` times, likely from a loop"""
+        counts = Counter(f"{operation} {collection}" for operation, collection in self.mongo
+                         if operation not in _UNREPEATABLE)
+        return {command: count for command, count in counts.items() if count >= threshold}
+
+    def summary(self) -> str:
+        def detail(counts: Dict[str, int]) -> str:
+            return ", ".join(f"{name}={count}" for name, count in sorted(counts.items()))
+        mongo, outbound = self.mongo_counts(), self.outbound_counts()
+        text = f"mongo={len(self.mongo)}"
+        if mongo:
+            text += f" ({detail(mongo)})"
+        text += f"; outbound={len(self.outbound)}"
+        if outbound:
+            text += f" ({detail(outbound)})"
+        return text
+
+
+def current_queries() -> Optional[RequestQueries]:
+    return _current.get()
+
+
+def record_outbound(service: str):
+    queries = _current.get()
+    if queries is not None:
+        queries.outbound.append(service)
+
+
+class QueryCountListener(monitoring.CommandListener):
+    """Adds every MongoDB command issued while serving a request to its counts"""
+
+    def started(self, event):
+        queries = _current.get()
+        if queries is None:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get('collection', event.database_name)
+        queries.mongo.append((event.command_name, collection))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class QueryCountMiddleware:
+    """ASGI middleware counting each request's queries; adds X-Query-Counts outside production"""
+
+    def __init__(self, app):
+        self.app = app
+        self.header = header_enabled()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries(scope.get('method', ''), scope.get('path', ''))
+
+        async def send_wrapper(message):
+            if self.header and message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [
+                    (QUERY_COUNT_HEADER, queries.summary().encode('latin-1'))]
+            await send(message)
+
+        token = _current.set(queries)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            repeated = queries.repeated()
+            if repeated:
+                logger.warning(f"Repeated queries in {queries.method} {queries.path}: {repeated}")
+            for observer in list(_observers):
+                observer(queries)
+
+
+@contextmanager
+def recorded_requests() -> Iterator[List[RequestQueries]]:
+    """Collect the counts of every request finished inside the block, from any thread"""
+    finished: List[RequestQueries] = []
+    _observers.append(finished.append)
+    try:
+        yield finished
+    finally:
+        _observers.remove(finished.append)
+
+
+@contextmanager
+def expect_queries(mongo: Optional[int] = None, outbound: Optional[int] = None,
+                   repeat_threshold: int = REPEAT_THRESHOLD) -> Iterator[List[RequestQueries]]:
+    """Fail when a request finished inside the block exceeds the budget or repeats a command"""
+    with recorded_requests() as finished:
+        yield finished
+    for queries in finished:
+        problems = []
+        if mongo is not None and len(queries.mongo) > mongo:
+            problems.append(f"{len(queries.mongo)} MongoDB commands (budget {mongo})")
+        if outbound is not None and len(queries.outbound) > outbound:
+            problems.append(f"{len(queries.outbound)} outbound calls (budget {outbound})")
+        repeated = queries.repeated(repeat_threshold)
+        if repeated:
+            problems.append(f"repeated commands {repeated}")
+        if problems:
+            raise QueryBudgetExceeded(f"{queries.method} {queries.path}: {'; '.join(problems)} [{queries.summary()}]")
+
+
+try:
+    import pytest
+except ImportError:  # only test suites load this module as a plugin
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def query_budget():
+        """``expect_queries``; the test also fails if any of its requests repeated a command"""
+        with expect_queries():
+            yield expect_queries
@@ -0,0 +1,118 @@
+"""Composite scores for ordering search results by more than distance.
+
+Every sort mode maps a result's ranking signals (distance within the search
+radius, rating, best discount among the specials it is shown with, minutes until
+the soonest of those specials ends, text relevance) to a score, higher first.
+Modes are plain functions registered in SORTS, so new ones can be added with
+``register_sort``. Pages are cut from the candidates with a bounded heap of
+``limit + 1`` entries (see ``pagination.page_after`` and
+``CompactCatalog.nearest``), never by sorting every candidate.
+
+Scores are rounded to SCORE_DIGITS so the (score, id) keyset cursor compares
+exactly across pages. Urgency depends on the current time, so the cursor also
+carries the time the first page was scored at, and later pages are scored at
+that time.
+"""
+import math
+from datetime import datetime
+from typing import Callable, Dict, Iterable, NamedTuple, Optional
+
+from schedule_index import parse_minutes
+
+DISTANCE_SORT = 'distance'
+SCORE_DIGITS = 4
+URGENCY_MINUTES = 60.0
+MAX_RATING = 5.0
+
+
+class Signals(NamedTuple):
+    distance: float
+    radius: float
+    rating: float = 0.0
+    discount: float = 0.0
+    minutes_left: Optional[float] = None
+    relevance: Optional[float] = None
+
+
+def distance_decay(signals: Signals) -> float:
+    """1 at the search point, ~0.05 at the edge of the radius"""
+    return math.exp(-3.0 * signals.distance / max(signals.radius, 1.0))
+
+
+def urgency(signals: Signals) -> float:
+    """Close to 1 for a special about to end, 0 when none is running"""
+    if signals.minutes_left is None:
+        return 0.0
+    return math.exp(-max(signals.minutes_left, 0.0) / URGENCY_MINUTES)
+
+
+def rating_score(signals: Signals) -> float:
+    return min(signals.rating or 0.0, MAX_RATING) / MAX_RATING
+
+
+def relevance_score(signals: Signals) -> float:
+    relevance = signals.relevance or 0.0
+    return relevance / (relevance + 3.0)
+
+
+def recommended(signals: Signals) -> float:
+    score = (0.4 * distance_decay(signals) + 0.25 * signals.discount
+             + 0.2 * rating_score(signals) + 0.15 * urgency(signals))
+    if signals.relevance is not None:
+        score = 0.7 * score + 0.3 * relevance_score(signals)
+    return score
+
+
+SORTS: Dict[str, Callable[[Signals], float]] = {
+    'recommended': recommended,
+    # Single-signal modes break ties towards closer restaurants
+    'discount': lambda signals: signals.discount + 0.01 * distance_decay(signals),
+    'rating': lambda signals: rating_score(signals) + 0.01 * distance_decay(signals),
+    'ends_soon': lambda signals: urgency(signals) + 0.01 * distance_decay(signals),
+}
+
+
+def register_sort(name: str, scorer: Callable[[Signals], float]):
+    if name == DISTANCE_SORT:
+        raise ValueError(f"'{DISTANCE_SORT}' is the built-in keyset order")
+    SORTS[name] = scorer
+
+
+def score(scorer: Callable[[Signals], float], signals: Signals) -> float:
+    return round(scorer(signals), SCORE_DIGITS)
+
+
+def special_discount(special: dict) -> float:
+    """Fraction off the original price, 0 when either price is missing"""
+    price, original = special.get('price'), special.get('original_price')
+    try:
+        if price is None or not original or original <= 0:
+            return 0.0
+        return min(max((original - price) / original, 0.0), 1.0)
+    except TypeError:
+        return 0.0
+
+
+def minutes_until_end(special: dict, now: datetime) -> Optional[float]:
+    """Minutes until a special running at ``now`` ends; None without a parsable window"""
+    start, end = parse_minutes(special.get('time_start')), parse_minutes(special.get('time_end'))
+    if start is None or end is None:
+        return None
+    current = now.hour * 60 + now.minute + now.second / 60
+    if not start <= current <= end:
+        return None
+    return end - current
+
+
+def restaurant_signals(restaurant: dict, radius: float, now: datetime) -> Signals:
+    """Signals of a decoded search result whose ``specials`` are the ones it is shown with"""
+    specials: Iterable[dict] = restaurant.get('specials') or []
+    remaining = [left for left in (minutes_until_end(special, now) for special in specials) if left is not None]
+    return Signals(
+        distance=restaurant.get('distance', 0),
+        radius=radius,
+        rating=restaurant.get('rating') or 0.0,
+        discount=max((special_discount(special) for special in specials), default=0.0),
+        minutes_left=min(remaining, default=None),
+        relevance=restaurant.get('relevance'),
+    )
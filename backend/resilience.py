@@ -0,0 +1,232 @@
+"""Resilience layer for outbound Google API calls.
+
+``ResilientClient`` wraps a shared ``httpx.AsyncClient`` per service with:
+
+* a circuit breaker that fails fast after consecutive errors or timeouts and
+  lets a single probe through once the reset timeout has passed;
+* a timeout derived from recently observed latency (p99 x multiplier, clamped);
+* optional hedging: when an attempt is still running after the observed p95,
+  a second identical request is sent and the first good response wins.
+
+Settings come from ``<PREFIX>_*`` environment variables, e.g.
+GOOGLE_PLACES_BREAKER_FAILURES or GOOGLE_GEOCODING_HEDGING.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Optional
+
+import httpx
+
+from metrics import ADAPTIVE_TIMEOUT, CIRCUIT_REJECTIONS, CIRCUIT_STATE, CIRCUIT_TRIPS, HEDGED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open"""
+
+    def __init__(self, service: str):
+        super().__init__(f"Circuit breaker open for {service}")
+        self.service = service
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    HALF_OPEN = 'half_open'
+    OPEN = 'open'
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, service: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+        CIRCUIT_STATE.labels(service=service).set(0)
+
+    def _set_state(self, state: str):
+        self.state = state
+        CIRCUIT_STATE.labels(service=self.service).set(self._STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """Whether a call may proceed; half-open admits one probe at a time"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._set_state(self.HALF_OPEN)
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def release_probe(self):
+        """Let another half-open probe through after a call that says nothing about the service"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit breaker for {self.service} closed")
+            self._set_state(self.CLOSED)
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            CIRCUIT_TRIPS.labels(service=self.service).inc()
+            logger.warning(f"Circuit breaker for {self.service} opened after "
+                           f"{self.consecutive_failures} consecutive failures")
+            self._set_state(self.OPEN)
+
+
+class LatencyTracker:
+    """Recent latencies and the timeout/hedge delay derived from them"""
+
+    def __init__(self, service: str, window: int = 200, min_samples: int = 20,
+                 initial_timeout: float = 10.0, min_timeout: float = 1.0, max_timeout: float = 10.0,
+                 multiplier: float = 3.0):
+        self.service = service
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.multiplier = multiplier
+        self._sorted: Optional[list] = None
+        ADAPTIVE_TIMEOUT.labels(service=service).set(initial_timeout)
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self._sorted = None
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self.samples)
+        index = min(len(self._sorted) - 1, int(pct / 100 * len(self._sorted)))
+        return self._sorted[index]
+
+    def timeout(self) -> float:
+        p99 = self.percentile(99)
+        if p99 is None:
+            value = self.initial_timeout
+        else:
+            value = min(self.max_timeout, max(self.min_timeout, p99 * self.multiplier))
+        ADAPTIVE_TIMEOUT.labels(service=self.service).set(value)
+        return value
+
+    def hedge_delay(self) -> Optional[float]:
+        return self.percentile(95)
+
+
+def _env(prefix: str, name: str, default: str) -> str:
+    return os.environ.get(f"{prefix}_{name}", default)
+
+
+class ResilientClient:
+    """Circuit-broken, adaptively timed, optionally hedged HTTP calls to one service"""
+
+    def __init__(self, service: str, client: httpx.AsyncClient, env_prefix: str):
+        self.service = service
+        self.client = client
+        self.breaker = CircuitBreaker(
+            service,
+            failure_threshold=int(_env(env_prefix, 'BREAKER_FAILURES', '5')),
+            reset_timeout=float(_env(env_prefix, 'BREAKER_RESET_SECONDS', '30')),
+        )
+        self.latency = LatencyTracker(
+            service,
+            min_timeout=float(_env(env_prefix, 'TIMEOUT_MIN_SECONDS', '1')),
+            max_timeout=float(_env(env_prefix, 'TIMEOUT_MAX_SECONDS', '10')),
+            initial_timeout=float(_env(env_prefix, 'TIMEOUT_INITIAL_SECONDS', '10')),
+        )
+        self.hedging = _env(env_prefix, 'HEDGING', 'false').lower() in ('1', 'true', 'yes')
+
+    @staticmethod
+    def _is_failure(response: httpx.Response) -> bool:
+        return response.status_code >= 500 or response.status_code == 429
+
+    async def _attempt(self, method: str, url: str, timeout: float, kwargs: dict) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, timeout=timeout, **kwargs)
+        except asyncio.CancelledError:
+            # A cancelled hedge loser only ran until the other attempt won: not a latency sample
+            raise
+        except BaseException:
+            self.latency.observe(time.perf_counter() - started)
+            raise
+        self.latency.observe(time.perf_counter() - started)
+        return response
+
+    async def _hedged(self, method: str, url: str, timeout: float, kwargs: dict) -> httpx.Response:
+        delay = self.latency.hedge_delay() if self.hedging else None
+        first = asyncio.ensure_future(self._attempt(method, url, timeout, kwargs))
+        if delay is None or delay >= timeout:
+            return await first
+
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        second = asyncio.ensure_future(self._attempt(method, url, timeout, kwargs))
+        attempts = {first: 'primary', second: 'hedge'}
+        pending = set(attempts)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and not self._is_failure(task.result()):
+                        HEDGED_REQUESTS.labels(service=self.service, winner=attempts[task]).inc()
+                        return task.result()
+            # Both attempts failed: surface the last one's outcome
+            HEDGED_REQUESTS.labels(service=self.service, winner='none').inc()
+            return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request; raises CircuitOpenError when failing fast"""
+        if not self.breaker.allow():
+            CIRCUIT_REJECTIONS.labels(service=self.service).inc()
+            raise CircuitOpenError(self.service)
+
+        try:
+            response = await self._hedged(method, url, self.latency.timeout(), kwargs)
+        except (httpx.TimeoutException, httpx.TransportError):
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancellation or a bug on our side says nothing about the service
+            self.breaker.release_probe()
+            raise
+
+        if self._is_failure(response):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def status(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "trips": self.breaker.trips,
+            "timeout_seconds": round(self.latency.timeout(), 3),
+            "p95_seconds": self.latency.percentile(95),
+            "hedging": self.hedging,
+        }
@@ -0,0 +1,186 @@
+"""Sorted-interval index over the weekly windows of restaurant specials.
+
+Time is measured in minutes from Monday 00:00. Every active special contributes
+one window per day it runs; a window whose end is before its start runs past
+midnight into the next day, and a window running past Sunday midnight is also
+stored shifted back one week so it is found from Monday morning.
+
+Windows are grouped per grid cell and per hour of duration, each group kept in
+start order in compact arrays. An overlap query for [start, end] bisects every
+group to the first window that could still be running at ``start`` (its start is
+at most one of the group's longest windows earlier) and scans forward until
+windows start after ``end``. The groups are merged lazily in start order, so a
+caller that wants the first N specials only reads windows near the front of the
+requested range.
+"""
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DAY_MINUTES = 24 * 60
+WEEK_MINUTES = 7 * DAY_MINUTES
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+CELL_DEGREES = 0.1
+DURATION_CLASS_MINUTES = 60
+LON_CELLS = int(round(360 / CELL_DEGREES))
+METERS_PER_DEGREE = 111320.0
+
+Window = Tuple[int, int, int, int]  # (start, end, restaurant position, special index)
+
+
+@lru_cache(maxsize=4096)
+def parse_minutes(value) -> Optional[int]:
+    """Minutes after midnight of an "HH:MM" string"""
+    try:
+        hours, minutes = str(value).split(':')
+        hours, minutes = int(hours), int(minutes)
+    except (TypeError, ValueError):
+        return None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        return None
+    return hours * 60 + minutes
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value) -> Optional[date]:
+    """A "YYYY-MM-DD" date, or the date of an ISO timestamp"""
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def in_season(special: dict, day: date) -> bool:
+    """Whether ``day`` falls within a special's optional start_date..end_date"""
+    start, end = special.get('start_date'), special.get('end_date')
+    if start is None and end is None:
+        return True
+    start, end = parse_date(start) if start else None, parse_date(end) if end else None
+    return (start is None or start <= day) and (end is None or day <= end)
+
+
+def week_minute(moment: datetime) -> int:
+    return moment.weekday() * DAY_MINUTES + moment.hour * 60 + moment.minute
+
+
+def weekly_windows(special: dict) -> List[Tuple[int, int]]:
+    """(start, end) week minutes of every day a special runs; end may pass Sunday midnight"""
+    start = parse_minutes(special.get('time_start'))
+    end = parse_minutes(special.get('time_end'))
+    if start is None or end is None:
+        return []
+    if end < start:
+        end += DAY_MINUTES
+    windows = []
+    for day in special.get('days_available', []) or []:
+        try:
+            offset = WEEKDAYS.index(str(day).lower()) * DAY_MINUTES
+        except ValueError:
+            continue
+        windows.append((offset + start, offset + end))
+    return windows
+
+
+def _cell(latitude: float, longitude: float) -> Tuple[int, int]:
+    return (int(math.floor(latitude / CELL_DEGREES)),
+            int(math.floor((longitude + 180.0) / CELL_DEGREES)) % LON_CELLS)
+
+
+class _Bucket:
+    """Windows of one cell and duration class, in start order"""
+    __slots__ = ('starts', 'ends', 'positions', 'specials', 'longest')
+
+    def __init__(self, windows: List[Window]):
+        windows.sort()
+        self.starts = array('i', (window[0] for window in windows))
+        self.ends = array('i', (window[1] for window in windows))
+        self.positions = array('i', (window[2] for window in windows))
+        self.specials = array('i', (window[3] for window in windows))
+        self.longest = max(window[1] - window[0] for window in windows)
+
+    def overlapping(self, start: int, end: int, shift: int) -> Iterator[Window]:
+        starts, ends, positions, specials = self.starts, self.ends, self.positions, self.specials
+        i = bisect_left(starts, start - self.longest)
+        while i < len(starts) and starts[i] <= end:
+            if ends[i] >= start:
+                yield starts[i] + shift, ends[i] + shift, positions[i], specials[i]
+            i += 1
+
+
+class ScheduleIndex:
+    __slots__ = ('_cells', '_latitudes', '_longitudes')
+
+    def __init__(self, cells: Dict[Tuple[int, int], List[_Bucket]], latitudes: array, longitudes: array):
+        self._cells = cells
+        self._latitudes = latitudes
+        self._longitudes = longitudes
+
+    @classmethod
+    def build(cls, restaurants: Iterable[dict]) -> "ScheduleIndex":
+        grouped: Dict[Tuple[int, int], Dict[int, List[Window]]] = {}
+        latitudes, longitudes = array('d'), array('d')
+        for position, restaurant in enumerate(restaurants):
+            location = restaurant.get('location') or {}
+            latitude, longitude = location.get('latitude'), location.get('longitude')
+            latitudes.append(latitude if latitude is not None else math.nan)
+            longitudes.append(longitude if longitude is not None else math.nan)
+            if latitude is None or longitude is None:
+                continue
+            buckets = None
+            for special_index, special in enumerate(restaurant.get('specials', []) or []):
+                if not special.get('is_active', True):
+                    continue
+                for start, end in weekly_windows(special):
+                    if buckets is None:
+                        buckets = grouped.setdefault(_cell(latitude, longitude), {})
+                    windows = buckets.setdefault((end - start) // DURATION_CLASS_MINUTES, [])
+                    windows.append((start, end, position, special_index))
+                    if end > WEEK_MINUTES:
+                        windows.append((start - WEEK_MINUTES, end - WEEK_MINUTES, position, special_index))
+        cells = {cell: [_Bucket(windows) for windows in buckets.values()] for cell, buckets in grouped.items()}
+        return cls(cells, latitudes, longitudes)
+
+    def __len__(self) -> int:
+        return len(self._latitudes)
+
+    def overlapping(self, latitude: float, longitude: float, radius: float, start: int, end: int) -> Iterator[Window]:
+        """Windows of specials inside the search bounding box that overlap [start, end].
+
+        ``start`` is a week minute and ``end - start`` must be under a week; windows
+        are yielded lazily in the same timeline (starting before ``start`` when
+        already running), sorted by start. A special running on several days in
+        the range yields one window per day, so callers apply the season check
+        of each window's date before keeping the earliest one per special, and
+        still apply the exact distance check.
+        """
+        lat_delta = radius / METERS_PER_DEGREE
+        cos_lat = math.cos(math.radians(latitude))
+        lon_delta = 180.0 if cos_lat < 1e-6 else min(180.0, lat_delta / cos_lat)
+        low_lat, low_lon = _cell(latitude - lat_delta, longitude - lon_delta)
+        high_lat, _ = _cell(latitude + lat_delta, longitude + lon_delta)
+        lon_cells = min(LON_CELLS, int(math.ceil(2 * lon_delta / CELL_DEGREES)) + 1)
+
+        streams = []
+        for lat_cell in range(low_lat, high_lat + 1):
+            for step in range(lon_cells):
+                for bucket in self._cells.get((lat_cell, (low_lon + step) % LON_CELLS), ()):
+                    streams.append(bucket.overlapping(start, min(end, WEEK_MINUTES - 1), 0))
+                    if end >= WEEK_MINUTES:
+                        # The range runs into next week: read the start of the week again, shifted forward
+                        streams.append(bucket.overlapping(0, end - WEEK_MINUTES, WEEK_MINUTES))
+
+        latitudes, longitudes = self._latitudes, self._longitudes
+        for window in heapq.merge(*streams):
+            position = window[2]
+            if abs(latitudes[position] - latitude) > lat_delta:
+                continue
+            lon_diff = abs(longitudes[position] - longitude)
+            if lon_diff > 180.0:
+                lon_diff = 360.0 - lon_diff
+            if lon_diff > lon_delta:
+                continue
+            yield window
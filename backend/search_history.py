@@ -0,0 +1,170 @@
+"""Per-user search history, stored outside the user document.
+
+Searches by signed-in users are buffered in memory and written to the
+``search_history`` collection in batches by a background flusher, so the
+search path never waits on the write. History is bounded two ways: a TTL index
+drops entries older than SEARCH_HISTORY_TTL_DAYS, and each flush trims the
+users it touched to their SEARCH_HISTORY_MAX_PER_USER newest entries, with one
+count, one read of the users over the cap and one bulk delete per flush.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from pymongo import DeleteMany
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+
+async def ensure_indexes(database):
+    ttl_days = float(os.environ.get('SEARCH_HISTORY_TTL_DAYS', '90'))
+    await database.search_history.create_index([("user_id", 1), ("created_at", -1), ("id", -1)])
+    await database.search_history.create_index("created_at", expireAfterSeconds=int(ttl_days * 86400))
+    # Lets the migration insert the same entries again without duplicating them
+    await database.search_history.create_index("id", unique=True)
+
+
+async def migrate_embedded_history(database) -> int:
+    """Move search_history arrays left in user documents into the collection.
+
+    Entries are inserted before the array is removed, so a worker that fails
+    in between leaves the array to be moved again. Ids are derived from the
+    user and position, and duplicates of entries already moved (by an earlier
+    attempt or a concurrent worker) are skipped by the unique index on id.
+    """
+    moved = 0
+    while True:
+        user = await database.users.find_one(
+            {"search_history": {"$exists": True}},
+            {"_id": 0, "id": 1, "search_history": 1}
+        )
+        if user is None:
+            break
+        entries = []
+        for position, item in enumerate(user.get('search_history') or []):
+            if not isinstance(item, dict):
+                continue
+            entry_id = item.get('id') or str(uuid.uuid5(uuid.NAMESPACE_URL, f"search_history/{user['id']}/{position}"))
+            entry = dict(item, id=entry_id, user_id=user['id'])
+            created_at = entry.get('created_at')
+            if isinstance(created_at, str):
+                try:
+                    created_at = datetime.fromisoformat(created_at)
+                except ValueError:
+                    created_at = None
+            entry['created_at'] = created_at or datetime.now(timezone.utc)
+            entries.append(entry)
+        inserted = 0
+        if entries:
+            try:
+                inserted = len((await database.search_history.insert_many(entries, ordered=False)).inserted_ids)
+            except BulkWriteError as e:
+                if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                    raise
+                inserted = e.details.get('nInserted', 0)
+        await database.users.update_one({"id": user['id']}, {"$unset": {"search_history": ""}})
+        moved += inserted
+    return moved
+
+
+class SearchHistoryRecorder:
+    def __init__(self, database):
+        self.database = database
+        self.max_per_user = int(os.environ.get('SEARCH_HISTORY_MAX_PER_USER', '200'))
+        self.batch_size = int(os.environ.get('SEARCH_HISTORY_BATCH_SIZE', '500'))
+        self.flush_interval = float(os.environ.get('SEARCH_HISTORY_FLUSH_SECONDS', '2'))
+        # Beyond this the oldest buffered entries are dropped rather than growing memory
+        self.max_buffered = self.batch_size * 20
+        self._buffer: List[dict] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self.dropped = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        return os.environ.get('SEARCH_HISTORY', 'true').lower() in ('1', 'true', 'yes')
+
+    def record(self, user_id: str, search: dict):
+        """Queue one search for the user; never blocks the caller"""
+        entry = dict(search, id=str(uuid.uuid4()), user_id=user_id, created_at=datetime.now(timezone.utc))
+        self._buffer.append(entry)
+        if len(self._buffer) > self.max_buffered:
+            overflow = len(self._buffer) - self.max_buffered
+            del self._buffer[:overflow]
+            self.dropped += overflow
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        while self._buffer:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            await self.database.search_history.insert_many(batch, ordered=False)
+            await self._trim({entry['user_id'] for entry in batch})
+
+    async def _trim(self, user_ids):
+        counts = await self.database.search_history.aggregate([
+            {"$match": {"user_id": {"$in": list(user_ids)}}},
+            {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": self.max_per_user}}},
+        ]).to_list(None)
+        if not counts:
+            return
+        # (created_at, id) of the oldest entry each user over the cap may keep
+        oldest_kept: Dict[str, tuple] = {}
+        kept = Counter()
+        cursor = self.database.search_history.find(
+            {"user_id": {"$in": [count['_id'] for count in counts]}}, {"_id": 0, "user_id": 1, "created_at": 1, "id": 1}
+        ).sort([("user_id", 1), ("created_at", -1), ("id", -1)])
+        async for entry in cursor:
+            user_id = entry['user_id']
+            if kept[user_id] < self.max_per_user:
+                kept[user_id] += 1
+                oldest_kept[user_id] = (entry['created_at'], entry['id'])
+        await self.database.search_history.bulk_write([
+            DeleteMany({"user_id": user_id, "$or": [
+                {"created_at": {"$lt": created_at}}, {"created_at": created_at, "id": {"$lt": entry_id}}]})
+            for user_id, (created_at, entry_id) in oldest_kept.items()
+        ], ordered=False)
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Search history flush failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Final search history flush failed, {len(self._buffer)} entries lost: {e}")
+
+
+async def list_history(database, user_id: str, limit: int, after: Optional[dict] = None) -> List[dict]:
+    """Up to ``limit`` entries, newest first, read from the (user_id, created_at, id) index"""
+    filters = {"user_id": user_id, **(after or {})}
+    return await database.search_history.find(
+        filters, {"_id": 0, "user_id": 0}
+    ).sort([("created_at", -1), ("id", -1)]).limit(limit).to_list(limit)
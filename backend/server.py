@@ -1,35 +1,129 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Header, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClientSession
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
-from datetime import datetime, timezone, time
+from datetime import date, datetime, timedelta, timezone, time
 import httpx
 import asyncio
+from time import monotonic
+from collections import OrderedDict
 from enum import Enum
 import json
 import jwt
 import hashlib
+from functools import lru_cache
+from contextlib import asynccontextmanager
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Union
+from db_routing import PRIMARY, PUBLIC, causal_session, create_clients
+from catalog_snapshot import CatalogSnapshot, SnapshotView, snapshot_enabled, snapshot_lock, write_snapshot, read_current_version, published_this_run
+from metrics import (
+    MongoCommandListener,
+    PrometheusMiddleware,
+    metrics_endpoint,
+    record_cache,
+    track_outbound,
+)
+from query_budget import QueryCountListener, QueryCountMiddleware
+from loop_watchdog import LoopWatchdog
+from profiling import ProfilingConfig, ProfilingMiddleware, ensure_profile_indexes
+from tracing import TracingCommandListener, trace_span
+from geocode_cache import (
+    ensure_indexes as ensure_geocode_indexes,
+    get_cached_geocode,
+    get_cached_geocodes,
+    normalize_address,
+    store_geocode,
+    store_geocodes,
+)
+from gazetteer import gazetteer_enabled, gazetteer_loaded, get_gazetteer
+from batch_geocode import MAX_BATCH_ADDRESSES, BatchGeocoder, summarize as summarize_batch
+from warming import RefreshAheadWarmer
+from resilience import CircuitOpenError, ResilientClient
+import favorites_feed
+from special_expiry import SpecialExpirySweeper, ensure_indexes as ensure_special_expiry_indexes
+from autocomplete import AutocompleteIndex
+from facets import count_facets
+from map_clusters import MAX_TILES_PER_REQUEST, MAX_ZOOM, TileCache, cluster_tile, tiles_covering
+from compact_catalog import CompactCatalog
+from ranking import DISTANCE_SORT, SORTS, restaurant_signals, score as rank_score, special_discount
+from search_history import (
+    SearchHistoryRecorder,
+    ensure_indexes as ensure_search_history_indexes,
+    list_history,
+    migrate_embedded_history,
+)
+from text_index import TextIndex
+from schedule_index import WEEKDAYS, ScheduleIndex, in_season, week_minute
+from pagination import NUMBER, InvalidCursor, decode_cursor, encode_cursor, keyset_filter, keyset_sort, page_after, split_page
+from places_catalog import (
+    ensure_indexes as ensure_places_indexes,
+    MAX_RESULT_COUNT,
+    ingest_places,
+    is_covered,
+    normalize_google_place,
+    places_catalog_enabled,
+    search_catalog,
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# Opt-in request profiling and always-on slow-request capture (see profiling.py)
+profiling_config = ProfilingConfig.from_env()
+
+# MongoDB connections: public read paths use read_db (secondary-preferred, bounded
+# staleness); writes and reads that must see them use db (see db_routing.py)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+mongo_listeners = [MongoCommandListener(), QueryCountListener()]
+if profiling_config.enabled:
+    mongo_listeners.append(TracingCommandListener())
+mongo_clients = create_clients(mongo_url, mongo_listeners)
+client = mongo_clients[PRIMARY]
 db = client[os.environ['DB_NAME']]
+read_db = mongo_clients[PUBLIC][os.environ['DB_NAME']]
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# Google API endpoints (overridable so load tests can point at a local fake)
+GOOGLE_PLACES_URL = os.environ.get('GOOGLE_PLACES_URL', 'https://places.googleapis.com/v1/places:searchNearby')
+GOOGLE_GEOCODE_URL = os.environ.get('GOOGLE_GEOCODE_URL', 'https://maps.googleapis.com/maps/api/geocode/json')
+
+# Shared connection pool for Google APIs, with per-service circuit breakers,
+# adaptive timeouts and optional hedging (see resilience.py)
+google_http = httpx.AsyncClient(limits=httpx.Limits(
+    max_connections=int(os.environ.get('GOOGLE_MAX_CONNECTIONS', '100')),
+    max_keepalive_connections=int(os.environ.get('GOOGLE_MAX_KEEPALIVE', '20'))
+))
+places_client = ResilientClient('google_places', google_http, 'GOOGLE_PLACES')
+geocoding_client = ResilientClient('google_geocoding', google_http, 'GOOGLE_GEOCODING')
+
+# Shared read-only catalog snapshot (see catalog_snapshot.py)
+catalog_snapshot = CatalogSnapshot()
+CATALOG_REFRESH_DELAY = float(os.environ.get('CATALOG_REFRESH_DELAY', '1.0'))
+_catalog_refresh_task: Optional[asyncio.Task] = None
+# Measures event-loop lag, and logs and counts callbacks that block the loop (see loop_watchdog.py)
+loop_watchdog = LoopWatchdog()
+_background_tasks = set()
+
+# Autocomplete prefix index; other workers' writes arrive through new snapshot
+# versions and trigger a background rebuild at most every AUTOCOMPLETE_REBUILD_SECONDS
+AUTOCOMPLETE_REBUILD_SECONDS = float(os.environ.get('AUTOCOMPLETE_REBUILD_SECONDS', '60'))
+autocomplete_index = AutocompleteIndex()
+_autocomplete_built_at = 0.0
+_autocomplete_build_task: Optional[asyncio.Task] = None
+_autocomplete_pending_writes: Optional[List[dict]] = None
+map_tiles = TileCache()
 
 # Create the main app without a prefix
 app = FastAPI(title="On-the-Cheap API", description="Find local restaurant and bar specials")
@@ -60,6 +154,8 @@ class RestaurantSpecial(BaseModel):
     days_available: List[str]  # ["monday", "tuesday", etc.]
     time_start: str  # "14:00"
     time_end: str    # "17:00"
+    start_date: Optional[date] = None  # first day it runs
+    end_date: Optional[date] = None    # last day it runs; archived once passed
     is_active: bool = True
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -117,7 +213,7 @@ class User(BaseModel):
     first_name: str
     last_name: str
     favorite_restaurant_ids: List[str] = []
-    search_history: List[dict] = []
+    # Search history lives in the search_history collection (see search_history.py)
     preferences: dict = {}
     is_active: bool = True
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -150,6 +246,8 @@ class SpecialCreate(BaseModel):
     days_available: List[str]  # ["monday", "tuesday", etc.]
     time_start: str  # "14:00"
     time_end: str    # "17:00"
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
 
 class SpecialUpdate(BaseModel):
     title: Optional[str] = None
@@ -160,8 +258,13 @@ class SpecialUpdate(BaseModel):
     days_available: Optional[List[str]] = None
     time_start: Optional[str] = None
     time_end: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
     is_active: Optional[bool] = None
 
+class BatchGeocodeRequest(BaseModel):
+    addresses: List[str]
+
 # Mock data setup
 def prepare_for_mongo(data):
     """Convert data for MongoDB storage"""
@@ -169,11 +272,17 @@ def prepare_for_mongo(data):
         return {k: prepare_for_mongo(v) for k, v in data.items()}
     elif isinstance(data, list):
         return [prepare_for_mongo(item) for item in data]
-    elif isinstance(data, datetime):
+    elif isinstance(data, date):
+        # datetimes too; a date is stored as "YYYY-MM-DD"
         return data.isoformat()
     else:
         return data
 
+def check_special_dates(start_date, end_date):
+    """Reject a special whose end date is before its start date (dates or "YYYY-MM-DD")"""
+    if start_date and end_date and end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date is before start_date")
+
 def prepare_from_mongo(data):
     """Convert data from MongoDB to dict (removes ObjectId)"""
     if isinstance(data, dict):
@@ -188,11 +297,274 @@ def prepare_from_mongo(data):
     else:
         return data
 
-async def init_mock_data():
-    """Initialize mock restaurant data"""
+async def publish_catalog_snapshot(only_if_missing: bool = False) -> int:
+    """Rebuild the shared catalog snapshot from MongoDB and publish a new version.
+
+    With ``only_if_missing`` a snapshot published by this deployment is reused; one left
+    in the snapshot directory by an earlier run is rebuilt.
+    """
+    async with held_snapshot_lock():
+        if only_if_missing and published_this_run():
+            return read_current_version()
+        restaurants = await db.restaurants.find({}, {'_id': 0}).to_list(length=None)
+        return await asyncio.get_running_loop().run_in_executor(None, write_snapshot, restaurants)
+
+@asynccontextmanager
+async def held_snapshot_lock():
+    """Hold the cross-process snapshot lock; flock blocks, so it is acquired off the event loop"""
+    lock = snapshot_lock()
+    await asyncio.get_running_loop().run_in_executor(None, lock.__enter__)
+    try:
+        yield
+    finally:
+        lock.__exit__(None, None, None)
+
+async def _refresh_catalog_snapshot_later():
+    global _catalog_refresh_task
+    await asyncio.sleep(CATALOG_REFRESH_DELAY)
+    _catalog_refresh_task = None
+    try:
+        await publish_catalog_snapshot()
+    except Exception as e:
+        logger.error(f"Catalog snapshot refresh failed: {e}")
+
+def schedule_catalog_refresh():
+    """Debounced snapshot rebuild after a restaurant or special write"""
+    global _catalog_refresh_task
+    if not snapshot_enabled() or _catalog_refresh_task is not None:
+        return
+    _catalog_refresh_task = asyncio.create_task(_refresh_catalog_snapshot_later())
+
+async def restaurant_changed(restaurant_id: str, google_place_id: Optional[str] = None,
+                             session: Optional[AsyncIOMotorClientSession] = None):
+    """Propagate a restaurant or special write to the snapshot, favorites feed, autocomplete and map tiles"""
+    schedule_catalog_refresh()
+    map_tiles.clear()
+    restaurant = await db.restaurants.find_one({"id": restaurant_id}, {"_id": 0}, session=session)
+    await favorites_feed.refresh_restaurant(db, restaurant_id, google_place_id, restaurant)
+    if restaurant is None:
+        autocomplete_index.remove_restaurant(restaurant_id)
+    else:
+        _autocomplete_upsert(restaurant)
+
+async def restaurants_created(restaurants: List[dict]):
+    """Propagate restaurants inserted together, from the documents already in hand, with one feed write"""
+    schedule_catalog_refresh()
+    map_tiles.clear()
+    await favorites_feed.refresh_restaurants(db, restaurants)
+    for restaurant in restaurants:
+        _autocomplete_upsert(restaurant)
+
+def _autocomplete_upsert(restaurant: dict):
+    autocomplete_index.upsert_restaurant(restaurant)
+    if _autocomplete_pending_writes is not None:
+        _autocomplete_pending_writes.append(restaurant)
+
+async def _build_autocomplete_index():
+    global autocomplete_index, _autocomplete_built_at, _autocomplete_pending_writes
+    loop = asyncio.get_running_loop()
+    _autocomplete_pending_writes = []
+    try:
+        view = catalog_snapshot.current() if snapshot_enabled() and catalog_snapshot.refresh() else None
+        if view is not None:
+            index = await loop.run_in_executor(
+                None, lambda: AutocompleteIndex.build(view.restaurants(), view.version))
+        else:
+            restaurants = await read_db.restaurants.find(
+                {}, {"_id": 0, "id": 1, "name": 1, "cuisine_type": 1, "location": 1,
+                     "specials.title": 1, "specials.is_active": 1}
+            ).to_list(length=None)
+            index = await loop.run_in_executor(None, AutocompleteIndex.build, restaurants)
+        # Writes made by this worker while the build ran may not be in its source yet
+        for restaurant in _autocomplete_pending_writes:
+            index.upsert_restaurant(restaurant)
+        index.carry_hits_from(autocomplete_index)
+        autocomplete_index = index
+        _autocomplete_built_at = monotonic()
+        logger.info(f"Built autocomplete index ({len(index)} suggestions)")
+    finally:
+        _autocomplete_pending_writes = None
+
+def _autocomplete_build_done(task: asyncio.Task):
+    global _autocomplete_build_task
+    _autocomplete_build_task = None
+    if not task.cancelled() and task.exception():
+        logger.error(f"Autocomplete index build failed: {task.exception()}")
+
+async def get_autocomplete_index() -> AutocompleteIndex:
+    """The autocomplete index, built on first use and refreshed in the background"""
+    global _autocomplete_build_task
+    due = monotonic() - _autocomplete_built_at > AUTOCOMPLETE_REBUILD_SECONDS
+    if snapshot_enabled() and catalog_snapshot.refresh():
+        due = due and catalog_snapshot.version != autocomplete_index.version
+    if (not _autocomplete_built_at or due) and _autocomplete_build_task is None:
+        _autocomplete_build_task = spawn_background(_build_autocomplete_index())
+        _autocomplete_build_task.add_done_callback(_autocomplete_build_done)
+    if not _autocomplete_built_at and _autocomplete_build_task is not None:
+        await asyncio.shield(_autocomplete_build_task)
+    return autocomplete_index
+
+def pinned_snapshot() -> Optional[SnapshotView]:
+    """The newest catalog snapshot version, for one request to use throughout; None without one"""
+    if not snapshot_enabled():
+        return None
+    loaded = catalog_snapshot.refresh()
+    record_cache('catalog_snapshot', loaded)
+    return catalog_snapshot.current() if loaded else None
+
+async def load_catalog_restaurants(latitude: float, longitude: float, radius: int, query: Optional[str] = None) -> List[dict]:
+    """Load candidate restaurants for a search, preferring the shared snapshot.
+
+    With a text query only matching restaurants are returned, each with a ``relevance`` score.
+    Decoding runs in the executor: a wide radius decodes thousands of restaurants.
+    """
+    loop = asyncio.get_running_loop()
+    view = pinned_snapshot()
+    if view is not None:
+        text_scores = None
+        if query:
+            if view.text_index_ready:
+                text_scores = view.search_text(query)
+            else:
+                # First text query on this snapshot version builds the index; keep it off the loop
+                text_scores = await loop.run_in_executor(None, view.search_text, query)
+        return await loop.run_in_executor(None, view.candidates, latitude, longitude, radius, text_scores)
+    
+    restaurants_cursor = read_db.restaurants.find({})
+    all_restaurants_raw = await restaurants_cursor.to_list(length=None)
+    
+    def decode() -> List[dict]:
+        restaurants = [prepare_from_mongo(restaurant) for restaurant in all_restaurants_raw]
+        if not query:
+            return restaurants
+        text_scores = TextIndex.build(restaurants).search(query)
+        matches = []
+        for position, score in text_scores.items():
+            restaurant = restaurants[position]
+            restaurant['relevance'] = round(score, 3)
+            matches.append(restaurant)
+        return matches
+    return await loop.run_in_executor(None, decode)
+
+async def load_catalog_page(latitude: float, longitude: float, radius: int, query: Optional[str],
+                            special_type: Optional[SpecialType], after: Optional[tuple], limit: int,
+                            now: datetime, scorer=None) -> Optional[List[dict]]:
+    """One search page of catalog restaurants from the compact snapshot view, or None without a snapshot.
+
+    Only the selected ``limit + 1`` restaurants are decoded, each with its ``distance`` (and ``score``).
+    """
+    view = pinned_snapshot()
+    if view is None:
+        return None
+    loop = asyncio.get_running_loop()
+    text_scores = None
+    if query:
+        if view.text_index_ready:
+            text_scores = view.search_text(query)
+        else:
+            text_scores = await loop.run_in_executor(None, view.search_text, query)
+    if not view.compact_ready:
+        # First search on this snapshot version builds the compact view; keep it off the loop
+        await loop.run_in_executor(None, view.compact_catalog)
+    return view.nearest(latitude, longitude, radius, now,
+                        special_type.value if special_type else None, after, limit, text_scores, scorer)
+
+async def load_map_source(view: Optional[SnapshotView]):
+    """The compact catalog and a resolver from position to restaurant, built once per map request"""
+    loop = asyncio.get_running_loop()
+    if view is not None:
+        if view.compact_ready:
+            return view.compact_catalog(), view.restaurant_at
+        return await loop.run_in_executor(None, view.compact_catalog), view.restaurant_at
+    documents = await read_db.restaurants.find({}).to_list(length=None)
+
+    def build():
+        restaurants = [prepare_from_mongo(restaurant) for restaurant in documents]
+        return CompactCatalog.build(restaurants), restaurants.__getitem__
+    return await loop.run_in_executor(None, build)
+
+def best_deal(restaurant: Optional[dict], special_type: Optional[SpecialType], now: datetime) -> Optional[dict]:
+    """The cluster's best shown special, or None if the restaurant no longer shows one"""
+    specials = shown_specials(restaurant.get('specials', []), special_type, now) if restaurant else []
+    if not specials:
+        return None
+    best = max(specials, key=special_discount)
+    return {
+        "restaurant_id": restaurant.get('id'),
+        "restaurant_name": restaurant.get('name'),
+        "special_id": best.get('id'),
+        "title": best.get('title'),
+        "special_type": best.get('special_type'),
+        "price": best.get('price'),
+        "original_price": best.get('original_price'),
+        "discount": round(special_discount(best), 3)
+    }
+
+async def load_map_tiles(zoom: int, tiles: List[tuple], special_type: Optional[SpecialType], now: datetime) -> List[dict]:
+    """Clusters of map tiles with their best deals, and an ETag of each tile's content; cached per tile.
+
+    All tiles of a request are resolved against one catalog version, loaded on the first cache miss.
+    """
+    filter_type = special_type.value if special_type else None
+    view = pinned_snapshot()
+    # Snapshot versions change on every write; without a snapshot, writes clear the cache directly
+    version = view.version if view is not None else 0
+    source = None
+    loaded = []
+    for x, y in tiles:
+        cache_key = (zoom, x, y, filter_type)
+        cached = map_tiles.get(cache_key, version)
+        record_cache('map_tiles', cached is not None)
+        if cached is not None:
+            loaded.append(cached)
+            continue
+        if source is None:
+            source = await load_map_source(view)
+        compact, restaurant_at = source
+        
+        clusters = cluster_tile(compact, zoom, x, y, now, filter_type)
+        for cluster in clusters:
+            cluster['best_deal'] = best_deal(restaurant_at(cluster.pop('best_position')), special_type, now)
+        tile = {
+            "tile": f"{zoom}/{x}/{y}",
+            "clusters": clusters,
+            "etag": '"' + hashlib.md5(json.dumps(clusters, sort_keys=True, default=str).encode()).hexdigest() + '"'
+        }
+        map_tiles.put(cache_key, version, tile)
+        loaded.append(tile)
+    return loaded
+
+async def load_special_windows(latitude: float, longitude: float, radius: int, start: int, end: int):
+    """Special windows overlapping [start, end] near a location, and a resolver from position to restaurant"""
+    view = pinned_snapshot()
+    if view is not None:
+        if view.schedule_index_ready:
+            windows = view.special_windows(latitude, longitude, radius, start, end)
+        else:
+            # First upcoming query on this snapshot version builds the index; keep it off the loop
+            windows = await asyncio.get_running_loop().run_in_executor(
+                None, view.special_windows, latitude, longitude, radius, start, end)
+        return windows, view.restaurant_at
+    
+    restaurants_raw = await read_db.restaurants.find({}).to_list(length=None)
+
+    def build():
+        # Preparing and indexing the whole catalog would block the loop, as in load_map_source
+        restaurants = [prepare_from_mongo(restaurant) for restaurant in restaurants_raw]
+        windows = ScheduleIndex.build(restaurants).overlapping(latitude, longitude, radius, start, end)
+        return windows, restaurants.__getitem__
+    return await asyncio.get_running_loop().run_in_executor(None, build)
+
+async def init_mock_data() -> bool:
+    """Initialize mock restaurant data once across workers; return True if this process inserted it"""
+    # Gunicorn workers start together: count and insert under the snapshot lock so only one seeds
+    async with held_snapshot_lock():
+        return await _insert_mock_data()
+
+async def _insert_mock_data() -> bool:
     existing_restaurants = await db.restaurants.count_documents({})
     if existing_restaurants > 0:
-        return
+        return False
     
     mock_restaurants = [
         {
@@ -376,6 +748,7 @@ async def init_mock_data():
     prepared_restaurants = [prepare_for_mongo(restaurant) for restaurant in mock_restaurants]
     await db.restaurants.insert_many(prepared_restaurants)
     logger.info(f"Inserted {len(mock_restaurants)} mock restaurants")
+    return True
 
 # Authentication Helper Functions
 def hash_password(password: str) -> str:
@@ -401,9 +774,15 @@ def verify_token(token: str) -> dict:
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+# Fields authenticated handlers use; preferences and other growing data are read on demand
+REGULAR_USER_AUTH_PROJECTION = {
+    "_id": 0, "id": 1, "email": 1, "first_name": 1, "last_name": 1,
+    "favorite_restaurant_ids": 1, "is_active": 1, "created_at": 1
+}
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current authenticated user (restaurant owner)"""
     token = credentials.credentials
@@ -415,18 +794,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise HTTPException(status_code=401, detail="Invalid token")
     
     if user_type == "owner":
-        user = await db.restaurant_owners.find_one({"id": user_id})
+        user = await db.restaurant_owners.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
         collection = "restaurant_owners"
     else:
-        user = await db.users.find_one({"id": user_id})
+        user = await db.users.find_one({"id": user_id}, REGULAR_USER_AUTH_PROJECTION)
         collection = "users"
     
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
-    user_data = prepare_from_mongo(user)
-    user_data["user_type"] = user_type
-    return user_data
+    user["user_type"] = user_type
+    return user
 
 async def get_current_regular_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current authenticated regular user"""
@@ -438,11 +816,21 @@ async def get_current_regular_user(credentials: HTTPAuthorizationCredentials = D
     if not user_id or user_type != "user":
         raise HTTPException(status_code=401, detail="Invalid user token")
     
-    user = await db.users.find_one({"id": user_id})
+    user = await db.users.find_one({"id": user_id}, REGULAR_USER_AUTH_PROJECTION)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
-    return prepare_from_mongo(user)
+    return user
+
+def optional_user_id(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> Optional[str]:
+    """Regular user id from a valid bearer token, if any; never touches the database"""
+    if credentials is None:
+        return None
+    try:
+        payload = verify_token(credentials.credentials)
+    except HTTPException:
+        return None
+    return payload.get("user_id") if payload.get("user_type") == "user" else None
 
 # Google Places API Integration
 async def search_google_places_real(latitude: float, longitude: float, radius: int, query: Optional[str] = None, limit: int = 20) -> List[dict]:
@@ -464,7 +852,7 @@ async def search_google_places_real(latitude: float, longitude: float, radius: i
         
         payload = {
             "includedTypes": included_types,
-            "maxResultCount": min(limit, 20),
+            "maxResultCount": min(limit, MAX_RESULT_COUNT),
             "locationRestriction": {
                 "circle": {
                     "center": {
@@ -480,63 +868,108 @@ async def search_google_places_real(latitude: float, longitude: float, radius: i
         if query:
             payload["textQuery"] = query
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://places.googleapis.com/v1/places:searchNearby",
+        with track_outbound('google_places') as call, trace_span('http', 'google_places'):
+            response = await places_client.request(
+                "POST",
+                GOOGLE_PLACES_URL,
                 json=payload,
                 headers=headers
             )
+            call.status = response.status_code
+        
+        if response.status_code == 200:
+            data = response.json()
+            places = data.get('places', [])
             
-            if response.status_code == 200:
-                data = response.json()
-                places = data.get('places', [])
-                
-                # Convert Google Places format to our format
-                restaurants = []
-                for place in places:
-                    try:
-                        location = place.get('location', {})
-                        display_name = place.get('displayName', {})
-                        
-                        restaurant = {
-                            'id': f"google_{place.get('id', str(uuid.uuid4()))}",
-                            'name': display_name.get('text', 'Unknown Restaurant'),
-                            'address': place.get('formattedAddress', ''),
-                            'location': {
-                                'latitude': location.get('latitude', latitude),
-                                'longitude': location.get('longitude', longitude)
-                            },
-                            'phone': place.get('nationalPhoneNumber'),
-                            'website': place.get('websiteUri'),
-                            'cuisine_type': [t.replace('_', ' ').title() for t in place.get('types', []) if t in ['restaurant', 'bar', 'cafe', 'meal_takeaway']],
-                            'rating': place.get('rating'),
-                            'price_level': place.get('priceLevel'),
-                            'specials': [],  # Real restaurants don't have specials in our system yet
-                            'is_verified': True,
-                            'source': 'google_places',
-                            'distance': calculate_distance(
-                                latitude, longitude,
-                                location.get('latitude', latitude),
-                                location.get('longitude', longitude)
-                            ),
-                            'created_at': datetime.now(timezone.utc).isoformat()
-                        }
-                        restaurants.append(restaurant)
-                    except Exception as e:
-                        logger.warning(f"Error processing Google Places result: {e}")
-                        continue
-                
-                logger.info(f"Found {len(restaurants)} restaurants from Google Places API")
-                return restaurants
-            else:
-                logger.error(f"Google Places API error: {response.status_code} - {response.text}")
-                return []
-                
+            # Convert Google Places format to our format
+            restaurants = []
+            for place in places:
+                try:
+                    restaurant = normalize_google_place(place, latitude, longitude)
+                    restaurant['source'] = 'google_places'
+                    restaurant['distance'] = calculate_distance(
+                        latitude, longitude,
+                        restaurant['location']['latitude'],
+                        restaurant['location']['longitude']
+                    )
+                    restaurant['created_at'] = datetime.now(timezone.utc).isoformat()
+                    restaurants.append(restaurant)
+                except Exception as e:
+                    logger.warning(f"Error processing Google Places result: {e}")
+                    continue
+            
+            logger.info(f"Found {len(restaurants)} restaurants from Google Places API")
+            return restaurants
+        else:
+            logger.error(f"Google Places API error: {response.status_code} - {response.text}")
+            return []
+            
+    except CircuitOpenError:
+        logger.warning("Google Places circuit breaker open, skipping real API call")
+        return []
     except Exception as e:
         logger.error(f"Error calling Google Places API: {e}")
         return []
 
+async def _ingest_places_safely(restaurants: List[dict], latitude: float, longitude: float, radius: Optional[int],
+                                max_results: int):
+    try:
+        await ingest_places(db, restaurants, latitude, longitude, radius, max_results)
+        await favorites_feed.resolve_places(db, restaurants)
+    except Exception as e:
+        logger.warning(f"Failed to ingest Google Places results: {e}")
+
+async def find_google_places(latitude: float, longitude: float, radius: int, query: Optional[str] = None, limit: int = 20) -> List[dict]:
+    """Google Places results, served from the local places catalog when the area is covered"""
+    use_catalog = places_catalog_enabled()
+    if not query and warmer.enabled():
+        warmer.track_search(latitude, longitude, radius)
+    if use_catalog and not query:
+        try:
+            covered = await is_covered(read_db, latitude, longitude, radius)
+        except Exception as e:
+            logger.warning(f"Places catalog coverage check failed: {e}")
+            covered = False
+        record_cache('places_catalog', covered)
+        if covered:
+            return await search_catalog(read_db, latitude, longitude, radius, limit)
+    
+    restaurants = await search_google_places_real(latitude, longitude, radius, query, limit)
+    if use_catalog and restaurants:
+        # Text-query results are persisted but do not prove an area is covered. The ingest gets
+        # copies: the search handler attaches stored specials to these dicts before it runs.
+        places = [dict(restaurant) for restaurant in restaurants]
+        spawn_background(_ingest_places_safely(places, latitude, longitude, None if query else radius,
+                                               min(limit, MAX_RESULT_COUNT)))
+    return restaurants
+
+async def refresh_places_area(latitude: float, longitude: float, radius: int) -> bool:
+    """Re-fetch an area from Google into the places catalog (used by the warmer)"""
+    restaurants = await search_google_places_real(latitude, longitude, radius, None, MAX_RESULT_COUNT)
+    if restaurants:
+        await ingest_places(db, restaurants, latitude, longitude, radius)
+        await favorites_feed.resolve_places(db, restaurants)
+    return bool(restaurants)
+
+async def refresh_geocode(address: str) -> bool:
+    """Re-fetch a geocode result into the geocode cache (used by the warmer)"""
+    result = await fetch_geocode(address)
+    if result:
+        await store_geocode(db, address, result)
+    return result is not None
+
+warmer = RefreshAheadWarmer(db, refresh_places=refresh_places_area, refresh_geocode=refresh_geocode)
+history_recorder = SearchHistoryRecorder(db)
+expiry_sweeper = SpecialExpirySweeper(db, restaurant_changed)
+
 # Helper functions
+def spawn_background(coro) -> asyncio.Task:
+    """Run a coroutine in the background, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Calculate distance between two points in meters (Haversine formula)"""
     import math
@@ -554,23 +987,108 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     r = 6371000
     return c * r
 
-def is_special_active_now(special_data: dict) -> bool:
+@lru_cache(maxsize=4096)
+def parse_clock_time(value: str) -> time:
+    """"HH:MM" as a time; specials share a handful of distinct values"""
+    return datetime.strptime(value, "%H:%M").time()
+
+def is_special_active_now(special_data: dict, now: Optional[datetime] = None) -> bool:
     """Check if special is currently active based on time and day"""
-    now = datetime.now()
-    current_day = now.strftime("%A").lower()
+    now = now or datetime.now()
+    current_day = WEEKDAYS[now.weekday()]
     current_time = now.time()
     
     if current_day not in special_data.get('days_available', []):
         return False
+    if not in_season(special_data, now.date()):
+        return False
     
     try:
-        start_time = datetime.strptime(special_data['time_start'], "%H:%M").time()
-        end_time = datetime.strptime(special_data['time_end'], "%H:%M").time()
+        start_time = parse_clock_time(special_data['time_start'])
+        end_time = parse_clock_time(special_data['time_end'])
         
         return start_time <= current_time <= end_time
     except:
         return True  # If time parsing fails, assume it's active
 
+def shown_specials(specials: List[dict], special_type: Optional[SpecialType], now: datetime) -> List[dict]:
+    """Specials a search result is shown with: active ones of the requested type, else those running now"""
+    if special_type:
+        today = now.date()
+        return [special for special in specials
+                if special.get('special_type') == special_type and special.get('is_active', True)
+                and in_season(special, today)]
+    return [special for special in specials if special.get('is_active', True) and is_special_active_now(special, now)]
+
+async def attach_stored_specials(google_restaurants: List[dict], latitude: float, longitude: float, radius: int,
+                                 special_type: Optional[SpecialType], now: datetime) -> List[dict]:
+    """Join specials owners created under a google_place_id onto Google results, in one $in query.
+
+    A place whose stored restaurant is itself a catalog result (located inside the
+    search radius, with specials to show) is dropped: the catalog lists it already.
+    """
+    def place_id(restaurant: dict) -> str:
+        return restaurant.get('google_place_id') or restaurant['id'][len('google_'):]
+    
+    place_ids = list({place_id(restaurant) for restaurant in google_restaurants})
+    if not place_ids:
+        return google_restaurants
+    stored = await read_db.restaurants.find(
+        {"google_place_id": {"$in": place_ids}},
+        {"_id": 0, "id": 1, "google_place_id": 1, "location": 1, "specials": 1}
+    ).to_list(length=None)
+    stored_by_place = {restaurant['google_place_id']: restaurant for restaurant in stored}
+    
+    joined = []
+    for restaurant in google_restaurants:
+        match = stored_by_place.get(place_id(restaurant))
+        if match is not None:
+            specials = shown_specials(match.get('specials') or [], special_type, now)
+            location = match.get('location') or {}
+            if specials and location.get('latitude') is not None and location.get('longitude') is not None:
+                if calculate_distance(latitude, longitude, location['latitude'], location['longitude']) <= radius:
+                    continue
+            restaurant['specials'] = specials
+            restaurant['restaurant_id'] = match['id']
+        joined.append(restaurant)
+    return joined
+
+SEARCH_PAGE_KEY = ('distance', 'id')
+SCORED_PAGE_KEY = ('score', 'id')
+CLAIM_PAGE_KEY = ('created_at', 'id')
+STATUS_PAGE_KEY = ('timestamp', 'id')
+HISTORY_PAGE_KEY = ('created_at', 'id')
+# Value types of each cursor; search cursors also say whether Google results remain for later pages,
+# and scored ones carry the time the search is evaluated at
+SEARCH_CURSOR = (NUMBER, str, bool)
+SCORED_CURSOR = (NUMBER, str, bool, datetime)
+CLAIM_CURSOR = (str, str)
+STATUS_CURSOR = (datetime, str)
+HISTORY_CURSOR = (datetime, str)
+
+SEARCH_GOOGLE_PAGE_TTL = float(os.environ.get('SEARCH_GOOGLE_PAGE_TTL_SECONDS', '300'))
+SEARCH_GOOGLE_PAGES = 1024
+# (latitude, longitude, radius, query, limit) -> (expires at, Google results), for later pages of a search
+_search_google_pages: "OrderedDict[tuple, Tuple[float, List[dict]]]" = OrderedDict()
+
+async def find_search_google_places(latitude: float, longitude: float, radius: int, query: Optional[str],
+                                    limit: int, first_page: bool) -> List[dict]:
+    """Google results of a search; later pages reuse the first page's results instead of calling Google again"""
+    key = (latitude, longitude, radius, query, limit)
+    cached = None if first_page else _search_google_pages.get(key)
+    if cached is not None and cached[0] > monotonic():
+        record_cache('search_google_pages', True)
+        return [dict(restaurant) for restaurant in cached[1]]
+    if not first_page:
+        # Another worker served the first page, or it expired
+        record_cache('search_google_pages', False)
+    restaurants = await find_google_places(latitude, longitude, radius, query, limit)
+    _search_google_pages[key] = (monotonic() + SEARCH_GOOGLE_PAGE_TTL, [dict(restaurant) for restaurant in restaurants])
+    _search_google_pages.move_to_end(key)
+    if len(_search_google_pages) > SEARCH_GOOGLE_PAGES:
+        _search_google_pages.popitem(last=False)
+    return restaurants
+
 # API Routes
 @api_router.get("/restaurants/search")
 async def search_restaurants(
@@ -579,93 +1097,165 @@ async def search_restaurants(
     radius: int = Query(default=8047, ge=100, le=80467),  # 5 miles default
     query: Optional[str] = Query(None),
     special_type: Optional[SpecialType] = Query(None),
-    limit: int = Query(default=20, ge=1, le=50)
+    limit: int = Query(default=20, ge=1, le=50),
+    cursor: Optional[str] = Query(None),
+    sort: str = Query(default=DISTANCE_SORT),
+    user_id: Optional[str] = Depends(optional_user_id)
 ):
     """Search for restaurants with specials near a location"""
+    if sort != DISTANCE_SORT and sort not in SORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort, expected one of: {', '.join([DISTANCE_SORT, *SORTS])}")
+    scorer = SORTS.get(sort)
     try:
-        # Get real restaurants from Google Places API
-        google_restaurants = await search_google_places_real(latitude, longitude, radius, query, limit)
-        
-        # Get mock restaurants from database (with specials)
-        restaurants_cursor = db.restaurants.find({})
-        all_restaurants_raw = await restaurants_cursor.to_list(length=None)
-        mock_restaurants = [prepare_from_mongo(restaurant) for restaurant in all_restaurants_raw]
+        after = decode_cursor(cursor, SEARCH_CURSOR if scorer is None else SCORED_CURSOR)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    google_pending = after is None or after[2]
+    # Scores change with the time (ends-soon urgency), so every page of a scored search is
+    # evaluated at its first page's time, keeping the (score, id) order stable across pages
+    evaluated_at = after[3] if after is not None and scorer is not None else None
+    after = after[:2] if after is not None else None
+    
+    try:
+        # Get real restaurants from the local places catalog or Google Places API, unless
+        # earlier pages already showed all of them
+        google_restaurants = []
+        if google_pending:
+            google_restaurants = await find_search_google_places(latitude, longitude, radius, query, limit,
+                                                                 first_page=after is None)
+        
+        # Get mock restaurants (with specials) from the catalog snapshot or database
+        now = evaluated_at or datetime.now()
+        mock_restaurants = await load_catalog_page(latitude, longitude, radius, query, special_type, after, limit,
+                                                   now, scorer)
+        if mock_restaurants is None:
+            mock_restaurants = []
+            for restaurant in await load_catalog_restaurants(latitude, longitude, radius, query):
+                location = restaurant.get('location', {})
+                distance = calculate_distance(latitude, longitude,
+                                              location.get('latitude', 0), location.get('longitude', 0))
+                if distance <= radius:
+                    restaurant['distance'] = round(distance)
+                    mock_restaurants.append(restaurant)
+        
+        # Specials owners created for claimed Google places
+        google_restaurants = await attach_stored_specials(google_restaurants, latitude, longitude, radius,
+                                                          special_type, now)
 
         # Combine real restaurants with mock specials data
         all_restaurants = []
         
         # First, add mock restaurants (they have specials)
         for restaurant in mock_restaurants:
-            location = restaurant.get('location', {})
-            rest_lat = location.get('latitude', 0)
-            rest_lon = location.get('longitude', 0)
+            restaurant['source'] = 'mock_with_specials'
+            restaurant['specials'] = shown_specials(restaurant.get('specials', []), special_type, now)
             
-            distance = calculate_distance(latitude, longitude, rest_lat, rest_lon)
-            
-            if distance <= radius:
-                restaurant['distance'] = round(distance)
-                restaurant['source'] = 'mock_with_specials'
-                
-                # Filter specials by type if specified
-                if special_type:
-                    restaurant['specials'] = [
-                        special for special in restaurant.get('specials', [])
-                        if special.get('special_type') == special_type and special.get('is_active', True)
-                    ]
-                else:
-                    # Filter out inactive specials and check if currently active
-                    active_specials = []
-                    for special in restaurant.get('specials', []):
-                        if special.get('is_active', True) and is_special_active_now(special):
-                            active_specials.append(special)
-                    restaurant['specials'] = active_specials
-                
-                # Only include restaurants with active specials
-                if restaurant['specials']:
-                    all_restaurants.append(restaurant)
-        
-        # Then add Google Places restaurants (they don't have specials yet)
-        # We'll show them only if no special_type filter is applied
-        if not special_type:
-            for restaurant in google_restaurants:
-                if restaurant.get('distance', 0) <= radius:
+            # Only include restaurants with active specials
+            if restaurant['specials']:
+                all_restaurants.append(restaurant)
+        
+        # Then add Google Places restaurants; without stored specials only when no special_type filter is applied
+        query_lower = query.lower() if query else None
+        for restaurant in google_restaurants:
+            if special_type and not restaurant.get('specials'):
+                continue
+            # Catalog restaurants were matched by the text index; Google results by name/cuisine
+            if query_lower and not (
+                query_lower in restaurant.get('name', '').lower() or
+                any(query_lower in cuisine.lower() for cuisine in restaurant.get('cuisine_type', []))
+            ):
+                continue
+            if restaurant.get('distance', 0) <= radius:
+                if not restaurant.get('specials'):
                     # Add a note that these are real restaurants without specials data
                     restaurant['specials'] = []
                     restaurant['note'] = 'Real restaurant - specials data coming soon!'
-                    all_restaurants.append(restaurant)
-
-        nearby_restaurants = all_restaurants
+                all_restaurants.append(restaurant)
+        
+        # The same venue can come from more than one source; keep its first (catalog) entry
+        seen_ids = set()
+        all_restaurants = [restaurant for restaurant in all_restaurants
+                           if not (restaurant['id'] in seen_ids or seen_ids.add(restaurant['id']))]
+
+        google_ids = {restaurant['id'] for restaurant in google_restaurants}
+        
+        if scorer is None:
+            # Page by (distance, id): the nearest results after the cursor
+            page_key, descending = SEARCH_PAGE_KEY, False
+        else:
+            # Page by (score, id), highest first; snapshot results arrive already scored
+            page_key, descending = SCORED_PAGE_KEY, True
+            for restaurant in all_restaurants:
+                if 'score' not in restaurant:
+                    restaurant['score'] = rank_score(scorer, restaurant_signals(restaurant, radius, now))
+        nearby_restaurants, next_page = split_page(
+            page_after(all_restaurants, page_key, after, limit, descending), page_key, limit)
+        if next_page:
+            last = tuple(nearby_restaurants[-1].get(field) for field in page_key)
+            later = page_after((restaurant for restaurant in all_restaurants if restaurant['id'] in google_ids),
+                               page_key, last, 0, descending)
+            next_page = encode_cursor(*last, bool(later), *([now] if scorer is not None else []))
         
-        # Filter by query if provided
         if query:
-            query_lower = query.lower()
-            nearby_restaurants = [
-                r for r in nearby_restaurants 
-                if query_lower in r.get('name', '').lower() or 
-                   any(query_lower in cuisine.lower() for cuisine in r.get('cuisine_type', []))
-            ]
-        
-        # Sort by distance
-        nearby_restaurants.sort(key=lambda x: x.get('distance', float('inf')))
-        
-        # Limit results
-        nearby_restaurants = nearby_restaurants[:limit]
+            autocomplete_index.record_query(query)
+        
+        if user_id and history_recorder.enabled():
+            history_recorder.record(user_id, {
+                "query": query,
+                "latitude": latitude,
+                "longitude": longitude,
+                "radius": radius,
+                "special_type": special_type.value if special_type else None,
+                "result_count": len(nearby_restaurants)
+            })
         
         return {
             "restaurants": nearby_restaurants,
             "total": len(nearby_restaurants),
             "search_location": {"latitude": latitude, "longitude": longitude},
-            "radius_meters": radius
+            "radius_meters": radius,
+            "next_cursor": next_page
         }
         
     except Exception as e:
         logger.error(f"Error searching restaurants: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@api_router.get("/restaurants/facets")
+async def get_search_facets(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius: int = Query(default=8047, ge=100, le=80467),
+    query: Optional[str] = Query(None)
+):
+    """Restaurant counts per special type, price level and cuisine for a search area"""
+    try:
+        candidates = await load_catalog_restaurants(latitude, longitude, radius, query)
+        now = datetime.now()
+        in_radius = (
+            restaurant for restaurant in candidates
+            if calculate_distance(latitude, longitude,
+                                  restaurant.get('location', {}).get('latitude', 0),
+                                  restaurant.get('location', {}).get('longitude', 0)) <= radius
+        )
+        # Up to 80 km this visits every restaurant of a metro area; keep it off the loop
+        facets = await asyncio.get_running_loop().run_in_executor(
+            None, count_facets, in_radius, [special_type.value for special_type in SpecialType],
+            lambda special: is_special_active_now(special, now), now.date())
+    except Exception as e:
+        logger.error(f"Error counting search facets: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    
+    return {
+        **facets,
+        "search_location": {"latitude": latitude, "longitude": longitude},
+        "radius_meters": radius
+    }
+
 @api_router.get("/restaurants/{restaurant_id}")
 async def get_restaurant(restaurant_id: str):
     """Get details for a specific restaurant"""
-    restaurant_raw = await db.restaurants.find_one({"id": restaurant_id})
+    restaurant_raw = await read_db.restaurants.find_one({"id": restaurant_id})
     if not restaurant_raw:
         raise HTTPException(status_code=404, detail="Restaurant not found")
     
@@ -683,10 +1273,13 @@ async def get_restaurant(restaurant_id: str):
 @api_router.post("/restaurants", response_model=dict)
 async def create_restaurant(restaurant: Restaurant):
     """Create a new restaurant (for restaurant owners)"""
-    restaurant_dict = restaurant.dict()
+    for special in restaurant.specials:
+        check_special_dates(special.start_date, special.end_date)
+    restaurant_dict = prepare_for_mongo(restaurant.dict())
     restaurant_dict['created_at'] = datetime.now(timezone.utc).isoformat()
     
     result = await db.restaurants.insert_one(restaurant_dict)
+    await restaurant_changed(restaurant.id)
     return {"id": restaurant.id, "message": "Restaurant created successfully"}
 
 @api_router.post("/restaurants/{restaurant_id}/specials")
@@ -696,18 +1289,148 @@ async def add_special(restaurant_id: str, special: RestaurantSpecial):
     restaurant = await db.restaurants.find_one({"id": restaurant_id})
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
+    check_special_dates(special.start_date, special.end_date)
     
     # Add special to restaurant
-    special_dict = special.dict()
+    special_dict = prepare_for_mongo(special.dict())
     special_dict['created_at'] = datetime.now(timezone.utc).isoformat()
     
     await db.restaurants.update_one(
         {"id": restaurant_id},
         {"$push": {"specials": special_dict}}
     )
+    await restaurant_changed(restaurant_id, restaurant.get('google_place_id'))
     
     return {"message": "Special added successfully", "special_id": special.id}
 
+@api_router.get("/autocomplete")
+async def autocomplete(
+    q: str = Query(..., min_length=1, max_length=100),
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    limit: int = Query(default=8, ge=1, le=20)
+):
+    """Suggest restaurant names, cuisines and special titles for a partial query"""
+    index = await get_autocomplete_index()
+    return {"query": q, "suggestions": index.suggest(q, latitude, longitude, limit)}
+
+@api_router.get("/map/clusters")
+async def get_map_clusters(
+    min_latitude: float = Query(..., ge=-90, le=90),
+    min_longitude: float = Query(..., ge=-180, le=180),
+    max_latitude: float = Query(..., ge=-90, le=90),
+    max_longitude: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(..., ge=0, le=MAX_ZOOM),
+    special_type: Optional[SpecialType] = Query(None)
+):
+    """Restaurant clusters (count, centroid, best active deal) for a map viewport"""
+    if min_latitude > max_latitude:
+        raise HTTPException(status_code=400, detail="min_latitude must not exceed max_latitude")
+    tiles = tiles_covering(min_latitude, min_longitude, max_latitude, max_longitude, zoom)
+    if len(tiles) > MAX_TILES_PER_REQUEST:
+        raise HTTPException(status_code=400, detail="Bounding box too large for this zoom level")
+    
+    now = datetime.now()
+    try:
+        loaded = await load_map_tiles(zoom, tiles, special_type, now)
+    except Exception as e:
+        logger.error(f"Error clustering map tiles: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    
+    return {
+        "zoom": zoom,
+        "tiles": [tile["tile"] for tile in loaded],
+        "clusters": [cluster for tile in loaded for cluster in tile["clusters"]]
+    }
+
+@api_router.get("/map/tiles/{zoom}/{x}/{y}")
+async def get_map_tile(
+    zoom: int,
+    x: int,
+    y: int,
+    response: Response,
+    special_type: Optional[SpecialType] = Query(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Clusters of a single web-mercator tile, for clients that cache tiles while panning"""
+    if not 0 <= zoom <= MAX_ZOOM or not (0 <= x < (1 << zoom) and 0 <= y < (1 << zoom)):
+        raise HTTPException(status_code=404, detail="Tile not found")
+    try:
+        tile = (await load_map_tiles(zoom, [(x, y)], special_type, datetime.now()))[0]
+    except Exception as e:
+        logger.error(f"Error clustering map tile {zoom}/{x}/{y}: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    
+    headers = {"ETag": tile["etag"], "Cache-Control": "public, max-age=30"}
+    if if_none_match == tile["etag"]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return {"tile": tile["tile"], "clusters": tile["clusters"]}
+
+@api_router.get("/specials/upcoming")
+async def get_upcoming_specials(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius: int = Query(default=8047, ge=100, le=80467),
+    within_hours: float = Query(default=2, gt=0, le=24),
+    special_type: Optional[SpecialType] = Query(None),
+    limit: int = Query(default=20, ge=1, le=50)
+):
+    """Specials running now or starting within the next ``within_hours``, soonest first"""
+    now = datetime.now().replace(second=0, microsecond=0)
+    start = week_minute(now)
+    end = start + int(within_hours * 60)
+    try:
+        windows, restaurant_at = await load_special_windows(latitude, longitude, radius, start, end)
+        
+        upcoming = []
+        restaurants: Dict[int, Optional[dict]] = {}
+        listed = set()
+        for window_start, window_end, position, special_index in windows:
+            if (position, special_index) in listed:
+                continue
+            if position not in restaurants:
+                restaurant = restaurant_at(position)
+                if restaurant is not None:
+                    location = restaurant.get('location', {})
+                    distance = calculate_distance(latitude, longitude,
+                                                  location.get('latitude', 0), location.get('longitude', 0))
+                    restaurant['distance'] = round(distance)
+                    if distance > radius:
+                        restaurant = None
+                restaurants[position] = restaurant
+            restaurant = restaurants[position]
+            if restaurant is None:
+                continue
+            special = restaurant['specials'][special_index]
+            if special_type and special.get('special_type') != special_type:
+                continue
+            starts_at = now + timedelta(minutes=window_start - start)
+            if not in_season(special, starts_at.date()):
+                continue
+            # Only the earliest in-season window per special; a later day may be in season when today is not
+            listed.add((position, special_index))
+            upcoming.append({
+                "restaurant": {key: value for key, value in restaurant.items() if key != 'specials'},
+                "special": special,
+                "starts_at": starts_at.isoformat(),
+                "ends_at": (now + timedelta(minutes=window_end - start)).isoformat(),
+                "in_progress": window_start <= start
+            })
+            if len(upcoming) >= limit:
+                break
+    except Exception as e:
+        logger.error(f"Error loading upcoming specials: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    
+    return {
+        "specials": upcoming,
+        "total": len(upcoming),
+        "window": {"from": now.isoformat(), "to": (now + timedelta(minutes=end - start)).isoformat()},
+        "search_location": {"latitude": latitude, "longitude": longitude},
+        "radius_meters": radius
+    }
+
 @api_router.get("/specials/types")
 async def get_special_types():
     """Get all available special types"""
@@ -721,45 +1444,137 @@ async def get_special_types():
             {"value": "weekend_special", "label": "Weekend Special"}
         ]
     }
-@api_router.get("/geocode")
-async def geocode_address(address: str = Query(...)):
-    """Convert address to coordinates using Google Geocoding API"""
+async def fetch_geocode(address: str) -> Optional[dict]:
+    """Geocode an address with Google; None when the address is not found"""
     google_api_key = os.environ.get('GOOGLE_PLACES_API_KEY')
     if not google_api_key:
         raise HTTPException(status_code=500, detail="Google API key not configured")
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                "https://maps.googleapis.com/maps/api/geocode/json",
+        with track_outbound('google_geocoding') as call, trace_span('http', 'google_geocoding'):
+            response = await geocoding_client.request(
+                "GET",
+                GOOGLE_GEOCODE_URL,
                 params={
                     "address": address,
                     "key": google_api_key
                 }
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                if data.get('status') == 'OK' and data.get('results'):
-                    location = data['results'][0]['geometry']['location']
-                    return {
-                        "coordinates": {
-                            "latitude": location['lat'],
-                            "longitude": location['lng']
-                        },
-                        "formatted_address": data['results'][0]['formatted_address']
-                    }
-                else:
-                    logger.warning(f"Geocoding failed for address: {address}, status: {data.get('status')}")
-                    raise HTTPException(status_code=404, detail="Address not found")
-            else:
-                logger.error(f"Google Geocoding API error: {response.status_code}")
-                raise HTTPException(status_code=500, detail="Geocoding service error")
-                
+            call.status = response.status_code
+            data = response.json() if response.status_code == 200 else {}
+            if response.status_code == 200 and data.get('status') != 'OK':
+                call.outcome = f"api_{str(data.get('status', 'unknown')).lower()}"
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Geocoding temporarily unavailable")
+    
+    if response.status_code != 200:
+        logger.error(f"Google Geocoding API error: {response.status_code}")
+        raise HTTPException(status_code=500, detail="Geocoding service error")
+    
+    if data.get('status') == 'OK' and data.get('results'):
+        location = data['results'][0]['geometry']['location']
+        return {
+            "coordinates": {
+                "latitude": location['lat'],
+                "longitude": location['lng']
+            },
+            "formatted_address": data['results'][0]['formatted_address']
+        }
+    
+    logger.warning(f"Geocoding failed for address: {address}, status: {data.get('status')}")
+    return None
+
+async def lookup_gazetteer(address: str) -> Optional[dict]:
+    """Geocode result for a plain city or neighborhood name from the offline gazetteer, else None"""
+    if not gazetteer_enabled():
+        return None
+    if gazetteer_loaded():
+        gazetteer = get_gazetteer()
+    else:
+        # First lookup loads the dataset; keep it off the loop
+        gazetteer = await asyncio.get_running_loop().run_in_executor(None, get_gazetteer)
+    result = gazetteer.geocode(address)
+    record_cache('gazetteer', result is not None)
+    return result
+
+@api_router.get("/geocode")
+async def geocode_address(address: str = Query(...)):
+    """Convert address to coordinates, from the offline gazetteer or the Google Geocoding API"""
+    try:
+        place = await lookup_gazetteer(address)
+        if place:
+            return place
+        
+        if warmer.enabled():
+            warmer.track_geocode(address)
+        cached = await get_cached_geocode(read_db, address)
+        record_cache('geocode', cached is not None)
+        if cached:
+            return cached
+        
+        result = await fetch_geocode(address)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Address not found")
+        
+        await store_geocode(db, address, result)
+        return result
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error geocoding address '{address}': {e}")
         raise HTTPException(status_code=500, detail="Geocoding failed")
+
+batch_geocoder = BatchGeocoder(fetch_geocode)
+
+@api_router.post("/geocode/batch")
+async def geocode_addresses(request: BatchGeocodeRequest, current_user: dict = Depends(get_current_user)):
+    """Geocode up to BATCH_GEOCODE_MAX_ADDRESSES addresses; results in request order with a per-item status.
+
+    Requires a signed-in user, since each batch can spend hundreds of paid geocoding calls.
+    """
+    if not request.addresses:
+        raise HTTPException(status_code=400, detail="No addresses given")
+    if len(request.addresses) > MAX_BATCH_ADDRESSES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ADDRESSES} addresses per batch")
+    
+    try:
+        known = {}
+        for address in request.addresses:
+            key = normalize_address(address)
+            if key and key not in known:
+                known[key] = await lookup_gazetteer(address)
+        keys = [key for key, place in known.items() if place is None]
+        cached = await get_cached_geocodes(read_db, keys)
+        record_cache('geocode', True, len(cached))
+        record_cache('geocode', False, len(keys) - len(cached))
+        cached.update((key, place) for key, place in known.items() if place is not None)
+        results, fetched = await batch_geocoder.geocode(request.addresses, cached)
+        await store_geocodes(db, fetched)
+    except Exception as e:
+        logger.error(f"Error batch geocoding {len(request.addresses)} addresses: {e}")
+        raise HTTPException(status_code=500, detail="Batch geocoding failed")
+    
+    return {"results": results, "summary": summarize_batch(results)}
+
+@api_router.get("/resilience/status")
+async def get_resilience_status():
+    """Circuit breaker state and adaptive timeouts of outbound Google calls"""
+    return {
+        "google_places": places_client.status(),
+        "google_geocoding": geocoding_client.status()
+    }
+
+@api_router.get("/warming/status")
+async def get_warming_status():
+    """Show the refresh-ahead warm set and how far behind its refreshes are"""
+    return warmer.status()
+
+@api_router.get("/loop-watchdog/status")
+async def get_loop_watchdog_status():
+    """Show the most recent callbacks that blocked the event loop"""
+    return loop_watchdog.status()
+
 # =================== RESTAURANT OWNER AUTHENTICATION ===================
 
 @api_router.post("/auth/register")
@@ -948,13 +1763,14 @@ async def login_user(login_data: UserLogin):
 @api_router.get("/users/me")
 async def get_current_user_info(current_user: dict = Depends(get_current_regular_user)):
     """Get current regular user information"""
+    profile = await db.users.find_one({"id": current_user['id']}, {"_id": 0, "preferences": 1})
     return {
         "id": current_user['id'],
         "email": current_user['email'],
         "first_name": current_user['first_name'],
         "last_name": current_user['last_name'],
         "favorite_restaurant_ids": current_user.get('favorite_restaurant_ids', []),
-        "preferences": current_user.get('preferences', {}),
+        "preferences": (profile or {}).get('preferences', {}),
         "created_at": current_user.get('created_at')
     }
 
@@ -975,6 +1791,11 @@ async def add_favorite_restaurant(
             {"id": current_user['id']},
             {"$push": {"favorite_restaurant_ids": restaurant_id}}
         )
+        try:
+            await favorites_feed.add_entry(db, current_user['id'], restaurant_id)
+        except Exception as e:
+            # The feed backfills missing entries when it is next read
+            logger.warning(f"Favorites feed add failed: {e}")
         
         return {"message": "Restaurant added to favorites"}
         
@@ -994,6 +1815,7 @@ async def remove_favorite_restaurant(
             {"id": current_user['id']},
             {"$pull": {"favorite_restaurant_ids": restaurant_id}}
         )
+        await favorites_feed.remove_entry(db, current_user['id'], restaurant_id)
         
         return {"message": "Restaurant removed from favorites"}
         
@@ -1003,28 +1825,15 @@ async def remove_favorite_restaurant(
 
 @api_router.get("/users/favorites")
 async def get_favorite_restaurants(current_user: dict = Depends(get_current_regular_user)):
-    """Get user's favorite restaurants with details"""
+    """Get user's favorite restaurants with active and upcoming specials"""
     try:
         favorite_ids = current_user.get('favorite_restaurant_ids', [])
         
         if not favorite_ids:
             return {"favorites": []}
         
-        # Get restaurant details for favorites (from mock database)
-        favorites = []
-        restaurants_cursor = db.restaurants.find({"id": {"$in": favorite_ids}})
-        restaurants = await restaurants_cursor.to_list(length=None)
-        
-        for restaurant in restaurants:
-            restaurant = prepare_from_mongo(restaurant)
-            favorites.append({
-                "id": restaurant['id'],
-                "name": restaurant['name'],
-                "address": restaurant.get('address', ''),
-                "rating": restaurant.get('rating'),
-                "cuisine_type": restaurant.get('cuisine_type', []),
-                "specials_count": len(restaurant.get('specials', []))
-            })
+        # One indexed read of the precomputed feed (see favorites_feed.py)
+        favorites = await favorites_feed.load_feed(db, current_user['id'], favorite_ids)
         
         return {"favorites": favorites}
         
@@ -1032,14 +1841,45 @@ async def get_favorite_restaurants(current_user: dict = Depends(get_current_regu
         logger.error(f"Get favorites error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get favorites")
 
+@api_router.get("/users/search-history")
+async def get_search_history(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_regular_user)
+):
+    """Get the user's recent searches, newest first"""
+    try:
+        after = decode_cursor(cursor, HISTORY_CURSOR)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        entries = await list_history(db, current_user['id'], limit + 1,
+                                     keyset_filter(HISTORY_PAGE_KEY, after, descending=True))
+        entries, next_page = split_page(entries, HISTORY_PAGE_KEY, limit)
+        return {
+            "history": [prepare_for_mongo(entry) for entry in entries],
+            "next_cursor": next_page
+        }
+        
+    except Exception as e:
+        logger.error(f"Get search history error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get search history")
+
 # =================== RESTAURANT CLAIMING & MANAGEMENT ===================
 
+async def owner_session():
+    """Causally consistent primary session, so an owner's reads see the writes before them"""
+    async with causal_session(client) as session:
+        yield session
+
 @api_router.get("/owner/search-restaurants")
 async def search_restaurants_to_claim(
     query: str = Query(..., min_length=2),
     latitude: Optional[float] = Query(None),
     longitude: Optional[float] = Query(None),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    session: AsyncIOMotorClientSession = Depends(owner_session)
 ):
     """Search Google Places restaurants for claiming"""
     try:
@@ -1048,7 +1888,7 @@ async def search_restaurants_to_claim(
             latitude, longitude = 37.7749, -122.4194
         
         # Search Google Places
-        restaurants = await search_google_places_real(
+        restaurants = await find_google_places(
             latitude=latitude,
             longitude=longitude,
             radius=50000,  # 50km radius
@@ -1056,15 +1896,18 @@ async def search_restaurants_to_claim(
             limit=20
         )
         
-        # Add claiming status for each restaurant
-        for restaurant in restaurants:
-            # Check if already claimed
-            claimed_restaurant = await db.restaurant_claims.find_one({
-                "google_place_id": restaurant['id'].replace('google_', ''),
-                "status": {"$in": ["approved", "pending"]}
-            })
-            restaurant['is_claimed'] = bool(claimed_restaurant)
-            restaurant['claim_status'] = claimed_restaurant.get('status') if claimed_restaurant else None
+        # Add claiming status for each restaurant, with one query for all of them
+        place_ids = [restaurant['id'].replace('google_', '') for restaurant in restaurants]
+        claim_status = {}
+        async for claim in db.restaurant_claims.find({
+            "google_place_id": {"$in": place_ids},
+            "status": {"$in": ["approved", "pending"]}
+        }, {"_id": 0, "google_place_id": 1, "status": 1}, session=session):
+            if claim_status.get(claim['google_place_id']) != "approved":
+                claim_status[claim['google_place_id']] = claim['status']
+        for restaurant, place_id in zip(restaurants, place_ids):
+            restaurant['is_claimed'] = place_id in claim_status
+            restaurant['claim_status'] = claim_status.get(place_id)
         
         return {"restaurants": restaurants}
         
@@ -1075,7 +1918,8 @@ async def search_restaurants_to_claim(
 @api_router.post("/owner/claim-restaurant")
 async def claim_restaurant(
     claim_data: RestaurantClaim,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    session: AsyncIOMotorClientSession = Depends(owner_session)
 ):
     """Claim a restaurant from Google Places"""
     try:
@@ -1083,7 +1927,7 @@ async def claim_restaurant(
         existing_claim = await db.restaurant_claims.find_one({
             "google_place_id": claim_data.google_place_id,
             "status": {"$in": ["approved", "pending"]}
-        })
+        }, session=session)
         
         if existing_claim:
             raise HTTPException(status_code=400, detail="Restaurant is already claimed or pending approval")
@@ -1101,7 +1945,7 @@ async def claim_restaurant(
             "reviewed_by": None
         }
         
-        await db.restaurant_claims.insert_one(claim_record)
+        await db.restaurant_claims.insert_one(claim_record, session=session)
         
         return {
             "message": "Restaurant claim submitted successfully",
@@ -1116,28 +1960,46 @@ async def claim_restaurant(
         raise HTTPException(status_code=500, detail="Claim submission failed")
 
 @api_router.get("/owner/my-restaurants")
-async def get_my_restaurants(current_user: dict = Depends(get_current_user)):
-    """Get restaurants owned by current user"""
+async def get_my_restaurants(
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_user),
+    session: AsyncIOMotorClientSession = Depends(owner_session)
+):
+    """Get restaurants owned by current user, newest claims first"""
+    try:
+        after = decode_cursor(cursor, CLAIM_CURSOR)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
-        # Get approved claims for this user
+        # Get a page of approved claims for this user
         claims_cursor = db.restaurant_claims.find({
             "owner_id": current_user['id'],
-            "status": "approved"
-        })
-        approved_claims = await claims_cursor.to_list(length=None)
+            "status": "approved",
+            **keyset_filter(CLAIM_PAGE_KEY, after, descending=True)
+        }, session=session).sort(keyset_sort(CLAIM_PAGE_KEY, descending=True)).limit(limit + 1)
+        approved_claims, next_page = split_page(await claims_cursor.to_list(length=None), CLAIM_PAGE_KEY, limit)
         
         # Get pending claims
         pending_claims_cursor = db.restaurant_claims.find({
             "owner_id": current_user['id'],
             "status": "pending"
-        })
+        }, session=session)
         pending_claims = await pending_claims_cursor.to_list(length=None)
         
-        # Get restaurant details for approved claims
-        restaurants = []
+        # Get restaurant details for approved claims, with one query for the whole page
+        known = {}
+        if approved_claims:
+            async for restaurant in db.restaurants.find(
+                {"google_place_id": {"$in": [claim['google_place_id'] for claim in approved_claims]}},
+                session=session
+            ):
+                known.setdefault(restaurant['google_place_id'], restaurant)
+        restaurants, created = [], []
         for claim in approved_claims:
             # Find restaurant in our database or get from Google Places
-            restaurant = await db.restaurants.find_one({"google_place_id": claim['google_place_id']})
+            restaurant = known.get(claim['google_place_id'])
             
             if restaurant:
                 restaurant = prepare_from_mongo(restaurant)
@@ -1153,15 +2015,19 @@ async def get_my_restaurants(current_user: dict = Depends(get_current_user)):
                     "is_verified": True,
                     "created_at": datetime.now(timezone.utc).isoformat()
                 }
-                
-                # Insert into database
-                await db.restaurants.insert_one(prepare_for_mongo(restaurant))
+                created.append(restaurant)
             
             restaurants.append(restaurant)
         
+        # Insert the missing records into the database in one write
+        if created:
+            await db.restaurants.insert_many([prepare_for_mongo(restaurant) for restaurant in created], session=session)
+            await restaurants_created(created)
+        
         return {
             "restaurants": restaurants,
-            "pending_claims": [prepare_from_mongo(claim) for claim in pending_claims]
+            "pending_claims": [prepare_from_mongo(claim) for claim in pending_claims],
+            "next_cursor": next_page
         }
         
     except Exception as e:
@@ -1174,12 +2040,13 @@ async def get_my_restaurants(current_user: dict = Depends(get_current_user)):
 async def create_special(
     restaurant_id: str,
     special_data: SpecialCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    session: AsyncIOMotorClientSession = Depends(owner_session)
 ):
     """Create a new special for restaurant"""
     try:
         # Verify restaurant ownership
-        restaurant = await db.restaurants.find_one({"id": restaurant_id})
+        restaurant = await db.restaurants.find_one({"id": restaurant_id}, session=session)
         if not restaurant:
             raise HTTPException(status_code=404, detail="Restaurant not found")
         
@@ -1190,11 +2057,13 @@ async def create_special(
             "owner_id": current_user['id'],
             "google_place_id": restaurant.get('google_place_id', ''),
             "status": "approved"
-        })
+        }, session=session)
         
         if not claim and restaurant.get('owner_id') != current_user['id']:
             raise HTTPException(status_code=403, detail="You don't own this restaurant")
         
+        check_special_dates(special_data.start_date, special_data.end_date)
+        
         # Create new special
         special = RestaurantSpecial(
             title=special_data.title,
@@ -1204,7 +2073,9 @@ async def create_special(
             original_price=special_data.original_price,
             days_available=special_data.days_available,
             time_start=special_data.time_start,
-            time_end=special_data.time_end
+            time_end=special_data.time_end,
+            start_date=special_data.start_date,
+            end_date=special_data.end_date
         )
         
         special_dict = prepare_for_mongo(special.dict())
@@ -1212,8 +2083,10 @@ async def create_special(
         # Add special to restaurant
         await db.restaurants.update_one(
             {"id": restaurant_id},
-            {"$push": {"specials": special_dict}}
+            {"$push": {"specials": special_dict}},
+            session=session
         )
+        await restaurant_changed(restaurant_id, restaurant.get('google_place_id'), session=session)
         
         return {
             "message": "Special created successfully",
@@ -1230,12 +2103,14 @@ async def create_special(
 @api_router.get("/owner/restaurants/{restaurant_id}/specials")
 async def get_restaurant_specials(
     restaurant_id: str,
-    current_user: dict = Depends(get_current_user)
+    include_archived: bool = Query(False),
+    current_user: dict = Depends(get_current_user),
+    session: AsyncIOMotorClientSession = Depends(owner_session)
 ):
     """Get all specials for a restaurant"""
     try:
         # Verify restaurant ownership
-        restaurant = await db.restaurants.find_one({"id": restaurant_id})
+        restaurant = await db.restaurants.find_one({"id": restaurant_id}, session=session)
         if not restaurant:
             raise HTTPException(status_code=404, detail="Restaurant not found")
         
@@ -1246,15 +2121,21 @@ async def get_restaurant_specials(
             "owner_id": current_user['id'],
             "google_place_id": restaurant.get('google_place_id', ''),
             "status": "approved"
-        })
+        }, session=session)
         
         if not claim and restaurant.get('owner_id') != current_user['id']:
             raise HTTPException(status_code=403, detail="You don't own this restaurant")
         
-        return {
+        response = {
             "specials": restaurant.get('specials', []),
             "restaurant_name": restaurant.get('name', '')
         }
+        if include_archived:
+            archived = db.archived_specials.find(
+                {"restaurant_id": restaurant_id}, {"_id": 0, "restaurant_id": 0}, session=session
+            ).sort("archived_at", -1)
+            response["archived_specials"] = [prepare_from_mongo(special) for special in await archived.to_list(length=None)]
+        return response
         
     except HTTPException:
         raise
@@ -1267,12 +2148,13 @@ async def update_special(
     restaurant_id: str,
     special_id: str,
     special_update: SpecialUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    session: AsyncIOMotorClientSession = Depends(owner_session)
 ):
     """Update a special"""
     try:
         # Verify restaurant ownership
-        restaurant = await db.restaurants.find_one({"id": restaurant_id})
+        restaurant = await db.restaurants.find_one({"id": restaurant_id}, session=session)
         if not restaurant:
             raise HTTPException(status_code=404, detail="Restaurant not found")
         
@@ -1283,7 +2165,7 @@ async def update_special(
             "owner_id": current_user['id'],
             "google_place_id": restaurant.get('google_place_id', ''),
             "status": "approved"
-        })
+        }, session=session)
         
         if not claim and restaurant.get('owner_id') != current_user['id']:
             raise HTTPException(status_code=403, detail="You don't own this restaurant")
@@ -1295,10 +2177,11 @@ async def update_special(
         for i, special in enumerate(specials):
             if special.get('id') == special_id:
                 # Update fields that are provided
-                update_data = special_update.dict(exclude_unset=True)
+                update_data = prepare_for_mongo(special_update.dict(exclude_unset=True))
                 for key, value in update_data.items():
                     specials[i][key] = value
                 special_found = True
+                check_special_dates(specials[i].get('start_date'), specials[i].get('end_date'))
                 break
         
         if not special_found:
@@ -1307,8 +2190,10 @@ async def update_special(
         # Update restaurant in database
         await db.restaurants.update_one(
             {"id": restaurant_id},
-            {"$set": {"specials": specials}}
+            {"$set": {"specials": specials}},
+            session=session
         )
+        await restaurant_changed(restaurant_id, restaurant.get('google_place_id'), session=session)
         
         return {"message": "Special updated successfully"}
         
@@ -1322,12 +2207,13 @@ async def update_special(
 async def delete_special(
     restaurant_id: str,
     special_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    session: AsyncIOMotorClientSession = Depends(owner_session)
 ):
     """Delete a special"""
     try:
         # Verify restaurant ownership
-        restaurant = await db.restaurants.find_one({"id": restaurant_id})
+        restaurant = await db.restaurants.find_one({"id": restaurant_id}, session=session)
         if not restaurant:
             raise HTTPException(status_code=404, detail="Restaurant not found")
         
@@ -1338,7 +2224,7 @@ async def delete_special(
             "owner_id": current_user['id'],
             "google_place_id": restaurant.get('google_place_id', ''),
             "status": "approved"
-        })
+        }, session=session)
         
         if not claim and restaurant.get('owner_id') != current_user['id']:
             raise HTTPException(status_code=403, detail="You don't own this restaurant")
@@ -1346,8 +2232,10 @@ async def delete_special(
         # Remove the special
         await db.restaurants.update_one(
             {"id": restaurant_id},
-            {"$pull": {"specials": {"id": special_id}}}
+            {"$pull": {"specials": {"id": special_id}}},
+            session=session
         )
+        await restaurant_changed(restaurant_id, restaurant.get('google_place_id'), session=session)
         
         return {"message": "Special deleted successfully"}
         
@@ -1357,6 +2245,40 @@ async def delete_special(
         logger.error(f"Delete special error: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete special")
 
+# =================== REQUEST PROFILES ===================
+
+def require_profile_token(x_profile_token: Optional[str] = Header(None)):
+    """Only operators holding PROFILE_TOKEN may read captured profiles"""
+    if not profiling_config.token:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled")
+    if not profiling_config.token_matches(x_profile_token):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+@api_router.get("/admin/profiles", dependencies=[Depends(require_profile_token)])
+async def list_request_profiles(
+    min_duration_ms: float = Query(default=0, ge=0),
+    route: Optional[str] = Query(None),
+    trigger: Optional[str] = Query(None, pattern="^(header|sampled|slow)$"),
+    limit: int = Query(default=50, ge=1, le=200)
+):
+    """List captured request profiles, slowest first"""
+    filters = {"duration_ms": {"$gte": min_duration_ms}}
+    if route:
+        filters["route"] = route
+    if trigger:
+        filters["trigger"] = trigger
+    projection = {"_id": 0, "samples": 0, "timeline": 0}
+    profiles = await db.request_profiles.find(filters, projection).sort("duration_ms", -1).to_list(limit)
+    return {"profiles": [prepare_for_mongo(profile) for profile in profiles]}
+
+@api_router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_profile_token)])
+async def get_request_profile(profile_id: str):
+    """Get a captured profile with its collapsed stacks and call timeline"""
+    profile = await db.request_profiles.find_one({"id": profile_id}, {"_id": 0})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return prepare_for_mongo(profile)
+
 # Original status check endpoints (keeping for compatibility)
 class StatusCheck(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -1378,8 +2300,22 @@ async def create_status_check(input: StatusCheckCreate):
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
+async def get_status_checks(
+    response: Response,
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None)
+):
+    try:
+        after = decode_cursor(cursor, STATUS_CURSOR)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    status_checks = await db.status_checks.find(
+        keyset_filter(STATUS_PAGE_KEY, after)
+    ).sort(keyset_sort(STATUS_PAGE_KEY)).limit(limit + 1).to_list(limit + 1)
+    status_checks, next_page = split_page(status_checks, STATUS_PAGE_KEY, limit)
+    if next_page:
+        # The body stays a plain list, so the cursor travels in a header
+        response.headers["X-Next-Cursor"] = next_page
     return [StatusCheck(**status_check) for status_check in status_checks]
 
 # Include the router in the main app
@@ -1391,7 +2327,14 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+if profiling_config.installed:
+    app.add_middleware(ProfilingMiddleware, config=profiling_config, collection=db.request_profiles)
+app.add_middleware(PrometheusMiddleware)
+# Per-request query counts and N+1 warnings; X-Query-Counts header outside production
+app.add_middleware(QueryCountMiddleware)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
 
 # Configure logging
 logging.basicConfig(
@@ -1400,12 +2343,53 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def migrate_search_history():
+    try:
+        moved = await migrate_embedded_history(db)
+        if moved:
+            logger.info(f"Moved {moved} embedded search history entries to search_history")
+    except Exception as e:
+        logger.error(f"Search history migration failed: {e}")
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize mock data on startup"""
-    await init_mock_data()
+    loop_watchdog.start()
+    seeded = await init_mock_data()
+    if profiling_config.installed:
+        await ensure_profile_indexes(db.request_profiles, profiling_config)
+    if places_catalog_enabled():
+        await ensure_places_indexes(db)
+    await ensure_geocode_indexes(db)
+    await favorites_feed.ensure_indexes(db)
+    await ensure_search_history_indexes(db)
+    await ensure_special_expiry_indexes(db)
+    # Keyset pagination indexes, in each list's page order
+    await db.restaurant_claims.create_index([("owner_id", 1), ("status", 1), ("created_at", -1), ("id", -1)])
+    await db.status_checks.create_index([("timestamp", 1), ("id", 1)])
+    # Joins stored specials onto Google results
+    await db.restaurants.create_index("google_place_id", sparse=True)
+    spawn_background(migrate_search_history())
+    if history_recorder.enabled():
+        history_recorder.start()
+    if expiry_sweeper.enabled():
+        expiry_sweeper.start()
+    if warmer.enabled():
+        warmer.start()
+    if snapshot_enabled():
+        # The gunicorn master normally publishes the snapshot before forking;
+        # single-process runs build it here, once, under the snapshot lock.
+        await publish_catalog_snapshot(only_if_missing=not seeded)
+        catalog_snapshot.refresh()
+    spawn_background(get_autocomplete_index())
     logger.info("On-the-Cheap API started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    await warmer.stop()
+    await history_recorder.stop()
+    await expiry_sweeper.stop()
+    await loop_watchdog.stop()
+    await google_http.aclose()
+    for mongo_client in mongo_clients.values():
+        mongo_client.close()
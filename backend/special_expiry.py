@@ -0,0 +1,121 @@
+"""Archiving of expired specials.
+
+A special may have a ``start_date`` and ``end_date`` ("YYYY-MM-DD", both
+inclusive). They use the server's local date, like the weekday and time
+windows. Searches, the schedule index and the favorites feed skip a special
+outside its dates (see ``schedule_index.in_season``).
+
+After the end date has passed, ``SpecialExpirySweeper`` moves the special out
+of its restaurant's ``specials`` array into the ``archived_specials``
+collection. The catalog snapshot and every index built from it then carry only
+live specials.
+
+Every worker sweeps every SPECIAL_EXPIRY_INTERVAL_SECONDS. Restaurants are
+walked in id order, SPECIAL_EXPIRY_BATCH at a time. A sweep is idempotent: the
+archive copies are upserted by special id before the specials are pulled, so
+overlapping or interrupted sweeps lose and duplicate nothing.
+"""
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+def is_expired(special: dict, today: date) -> bool:
+    end_date = special.get('end_date')
+    return isinstance(end_date, str) and end_date[:10] < today.isoformat()
+
+
+async def ensure_indexes(database):
+    await database.restaurants.create_index("specials.end_date", sparse=True)
+    await database.archived_specials.create_index([("restaurant_id", 1), ("id", 1)], unique=True)
+    await database.archived_specials.create_index("archived_at")
+
+
+class SpecialExpirySweeper:
+    def __init__(self, database, on_change: Callable[[str, Optional[str]], Awaitable[None]]):
+        self.database = database
+        self.on_change = on_change
+        self.interval = float(os.environ.get('SPECIAL_EXPIRY_INTERVAL_SECONDS', '3600'))
+        self.batch_size = int(os.environ.get('SPECIAL_EXPIRY_BATCH', '200'))
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[datetime] = None
+        self.archived = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        return os.environ.get('SPECIAL_EXPIRY', 'true').lower() in ('1', 'true', 'yes')
+
+    async def _archive(self, restaurant: dict, today: date) -> int:
+        expired = [special for special in restaurant.get('specials', []) or [] if is_expired(special, today)]
+        if not expired:
+            return 0
+        archived_at = datetime.now(timezone.utc)
+        await self.database.archived_specials.bulk_write([
+            UpdateOne(
+                {"restaurant_id": restaurant['id'], "id": special.get('id')},
+                {"$setOnInsert": {**special, "restaurant_id": restaurant['id'], "archived_at": archived_at}},
+                upsert=True
+            )
+            for special in expired
+        ], ordered=False)
+        await self.database.restaurants.update_one(
+            {"id": restaurant['id']},
+            # Only the specials archived above: one written since the read has no archive copy yet
+            {"$pull": {"specials": {"id": {"$in": [special.get('id') for special in expired]},
+                                    "end_date": {"$lt": today.isoformat()}}}}
+        )
+        await self.on_change(restaurant['id'], restaurant.get('google_place_id'))
+        return len(expired)
+
+    async def sweep(self, today: Optional[date] = None) -> int:
+        """Archive every special whose end date is before ``today``; returns how many"""
+        today = today or date.today()
+        self.last_run = datetime.now(timezone.utc)
+        archived = 0
+        after = None
+        while True:
+            query = {"specials.end_date": {"$lt": today.isoformat()}}
+            if after is not None:
+                query["id"] = {"$gt": after}
+            restaurants = await self.database.restaurants.find(
+                query, {"_id": 0, "id": 1, "google_place_id": 1, "specials": 1}
+            ).sort("id", 1).limit(self.batch_size).to_list(self.batch_size)
+            for restaurant in restaurants:
+                try:
+                    archived += await self._archive(restaurant, today)
+                except Exception as e:
+                    logger.warning(f"Archiving expired specials of {restaurant['id']} failed: {e}")
+            if len(restaurants) < self.batch_size:
+                break
+            after = restaurants[-1]['id']
+        self.archived += archived
+        if archived:
+            logger.info(f"Archived {archived} expired specials")
+        return archived
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Special expiry sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,137 @@
+"""In-process inverted index for restaurant text search.
+
+Indexes restaurant names, cuisine types and special titles/descriptions with
+per-field weights. Stopwords are indexed but dropped from queries, unless the
+query has nothing else (e.g. "the"). Every query token must match (exactly, or
+as a prefix of an indexed term once it is two characters or longer), and
+documents are scored by the summed field weight x IDF of their best-matching
+term per query token, with exact matches ranked above prefix matches. A short
+prefix expands to at most MAX_PREFIX_EXPANSION terms: the exact term and the
+terms found in the most documents.
+
+Documents are addressed by position, which lets the catalog snapshot resolve
+matches straight to its fixed-width index entries and decode only the matching
+restaurants that are also near the search location.
+"""
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Iterable, List
+
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'cuisine': 2.0,
+    'special_title': 1.5,
+    'special_description': 1.0,
+}
+PREFIX_MATCH_FACTOR = 0.6
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSION = 200
+STOPWORDS = frozenset({'a', 'an', 'and', 'at', 'for', 'in', 'of', 'on', 'or', 'the', 'with'})
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def words(text: str) -> List[str]:
+    """Lowercased, accent-folded alphanumeric words"""
+    if not text:
+        return []
+    text = str(text)
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return _TOKEN_RE.findall(text.lower())
+
+
+def tokenize(text: str) -> List[str]:
+    """Search tokens: ``words`` without stopwords"""
+    return [token for token in words(text) if token not in STOPWORDS]
+
+
+def restaurant_fields(restaurant: dict) -> Iterable[tuple]:
+    """(field, text) pairs of a restaurant that are searchable"""
+    yield 'name', restaurant.get('name', '')
+    for cuisine in restaurant.get('cuisine_type', []) or []:
+        yield 'cuisine', cuisine
+    for special in restaurant.get('specials', []) or []:
+        if not special.get('is_active', True):
+            continue
+        yield 'special_title', special.get('title', '')
+        yield 'special_description', special.get('description', '')
+
+
+class TextIndex:
+    __slots__ = ('_postings', '_terms', '_count')
+
+    def __init__(self, postings: Dict[str, Dict[int, float]], count: int):
+        self._postings = postings
+        self._terms = sorted(postings)
+        self._count = count
+
+    @classmethod
+    def build(cls, restaurants: Iterable[dict]) -> "TextIndex":
+        postings: Dict[str, Dict[int, float]] = {}
+        # Cuisines and special titles repeat across restaurants; tokenize each text once
+        tokenized: Dict[str, tuple] = {}
+        count = 0
+        for position, restaurant in enumerate(restaurants):
+            count += 1
+            for field, text in restaurant_fields(restaurant):
+                tokens = tokenized.get(text)
+                if tokens is None:
+                    tokens = tokenized[text] = tuple(set(words(text)))
+                weight = FIELD_WEIGHTS[field]
+                for token in tokens:
+                    docs = postings.get(token)
+                    if docs is None:
+                        docs = postings[token] = {}
+                    docs[position] = docs.get(position, 0.0) + weight
+        return cls(postings, count)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _expand(self, token: str) -> List[str]:
+        if len(token) < MIN_PREFIX_LENGTH:
+            return [token] if token in self._postings else []
+        start = bisect_left(self._terms, token)
+        # Terms are [a-z0-9]+, so every term with this prefix sorts before prefix + '{'
+        terms = self._terms[start:bisect_left(self._terms, token + '{', lo=start)]
+        if len(terms) <= MAX_PREFIX_EXPANSION:
+            return terms
+        # Keep the terms that match the most documents rather than the first ones alphabetically
+        expanded = heapq.nlargest(MAX_PREFIX_EXPANSION, terms, key=lambda term: len(self._postings[term]))
+        if token in self._postings and token not in expanded:
+            expanded[-1] = token
+        return expanded
+
+    def search(self, query: str) -> Dict[int, float]:
+        """Positions of documents matching every query token, with relevance scores"""
+        # A query of stopwords only (e.g. "the") searches for them instead of nothing
+        tokens = list(dict.fromkeys(tokenize(query) or words(query)))
+        if not tokens:
+            return {}
+        expansions = [(token, self._expand(token)) for token in tokens]
+        # Most selective token first, so later tokens only probe surviving documents
+        expansions.sort(key=lambda item: sum(len(self._postings[term]) for term in item[1]))
+        scores: Dict[int, float] = {}
+        for i, (token, terms) in enumerate(expansions):
+            best: Dict[int, float] = {}
+            for term in terms:
+                docs = self._postings[term]
+                idf = math.log(1 + self._count / len(docs))
+                factor = idf if term == token else idf * PREFIX_MATCH_FACTOR
+                for position, weight in docs.items():
+                    if i and position not in scores:
+                        continue
+                    score = weight * factor
+                    if score > best.get(position, 0.0):
+                        best[position] = score
+            if i == 0:
+                scores = best
+            else:
+                scores = {position: scores[position] + score for position, score in best.items()}
+            if not scores:
+                return {}
+        return scores
@@ -0,0 +1,127 @@
+"""Per-request timeline of awaited MongoDB and HTTP calls.
+
+A ``RequestTrace`` is bound to the current request through a context variable.
+Code paths that await external work record spans into it with ``trace_span``;
+MongoDB commands are recorded by ``TracingCommandListener``. Motor runs pymongo
+on an executor with a copy of the caller's context, so the listener sees the
+trace of the request that issued the command.
+
+When no trace is active every hook is a single context-variable lookup.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from pymongo import monitoring
+
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar('request_trace', default=None)
+
+
+class Span:
+    __slots__ = ('kind', 'name', 'start', 'duration', 'error')
+
+    def __init__(self, kind: str, name: str, start: float, duration: float = 0.0, error: Optional[str] = None):
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.error = error
+
+    def to_dict(self, origin: float) -> dict:
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "error": self.error,
+        }
+
+
+class RequestTrace:
+    """Spans recorded while serving one request"""
+
+    __slots__ = ('started', 'spans')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Span] = []
+
+    def add(self, span: Span):
+        # list.append is atomic, so listener threads can record concurrently
+        self.spans.append(span)
+
+    def timeline(self) -> List[dict]:
+        return [span.to_dict(self.started) for span in sorted(self.spans, key=lambda s: s.start)]
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def start_trace() -> tuple:
+    """Bind a new trace to the current context; returns (trace, reset token)"""
+    trace = RequestTrace()
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+
+@contextmanager
+def trace_span(kind: str, name: str):
+    """Record the wrapped block as a span of the active trace, if any"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    span = Span(kind, name, time.perf_counter())
+    try:
+        yield
+    except Exception as e:
+        span.error = type(e).__name__
+        raise
+    finally:
+        span.duration = time.perf_counter() - span.start
+        trace.add(span)
+
+
+class TracingCommandListener(monitoring.CommandListener):
+    """Adds every MongoDB command issued under an active trace to its timeline"""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event):
+        return (event.request_id, event.connection_id, event.operation_id)
+
+    def started(self, event):
+        trace = _current_trace.get()
+        if trace is None:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get('collection', event.database_name)
+        span = Span('mongo', f"{event.command_name} {collection}", time.perf_counter())
+        with self._lock:
+            self._pending[self._key(event)] = (trace, span)
+
+    def _finish(self, event, error: Optional[str] = None):
+        with self._lock:
+            pending = self._pending.pop(self._key(event), None)
+        if pending is None:
+            return
+        trace, span = pending
+        span.duration = event.duration_micros / 1e6
+        span.error = error
+        trace.add(span)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, error=str(event.failure.get('codeName', 'failed')))
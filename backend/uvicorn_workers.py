@@ -0,0 +1,14 @@
+"""Uvicorn worker classes for running the API under gunicorn."""
+from uvicorn.workers import UvicornWorker
+
+
+class ProductionUvicornWorker(UvicornWorker):
+    """Uvicorn worker pinned to the uvloop event loop and httptools parser"""
+
+    CONFIG_KWARGS = {
+        "loop": "uvloop",
+        "http": "httptools",
+        "lifespan": "on",
+        "proxy_headers": True,
+        "forwarded_allow_ips": "*",
+    }
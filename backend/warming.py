@@ -0,0 +1,245 @@
+"""Refresh-ahead warming of the most-searched areas and addresses.
+
+Searches and geocodes report what they looked up; the warmer keeps decayed hit
+counts per location cell (about 1 km, bucketed by radius) and per normalized
+address. A background loop periodically re-fetches the hottest entries whose
+cached data (places catalog coverage, geocode cache) expires within
+WARM_LEAD_MINUTES, so no user request has to pay for the cold Google call.
+
+Outbound calls are limited by WARM_BUDGET_PER_MINUTE (per worker). Workers
+share the freshness data in MongoDB, so an entry refreshed by one worker is
+skipped by the others.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from geocode_cache import GEOCODE_CACHE_TTL, geocode_expiry, normalize_address
+from places_catalog import MAX_COVERAGE_RADIUS, PLACES_CATALOG_TTL, coverage_refreshed_at
+
+logger = logging.getLogger(__name__)
+
+CELL_DEGREES = 0.01  # ~1.1 km of latitude
+RADIUS_BUCKETS = [1609, 3219, 8047, 16093, 32187, 50000]
+# Half the diagonal of a cell, so a refresh at the cell center covers searches anywhere in it
+CELL_HALF_DIAGONAL_METERS = 800
+HALF_LIFE_SECONDS = 3600.0
+
+
+def _radius_bucket(radius: int) -> int:
+    for bucket in RADIUS_BUCKETS:
+        if radius <= bucket:
+            return bucket
+    return RADIUS_BUCKETS[-1]
+
+
+class HotEntry:
+    """Decayed popularity of one warmable lookup"""
+
+    __slots__ = ('key', 'kind', 'params', 'score', 'updated', 'hits',
+                 'last_refreshed', 'expires_at', 'last_warmed')
+
+    def __init__(self, key: str, kind: str, params: dict):
+        self.key = key
+        self.kind = kind
+        self.params = params
+        self.score = 0.0
+        self.updated = time.monotonic()
+        self.hits = 0
+        self.last_refreshed: Optional[datetime] = None
+        self.expires_at: Optional[datetime] = None
+        self.last_warmed: Optional[datetime] = None
+
+    def decayed_score(self, now: float) -> float:
+        return self.score * math.pow(0.5, (now - self.updated) / HALF_LIFE_SECONDS)
+
+    def hit(self, now: float):
+        self.score = self.decayed_score(now) + 1.0
+        self.updated = now
+        self.hits += 1
+
+
+class TokenBucket:
+    """Outbound-call budget refilled continuously at ``per_minute``"""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_available(self) -> float:
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate) if self.rate > 0 else float('inf')
+
+
+class RefreshAheadWarmer:
+    def __init__(self, database,
+                 refresh_places: Callable[[float, float, int], Awaitable[bool]],
+                 refresh_geocode: Callable[[str], Awaitable[bool]]):
+        self.database = database
+        self.refresh_places = refresh_places
+        self.refresh_geocode = refresh_geocode
+        self.warm_set_size = int(os.environ.get('WARM_SET_SIZE', '50'))
+        self.max_tracked = int(os.environ.get('WARM_MAX_TRACKED', '5000'))
+        self.interval = float(os.environ.get('WARM_INTERVAL_SECONDS', '60'))
+        self.lead = timedelta(minutes=float(os.environ.get('WARM_LEAD_MINUTES', '60')))
+        self.budget = TokenBucket(float(os.environ.get('WARM_BUDGET_PER_MINUTE', '30')))
+        self._entries: Dict[str, HotEntry] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[datetime] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.skipped_for_budget = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        return os.environ.get('WARMING', 'true').lower() in ('1', 'true', 'yes')
+
+    # ---- tracking -------------------------------------------------------
+
+    def _track(self, key: str, kind: str, params: dict):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is None:
+            if len(self._entries) >= self.max_tracked:
+                self._evict(now)
+            entry = self._entries[key] = HotEntry(key, kind, params)
+        entry.hit(now)
+
+    def _evict(self, now: float):
+        # Drop the coldest half so tracking stays bounded without per-hit sorting
+        ranked = sorted(self._entries.values(), key=lambda e: e.decayed_score(now))
+        for entry in ranked[:len(ranked) // 2]:
+            del self._entries[entry.key]
+
+    def track_search(self, latitude: float, longitude: float, radius: int):
+        cell_lat = round(round(latitude / CELL_DEGREES) * CELL_DEGREES, 4)
+        cell_lon = round(round(longitude / CELL_DEGREES) * CELL_DEGREES, 4)
+        bucket = _radius_bucket(radius)
+        self._track(f"places:{cell_lat}:{cell_lon}:{bucket}", 'places',
+                    {"latitude": cell_lat, "longitude": cell_lon,
+                     "radius": min(bucket + CELL_HALF_DIAGONAL_METERS, MAX_COVERAGE_RADIUS)})
+
+    def track_geocode(self, address: str):
+        key = normalize_address(address)
+        if key:
+            self._track(f"geocode:{key}", 'geocode', {"address": address})
+
+    def warm_set(self) -> List[HotEntry]:
+        now = time.monotonic()
+        ranked = sorted(self._entries.values(), key=lambda e: e.decayed_score(now), reverse=True)
+        return ranked[:self.warm_set_size]
+
+    # ---- refreshing -----------------------------------------------------
+
+    async def _load_expiry(self, entry: HotEntry):
+        if entry.kind == 'places':
+            params = entry.params
+            refreshed = await coverage_refreshed_at(
+                self.database, params['latitude'], params['longitude'], params['radius'])
+            entry.last_refreshed = refreshed
+            entry.expires_at = refreshed + PLACES_CATALOG_TTL if refreshed else None
+        else:
+            expires_at = await geocode_expiry(self.database, entry.params['address'])
+            entry.expires_at = expires_at
+            entry.last_refreshed = expires_at - GEOCODE_CACHE_TTL if expires_at else None
+
+    async def run_once(self):
+        now = datetime.now(timezone.utc)
+        self.last_run = now
+        for entry in self.warm_set():
+            try:
+                await self._load_expiry(entry)
+            except Exception as e:
+                logger.warning(f"Warm check failed for {entry.key}: {e}")
+                continue
+            # Entries never cached yet are left to the next real request
+            if entry.expires_at is None or entry.expires_at - self.lead > now:
+                continue
+            if not self.budget.try_acquire():
+                self.skipped_for_budget += 1
+                break
+            try:
+                if entry.kind == 'places':
+                    params = entry.params
+                    ok = await self.refresh_places(params['latitude'], params['longitude'], params['radius'])
+                else:
+                    ok = await self.refresh_geocode(entry.params['address'])
+            except Exception as e:
+                logger.warning(f"Warm refresh failed for {entry.key}: {e}")
+                ok = False
+            if ok:
+                self.refreshes += 1
+                entry.last_warmed = datetime.now(timezone.utc)
+            else:
+                self.failures += 1
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Refresh-ahead warming pass failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> dict:
+        now_wall = datetime.now(timezone.utc)
+        now = time.monotonic()
+        entries = []
+        for entry in self.warm_set():
+            refresh_due = entry.expires_at - self.lead if entry.expires_at else None
+            entries.append({
+                "key": entry.key,
+                "kind": entry.kind,
+                "params": entry.params,
+                "hits": entry.hits,
+                "score": round(entry.decayed_score(now), 3),
+                "last_refreshed": entry.last_refreshed.isoformat() if entry.last_refreshed else None,
+                "expires_at": entry.expires_at.isoformat() if entry.expires_at else None,
+                "last_warmed": entry.last_warmed.isoformat() if entry.last_warmed else None,
+                # How far past its refresh-ahead deadline the entry is (0 when on time)
+                "refresh_lag_seconds": round(max(0.0, (now_wall - refresh_due).total_seconds()), 1) if refresh_due else None,
+            })
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval,
+            "lead_minutes": self.lead.total_seconds() / 60,
+            "budget_per_minute": self.budget.rate * 60,
+            "budget_available": round(self.budget.tokens, 2),
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "skipped_for_budget": self.skipped_for_budget,
+            "tracked": len(self._entries),
+            "warm_set": entries,
+        }
@@ -332,7 +332,7 @@ const UserAuth = ({ onClose, onUserLogin }) => {
                           </div>
                           
                           <p className="text-xs text-gray-500">
-                            {restaurant.specials_count} active specials
+                            {restaurant.active_specials_count} active specials
                           </p>
                         </CardContent>
                       </Card>
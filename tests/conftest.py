@@ -0,0 +1,134 @@
+"""Shared fixtures: the API on an in-memory MongoDB (mongomock-motor).
+
+mongomock issues no wire commands, so ``monitored`` reports every collection
+call to ``QueryCountListener`` the way pymongo's command monitoring would. The
+per-request query budgets in these tests then count the same commands as in
+production.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'on_the_cheap_test')
+os.environ.setdefault('CATALOG_SNAPSHOT_DIR', tempfile.mkdtemp(prefix='on-the-cheap-snapshot-'))
+os.environ.setdefault('GOOGLE_PLACES_API_KEY', '')
+os.environ.setdefault('WARMING', 'false')
+
+pytest_plugins = ["query_budget", "loop_watchdog", "pytester"]
+
+# Collection method -> the database command it sends
+COMMANDS = {
+    'find': 'find', 'find_one': 'find', 'aggregate': 'aggregate', 'count_documents': 'aggregate',
+    'distinct': 'distinct', 'insert_one': 'insert', 'insert_many': 'insert', 'update_one': 'update',
+    'update_many': 'update', 'replace_one': 'update', 'bulk_write': 'update', 'delete_one': 'delete',
+    'delete_many': 'delete', 'find_one_and_update': 'findAndModify', 'find_one_and_delete': 'findAndModify',
+    'create_index': 'createIndexes',
+}
+
+class MonitoredCollection:
+    def __init__(self, collection, listener):
+        self._collection = collection
+        self._listener = listener
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        command = COMMANDS.get(name)
+        if command is None:
+            return attribute
+
+        def call(*args, **kwargs):
+            kwargs.pop('session', None)  # mongomock has no sessions
+            self._listener.started(SimpleNamespace(
+                command_name=command, command={command: self._collection.name},
+                database_name=self._collection.database.name))
+            return attribute(*args, **kwargs)
+        return call
+
+
+class MonitoredDatabase:
+    def __init__(self, database, listener):
+        self._database = database
+        self._listener = listener
+
+    def __getattr__(self, name):
+        return MonitoredCollection(self._database[name], self._listener)
+
+    __getitem__ = __getattr__
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """The server module with its databases swapped for a fresh in-memory one"""
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server as server_module
+    from query_budget import QueryCountListener
+
+    database = MonitoredDatabase(AsyncMongoMockClient()[os.environ['DB_NAME']], QueryCountListener())
+    monkeypatch.setattr(server_module, 'db', database)
+    monkeypatch.setattr(server_module, 'read_db', database)
+    for name in ('warmer', 'history_recorder', 'expiry_sweeper'):
+        monkeypatch.setattr(getattr(server_module, name), 'database', database)
+    server_module.app.dependency_overrides[server_module.owner_session] = lambda: None
+    yield server_module
+    server_module.app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client(server):
+    from starlette.testclient import TestClient
+
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def owner(client):
+    """Authorization headers and profile of a registered restaurant owner"""
+    response = client.post('/api/auth/register', json={
+        "email": "owner@example.com", "password": "secret123", "business_name": "Owner Co",
+        "first_name": "Olive", "last_name": "Owner", "phone": "+1-415-555-0100",
+    })
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return SimpleNamespace(headers=headers, profile=client.get('/api/auth/me', headers=headers).json())
+
+
+SAN_FRANCISCO = {"latitude": 37.7749, "longitude": -122.4194}
+
+
+def google_place(place_id: str, name: str) -> dict:
+    return {
+        "id": f"google_{place_id}",
+        "name": name,
+        "address": "1 Market St, San Francisco, CA",
+        "location": dict(SAN_FRANCISCO),
+        "cuisine_type": ["Restaurant"],
+        "rating": 4.2,
+        "price_level": 2,
+        "specials": [],
+        "source": "google_places",
+        "distance": 120.0,
+    }
+
+
+@pytest.fixture
+def google_places(server, monkeypatch):
+    """Google Places answering every search with the same twelve places, as one outbound call"""
+    from metrics import track_outbound
+
+    places = [google_place(f"place{i}", f"Place {i}") for i in range(12)]
+
+    async def search_google_places_real(latitude, longitude, radius, query=None, limit=20):
+        with track_outbound('google_places') as call:
+            call.status = 200
+        return [dict(place) for place in places[:limit]]
+
+    monkeypatch.setattr(server, 'search_google_places_real', search_google_places_real)
+    return places
@@ -0,0 +1,51 @@
+"""Autocomplete ranking (see backend/autocomplete.py)."""
+import random
+from bisect import bisect_left
+
+import autocomplete
+from autocomplete import MAX_CHAR, AutocompleteIndex, proximity_cell
+from loadtest.synthetic import synthetic_restaurant
+
+SAN_FRANCISCO = (37.7749, -122.4194)
+
+
+def full_ranking(index: AutocompleteIndex, prefix: str, cell, limit: int):
+    start = bisect_left(index._keys, prefix)
+    end = bisect_left(index._keys, prefix + MAX_CHAR, lo=start)
+    return [round(score, 3) for _, score in index._rank(prefix, start, end, cell, limit)]
+
+
+def test_wide_prefixes_rank_like_a_full_scan_after_writes(monkeypatch):
+    # Every prefix with more than a handful of keys takes the prefix-ranking path
+    monkeypatch.setattr(autocomplete, 'DIRECT_RANK_KEYS', 4)
+    monkeypatch.setattr(autocomplete, 'RANKING_DEPTH', 6)
+    rng = random.Random(7)
+    restaurants = [synthetic_restaurant(rng) for _ in range(400)]
+    index = AutocompleteIndex.build(restaurants)
+    cell = proximity_cell(*SAN_FRANCISCO)
+    prefixes = ["t", "s", "b", "ha", "ta"]
+
+    for step in range(60):
+        for prefix in prefixes:
+            suggestions = index.suggest(prefix, *SAN_FRANCISCO, limit=5)
+            assert [suggestion['score'] for suggestion in suggestions] == full_ranking(index, prefix, cell, 5)
+        restaurant = dict(rng.choice(restaurants))
+        if step % 3 == 0:
+            index.remove_restaurant(restaurant['id'])
+        else:
+            restaurant['specials'] = [dict(special, title="Taco Tuesday") for special in restaurant['specials'][:1]]
+            index.upsert_restaurant(restaurant)
+    assert set(prefixes) <= set(index._prefix_rankings)
+
+
+def test_recorded_queries_reorder_cached_wide_prefixes(monkeypatch):
+    monkeypatch.setattr(autocomplete, 'DIRECT_RANK_KEYS', 1)
+    restaurants = [{"id": f"r{i}", "name": name, "location": {"latitude": 37.77, "longitude": -122.42}}
+                   for i, name in enumerate(["Taqueria Uno", "Taqueria Dos", "Tavern Tres"])]
+    index = AutocompleteIndex.build(restaurants)
+    before = [suggestion['text'] for suggestion in index.suggest("ta", limit=3)]
+
+    for _ in range(50):
+        index.record_query(before[-1])
+
+    assert [suggestion['text'] for suggestion in index.suggest("ta", limit=3)][0] == before[-1]
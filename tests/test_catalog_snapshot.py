@@ -0,0 +1,66 @@
+"""Shared catalog snapshot (see backend/catalog_snapshot.py)."""
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import catalog_snapshot
+from catalog_snapshot import CatalogSnapshot, published_this_run, write_snapshot
+
+
+def test_previous_version_stays_on_disk(tmp_path):
+    for name in ("a", "b", "c"):
+        write_snapshot([{"id": name}], tmp_path)
+
+    assert sorted(path.name for path in tmp_path.glob("catalog-*.bin")) == ["catalog-2.bin", "catalog-3.bin"]
+
+
+def test_failed_load_is_retried(tmp_path):
+    reader = CatalogSnapshot(tmp_path)
+    write_snapshot([{"id": "a"}], tmp_path)
+    assert reader.refresh() and reader.version == 1
+
+    write_snapshot([{"id": "b"}], tmp_path)
+    published = tmp_path / "catalog-2.bin"
+    data = published.read_bytes()
+    published.unlink()
+    assert reader.refresh() and reader.version == 1
+
+    published.write_bytes(data)
+    assert reader.refresh() and reader.version == 2
+
+
+def test_snapshot_of_an_earlier_run_is_not_reused(tmp_path, monkeypatch):
+    write_snapshot([{"id": "a"}], tmp_path)
+    assert published_this_run(tmp_path)
+
+    # A master that started after the snapshot was written
+    monkeypatch.setenv(catalog_snapshot.FRESH_SINCE_ENV, str(time.time() + 1))
+    assert not published_this_run(tmp_path)
+    monkeypatch.delenv(catalog_snapshot.FRESH_SINCE_ENV)
+    monkeypatch.setattr(catalog_snapshot, 'PROCESS_STARTED', os.stat(tmp_path / "catalog.current").st_mtime + 1)
+    assert not published_this_run(tmp_path)
+
+
+def test_workers_starting_together_seed_the_mock_data_once(server, monkeypatch):
+    restaurants = server.db.restaurants
+    count_documents = restaurants.count_documents
+
+    async def slow_count(*args, **kwargs):
+        # Both workers would see an empty collection if neither waited for the other
+        count = await count_documents(*args, **kwargs)
+        await asyncio.sleep(0.05)
+        return count
+
+    monkeypatch.setattr(server, 'db', SimpleNamespace(restaurants=SimpleNamespace(
+        count_documents=slow_count, insert_many=restaurants.insert_many, find=restaurants.find)))
+
+    async def start_two_workers():
+        seeded = await asyncio.gather(server.init_mock_data(), server.init_mock_data())
+        return seeded, await server.db.restaurants.count_documents({})
+
+    seeded, count = asyncio.run(start_two_workers())
+
+    assert sorted(seeded) == [False, True]
+    assert count == len({restaurant['name'] for restaurant in asyncio.run(
+        server.db.restaurants.find({}, {"_id": 0, "name": 1}).to_list(None))})
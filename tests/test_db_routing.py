@@ -0,0 +1,75 @@
+"""MongoDB clients per route class (see backend/db_routing.py)."""
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from db_routing import PRIMARY, PUBLIC, route_class_options
+
+ROUTING_ENV = ['MONGO_PUBLIC_READ_PREFERENCE', 'MONGO_MAX_STALENESS_SECONDS',
+               'MONGO_PUBLIC_MAX_POOL_SIZE', 'MONGO_PRIMARY_MAX_POOL_SIZE', 'MONGO_PRIMARY_SOCKET_TIMEOUT_MS']
+
+
+@pytest.fixture(autouse=True)
+def clean_routing_env(monkeypatch):
+    for name in ROUTING_ENV:
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_public_reads_default_to_secondaries_with_bounded_staleness():
+    options = route_class_options(PUBLIC)
+    assert options['readPreference'] == 'secondaryPreferred'
+    assert options['maxStalenessSeconds'] == 90
+    assert options['maxPoolSize'] == 200
+    assert route_class_options(PRIMARY) == {}
+
+
+def test_pool_settings_come_from_the_class_environment(monkeypatch):
+    monkeypatch.setenv('MONGO_PRIMARY_MAX_POOL_SIZE', '50')
+    monkeypatch.setenv('MONGO_PRIMARY_SOCKET_TIMEOUT_MS', '2500')
+    monkeypatch.setenv('MONGO_PUBLIC_MAX_POOL_SIZE', '300')
+
+    assert route_class_options(PRIMARY) == {'maxPoolSize': 50, 'socketTimeoutMS': 2500}
+    assert route_class_options(PUBLIC)['maxPoolSize'] == 300
+
+
+def test_staleness_below_the_mongodb_minimum_is_raised(monkeypatch):
+    monkeypatch.setenv('MONGO_MAX_STALENESS_SECONDS', '30')
+    assert route_class_options(PUBLIC)['maxStalenessSeconds'] == 90
+    monkeypatch.setenv('MONGO_MAX_STALENESS_SECONDS', '120')
+    assert route_class_options(PUBLIC)['maxStalenessSeconds'] == 120
+
+
+def test_primary_read_preference_drops_the_staleness_bound(monkeypatch):
+    monkeypatch.setenv('MONGO_PUBLIC_READ_PREFERENCE', 'primary')
+    monkeypatch.setenv('MONGO_MAX_STALENESS_SECONDS', '120')
+
+    options = route_class_options(PUBLIC)
+
+    assert options['readPreference'] == 'primary'
+    assert 'maxStalenessSeconds' not in options
+
+
+def test_restaurant_details_read_from_the_public_client(client, server, monkeypatch):
+    replica = AsyncMongoMockClient()['replica']
+    asyncio.run(replica.restaurants.insert_one({"id": "on-replica", "name": "Replica Diner", "specials": []}))
+    monkeypatch.setattr(server, 'read_db', replica)
+
+    response = client.get('/api/restaurants/on-replica')
+
+    assert response.status_code == 200
+    assert response.json()['name'] == "Replica Diner"
+
+
+def test_owner_portal_reads_from_the_primary(client, server, owner, monkeypatch):
+    asyncio.run(server.db.restaurant_claims.insert_one(
+        {"id": "claim-1", "owner_id": owner.profile['id'], "google_place_id": "place1", "business_name": "Place 1",
+         "status": "approved", "created_at": "2026-01-01T00:00:00+00:00"}))
+    asyncio.run(server.db.restaurants.insert_one({"id": "restaurant-1", "google_place_id": "place1",
+                                                  "name": "Place 1", "specials": []}))
+    # A replica that has not caught up with the owner's writes yet
+    monkeypatch.setattr(server, 'read_db', AsyncMongoMockClient()['replica'])
+
+    response = client.get('/api/owner/my-restaurants', headers=owner.headers)
+
+    assert [restaurant['id'] for restaurant in response.json()['restaurants']] == ["restaurant-1"]
@@ -0,0 +1,50 @@
+"""Precomputed favorites feed (see backend/favorites_feed.py)."""
+import asyncio
+
+import pytest
+
+from tests.conftest import google_place
+
+
+@pytest.fixture
+def user_headers(client):
+    response = client.post('/api/users/register', json={
+        "email": "diner@example.com", "password": "secret123", "first_name": "Dee", "last_name": "Diner"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_unknown_favorite_is_resolved_once(client, server, user_headers, query_budget):
+    client.post('/api/users/favorites/google_place7', headers=user_headers)
+
+    # User lookup and one feed read; the unavailable entry is not resolved again
+    with query_budget(mongo=2, outbound=0):
+        response = client.get('/api/users/favorites', headers=user_headers)
+    assert [favorite['available'] for favorite in response.json()['favorites']] == [False]
+
+    asyncio.run(server.favorites_feed.resolve_places(server.db, [google_place('place7', 'Place 7')]))
+
+    favorites = client.get('/api/users/favorites', headers=user_headers).json()['favorites']
+    assert [(favorite['name'], favorite['available']) for favorite in favorites] == [('Place 7', True)]
+
+
+def test_favorites_predating_the_feed_are_backfilled_in_one_write(client, server, user_headers, query_budget):
+    stored = [f"restaurant-{i}" for i in range(4)]
+    asyncio.run(server.db.restaurants.insert_many(
+        [{"id": restaurant_id, "name": restaurant_id, "specials": []} for restaurant_id in stored]
+        + [{"id": "claimed-record", "google_place_id": "claimed", "name": "Claimed", "specials": []}]))
+    asyncio.run(server.db.places.insert_one(google_place('place9', 'Place 9')))
+    favorite_ids = stored + ["google_claimed", "google_place9", "google_unknown"]
+    asyncio.run(server.db.users.update_one(
+        {"email": "diner@example.com"}, {"$set": {"favorite_restaurant_ids": favorite_ids}}))
+
+    # User lookup, feed read, one restaurants and one places query, one feed write
+    with query_budget(mongo=5, outbound=0):
+        response = client.get('/api/users/favorites', headers=user_headers)
+
+    favorites = response.json()['favorites']
+    assert [(favorite['id'], favorite['name'], favorite['available']) for favorite in favorites] == [
+        *[(restaurant_id, restaurant_id, True) for restaurant_id in stored],
+        ("google_claimed", "Claimed", True), ("google_place9", "Place 9", True), ("google_unknown", "", False)]
+    with query_budget(mongo=2, outbound=0):
+        assert client.get('/api/users/favorites', headers=user_headers).json()['favorites'] == favorites
+
@@ -0,0 +1,24 @@
+"""Offline gazetteer (see backend/gazetteer.py)."""
+import pytest
+
+from gazetteer import Gazetteer
+
+
+@pytest.fixture(scope='module')
+def gazetteer():
+    return Gazetteer.load()
+
+
+@pytest.mark.parametrize("query", ["Chinatown", "Union Square", "Mission District", "chinat"])
+def test_bare_neighborhood_names_go_to_google(gazetteer, query):
+    assert gazetteer.geocode(query) is None
+
+
+@pytest.mark.parametrize("query, name", [
+    ("Mission District, SF", "Mission District"),
+    ("Chinatown, San Francisco", "Chinatown"),
+    ("Union Square San Francisco CA", "Union Square"),
+    ("San Francisco", "San Francisco"),
+])
+def test_qualified_neighborhoods_and_cities_resolve_offline(gazetteer, query, name):
+    assert gazetteer.geocode(query)['formatted_address'].startswith(name)
@@ -0,0 +1,11 @@
+"""Geocoding endpoints."""
+
+
+def test_batch_geocoding_requires_a_signed_in_user(client, owner):
+    body = {"addresses": ["San Francisco, CA"]}
+
+    assert client.post('/api/geocode/batch', json=body).status_code in (401, 403)
+
+    response = client.post('/api/geocode/batch', json=body, headers=owner.headers)
+    assert response.status_code == 200
+    assert len(response.json()['results']) == 1
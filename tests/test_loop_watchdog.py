@@ -0,0 +1,73 @@
+"""Strict event-loop blocking detection (see backend/loop_watchdog.py)."""
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+from prometheus_client import REGISTRY
+
+from loop_watchdog import take_blocks
+
+TESTS_DIR = Path(__file__).resolve().parent
+
+BLOCKING_TEST = """
+import time
+
+def test_blocking_handler(client, server):
+    @server.app.get('/api/test/blocking')
+    async def blocking_handler():
+        time.sleep(0.3)
+        return {}
+
+    assert client.get('/api/test/blocking').status_code == 200
+"""
+
+
+@pytest.fixture
+def blocking_route(server):
+    """A handler that sleeps on the event loop, removed again after the test"""
+    async def blocking_handler():
+        time.sleep(0.3)
+        return {}
+
+    routes_before = list(server.app.router.routes)
+    server.app.add_api_route('/api/test/blocking', blocking_handler)
+    yield '/api/test/blocking'
+    server.app.router.routes[:] = routes_before
+
+
+def test_blocking_handler_is_captured(client, blocking_route):
+    assert client.get(blocking_route).status_code == 200
+
+    blocks = take_blocks()
+    assert len(blocks) == 1
+    assert 'blocking_handler' in blocks[0].stack
+    assert 'time.sleep(0.3)' in blocks[0].stack
+
+
+def test_heartbeat_reports_the_stall_as_loop_lag(client, server, blocking_route):
+    lag_before = REGISTRY.get_sample_value('event_loop_lag_seconds_sum') or 0.0
+
+    assert client.get(blocking_route).status_code == 200
+    time.sleep(0.1)  # let the heartbeat that ends the stall run
+
+    take_blocks()
+    assert REGISTRY.get_sample_value('event_loop_lag_seconds_sum') - lag_before >= 0.25
+    # The only task sampling the loop's timing is the watchdog's heartbeat
+    tasks = client.portal.call(asyncio.all_tasks)
+    assert [task.get_coro().__qualname__ for task in tasks if 'heartbeat' in task.get_coro().__qualname__
+            or 'lag' in task.get_coro().__qualname__] == ['LoopWatchdog._heartbeat']
+
+
+def test_strict_mode_fails_a_test_with_a_blocking_handler(pytester):
+    pytester.makeconftest(f"""
+import sys
+sys.path.insert(0, {str(TESTS_DIR.parent)!r})
+from tests.conftest import *
+""")
+    pytester.makepyfile(test_blocking=BLOCKING_TEST)
+
+    result = pytester.runpytest_subprocess('-p', 'no:cacheprovider')
+
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*event loop blocked *ms in *", "*time.sleep(0.3)*"])
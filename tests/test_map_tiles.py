@@ -0,0 +1,39 @@
+"""Map clusters and tiles (see backend/map_clusters.py)."""
+import asyncio
+import random
+
+from loadtest.synthetic import synthetic_restaurant
+
+BAY_AREA = {"min_latitude": 37.6, "min_longitude": -122.6, "max_latitude": 37.95, "max_longitude": -122.2, "zoom": 10}
+
+
+def test_clusters_without_snapshot_load_the_catalog_once(client, server, monkeypatch, query_budget):
+    monkeypatch.setenv('CATALOG_SNAPSHOT', 'false')
+    rng = random.Random(3)
+    asyncio.run(server.db.restaurants.insert_many([synthetic_restaurant(rng) for _ in range(300)]))
+    server.map_tiles.clear()
+
+    # One catalog read for all tiles of the viewport
+    with query_budget(mongo=1, outbound=0):
+        response = client.get('/api/map/clusters', params={**BAY_AREA, "special_type": "happy_hour"})
+
+    assert response.status_code == 200
+    assert len(response.json()['tiles']) > 1
+    assert response.json()['clusters']
+
+
+def test_cluster_without_a_shown_special_has_no_best_deal(client, server, monkeypatch):
+    monkeypatch.setenv('CATALOG_SNAPSHOT', 'false')
+    restaurant = synthetic_restaurant(random.Random(3))
+    restaurant['location'] = {"latitude": 37.7749, "longitude": -122.4194}
+    restaurant['specials'] = [{**restaurant['specials'][0], "special_type": "happy_hour"}]
+    asyncio.run(server.db.restaurants.insert_one(restaurant))
+    server.map_tiles.clear()
+    # The compact catalog still counts the deal, but the restaurant no longer shows it
+    monkeypatch.setattr(server, 'shown_specials', lambda specials, special_type, now: [])
+
+    response = client.get('/api/map/clusters', params={**BAY_AREA, "special_type": "happy_hour"})
+
+    assert response.status_code == 200
+    assert response.json()['clusters']
+    assert all(cluster['best_deal'] is None for cluster in response.json()['clusters'])
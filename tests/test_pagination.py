@@ -0,0 +1,87 @@
+"""Keyset cursors (see backend/pagination.py)."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor
+from tests.conftest import SAN_FRANCISCO
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+@pytest.mark.parametrize("key", [("a", 1, True), (120.0, "place1"), (True, "place1", True), (120.0, 7, False)])
+def test_crafted_search_cursor_is_rejected(client, key):
+    response = client.get('/api/restaurants/search', params={**SAN_FRANCISCO, "cursor": encode_cursor(*key)})
+    assert response.status_code == 400
+
+
+def catalog_restaurant(index: int, meters: float, time_end: str = "23:59") -> dict:
+    """A stored restaurant north of the search center with a special running from midnight"""
+    return {
+        "id": f"catalog-{index}",
+        "name": f"Catalog {index}",
+        "location": {"latitude": SAN_FRANCISCO['latitude'] + meters / 111320, "longitude": SAN_FRANCISCO['longitude']},
+        "cuisine_type": ["Diner"],
+        "specials": [{"id": f"special-{index}", "title": "All Day Deal", "special_type": "daily_special",
+                      "price": 5.0, "original_price": 10.0, "days_available": list(DAYS),
+                      "time_start": "00:00", "time_end": time_end, "is_active": True}],
+    }
+
+
+def test_later_search_pages_reuse_the_google_results(client, server, google_places, monkeypatch, query_budget):
+    monkeypatch.setenv('CATALOG_SNAPSHOT', 'false')
+    # Three stored restaurants before the Google places (120 m away), four after them
+    asyncio.run(server.db.restaurants.insert_many(
+        [catalog_restaurant(i, 50) for i in range(3)] + [catalog_restaurant(i, 500) for i in range(3, 7)]))
+    params = {**SAN_FRANCISCO, "limit": 5}
+    first = client.get('/api/restaurants/search', params=params).json()
+    pages = [[restaurant['id'] for restaurant in first['restaurants']]]
+    cursors = [first['next_cursor']]
+
+    with query_budget(outbound=0):
+        while cursors[-1]:
+            page = client.get('/api/restaurants/search', params={**params, "cursor": cursors[-1]}).json()
+            pages.append([restaurant['id'] for restaurant in page['restaurants']])
+            cursors.append(page['next_cursor'])
+
+    seen = [restaurant_id for page in pages for restaurant_id in page]
+    assert len(pages) == 3
+    assert sorted(seen) == sorted([f"catalog-{i}" for i in range(7)] + [place['id'] for place in google_places[:5]])
+    # The second page showed the last Google place, so the third does not look for any
+    assert [decode_cursor(cursor, server.SEARCH_CURSOR)[2] for cursor in cursors[:2]] == [True, False]
+
+
+def test_scored_pages_are_evaluated_at_the_first_page_time(client, server, monkeypatch):
+    monkeypatch.setenv('CATALOG_SNAPSHOT', 'false')
+    clock = [datetime(2026, 10, 14, 20, 0)]
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock[0]
+
+    monkeypatch.setattr(server, 'datetime', Clock)
+    asyncio.run(server.db.restaurants.insert_many(
+        [catalog_restaurant(i, 50 * (i + 1), f"{20 + (i + 1) // 2}:{30 * ((i + 1) % 2):02d}") for i in range(5)]))
+    params = {**SAN_FRANCISCO, "sort": "ends_soon"}
+    expected = [restaurant['id'] for restaurant in
+                client.get('/api/restaurants/search', params={**params, "limit": 50}).json()['restaurants']]
+
+    pages, cursor = [], None
+    while True:
+        page = client.get('/api/restaurants/search', params={**params, "limit": 2, "cursor": cursor}).json()
+        pages += [restaurant['id'] for restaurant in page['restaurants']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+        # Urgency changes as time passes, and the first special ends
+        clock[0] += timedelta(minutes=20)
+
+    assert {f"catalog-{i}" for i in range(5)} <= set(expected)
+    assert pages == expected
+
+
+def test_next_cursor_header_is_exposed_to_browsers(client):
+    response = client.get('/api/status', headers={"Origin": "https://example.com"})
+    assert 'x-next-cursor' in response.headers['access-control-expose-headers'].lower()
@@ -0,0 +1,50 @@
+"""Slow-request capture (see backend/profiling.py)."""
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from profiling import ProfilingConfig, ProfilingMiddleware
+
+
+async def serve(app, config: ProfilingConfig, collection, path: str):
+    middleware = ProfilingMiddleware(app, config, collection)
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': [], 'query_string': b''}
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, None, send)
+    await asyncio.sleep(0)  # let the stored profile be written
+    return sent
+
+
+def test_unprofiled_slow_request_keeps_its_wall_time():
+    async def app(scope, receive, send):
+        await asyncio.sleep(0.03 if scope['path'] == '/slow' else 0)
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+
+    async def run():
+        collection = AsyncMongoMockClient()['profiling']['request_profiles']
+        config = ProfilingConfig(token=None, sample_rate=0, slow_ms=1000, interval=0.005,
+                                 retention_seconds=60, slow_request_ms=20)
+        await serve(app, config, collection, '/fast')
+        await serve(app, config, collection, '/slow')
+        return await collection.find({}, {'_id': 0}).to_list(None)
+
+    profiles = asyncio.run(run())
+
+    assert [(profile['trigger'], profile['path'], profile['status_code']) for profile in profiles] == [
+        ('slow', '/slow', 200)]
+    assert profiles[0]['duration_ms'] >= 20
+    assert 'samples' not in profiles[0]
+
+
+def test_middleware_is_not_installed_by_default(monkeypatch):
+    for name in ('PROFILE_TOKEN', 'PROFILE_SAMPLE_RATE', 'SLOW_REQUEST_MS'):
+        monkeypatch.delenv(name, raising=False)
+    assert not ProfilingConfig.from_env().installed
+
+    monkeypatch.setenv('SLOW_REQUEST_MS', '2000')
+    config = ProfilingConfig.from_env()
+    assert config.installed and not config.enabled
@@ -0,0 +1,80 @@
+"""Per-endpoint query budgets (see backend/query_budget.py)."""
+import asyncio
+
+import pytest
+
+from query_budget import QueryBudgetExceeded
+from tests.conftest import SAN_FRANCISCO
+
+
+def test_search_budget(client, google_places, query_budget):
+    # Coverage check, stored specials of the Google results, and the background catalog upsert,
+    # coverage insert and favorites lookup (counted when they finish before the budget is checked)
+    with query_budget(mongo=5, outbound=1):
+        response = client.get('/api/restaurants/search', params=SAN_FRANCISCO)
+    assert response.status_code == 200
+    assert response.headers['x-query-counts'].startswith('mongo=')
+
+
+def test_owner_search_reads_claims_in_one_query(client, server, owner, google_places, query_budget):
+    asyncio.run(server.db.restaurant_claims.insert_many([
+        {"id": "claim-1", "owner_id": "someone", "google_place_id": "place1", "status": "approved"},
+        {"id": "claim-2", "owner_id": "someone", "google_place_id": "place2", "status": "pending"},
+        {"id": "claim-3", "owner_id": "someone", "google_place_id": "place3", "status": "rejected"},
+    ]))
+
+    # One user lookup for the token, one claims query for all twelve results, and the background
+    # catalog upsert and favorites lookup (counted when they finish before the budget is checked)
+    with query_budget(mongo=4, outbound=1):
+        response = client.get('/api/owner/search-restaurants', params={"query": "place"}, headers=owner.headers)
+
+    assert response.status_code == 200
+    statuses = {restaurant['id']: restaurant['claim_status'] for restaurant in response.json()['restaurants']}
+    assert len(statuses) == 12
+    assert statuses['google_place1'] == 'approved'
+    assert statuses['google_place2'] == 'pending'
+    assert statuses['google_place3'] is None
+
+
+def test_my_restaurants_loads_a_page_in_one_query(client, server, owner, query_budget):
+    claims = [
+        {"id": f"claim-{i}", "owner_id": owner.profile['id'], "google_place_id": f"place{i}",
+         "business_name": f"Place {i}", "status": "approved", "created_at": f"2026-01-{i + 1:02d}T00:00:00+00:00"}
+        for i in range(8)
+    ]
+    asyncio.run(server.db.restaurant_claims.insert_many(claims))
+    asyncio.run(server.db.restaurants.insert_many([
+        {"id": f"restaurant-{i}", "google_place_id": f"place{i}", "name": f"Place {i}", "specials": []}
+        for i in range(8)
+    ]))
+
+    # User lookup, approved page, pending claims and one restaurants query for the page
+    with query_budget(mongo=4, outbound=0):
+        response = client.get('/api/owner/my-restaurants', headers=owner.headers)
+
+    assert response.status_code == 200
+    assert [restaurant['name'] for restaurant in response.json()['restaurants']] == [
+        f"Place {i}" for i in reversed(range(8))]
+
+
+def test_my_restaurants_creates_missing_records_in_one_write(client, server, owner, query_budget):
+    asyncio.run(server.db.restaurant_claims.insert_many([
+        {"id": f"claim-{i}", "owner_id": owner.profile['id'], "google_place_id": f"place{i}",
+         "business_name": f"Place {i}", "status": "approved", "created_at": f"2026-01-{i + 1:02d}T00:00:00+00:00"}
+        for i in range(8)
+    ]))
+
+    # The four reads above, one insert of the missing records and one favorites feed write
+    with query_budget(mongo=6, outbound=0):
+        response = client.get('/api/owner/my-restaurants', headers=owner.headers)
+
+    assert response.status_code == 200
+    assert asyncio.run(server.db.restaurants.count_documents({"google_place_id": {"$regex": "^place"}})) == 8
+    assert [suggestion['restaurant_id'] for suggestion in server.autocomplete_index.suggest("Place 3", limit=1)] == [
+        "google_place3"]
+
+
+def test_budget_overrun_fails(client, google_places, query_budget):
+    with pytest.raises(QueryBudgetExceeded, match="outbound calls"):
+        with query_budget(outbound=0):
+            client.get('/api/restaurants/search', params=SAN_FRANCISCO)
@@ -0,0 +1,32 @@
+"""Hedged outbound calls (see backend/resilience.py)."""
+import asyncio
+
+import httpx
+
+from resilience import ResilientClient
+
+
+def test_cancelled_hedge_loser_is_not_a_latency_sample(monkeypatch):
+    monkeypatch.setenv('TEST_SERVICE_HEDGING', 'true')
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        # The first attempt stalls until the hedge wins and cancels it
+        await asyncio.sleep(5 if len(calls) == 1 else 0)
+        return httpx.Response(200, json={})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            client = ResilientClient('test_service', http, 'TEST_SERVICE')
+            for _ in range(client.latency.min_samples):
+                client.latency.observe(0.01)
+            response = await client.request('GET', 'https://example.test/')
+            return client, response
+
+    client, response = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert len(client.latency.samples) == client.latency.min_samples + 1
+    assert max(client.latency.samples) < 1
@@ -0,0 +1,60 @@
+"""Search history storage (see backend/search_history.py)."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import search_history
+from search_history import SearchHistoryRecorder, ensure_indexes, migrate_embedded_history
+
+RECENTLY = datetime.now(timezone.utc) - timedelta(days=1)
+
+
+def test_flush_trims_every_user_over_the_cap_in_one_pass(server, monkeypatch):
+    monkeypatch.setenv('SEARCH_HISTORY_MAX_PER_USER', '3')
+    ticks = iter(range(100))
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return RECENTLY + timedelta(seconds=next(ticks))
+
+    # One search per second, so the newest entries are the last recorded
+    monkeypatch.setattr(search_history, 'datetime', Clock)
+    recorder = SearchHistoryRecorder(server.db)
+    for user_id, searches in (("heavy", 5), ("other-heavy", 4), ("light", 2)):
+        for number in range(searches):
+            recorder.record(user_id, {"query": f"{user_id} {number}"})
+
+    async def run():
+        await recorder.flush()
+        return await server.db.search_history.find({}, {"_id": 0, "user_id": 1, "query": 1}).to_list(None)
+
+    kept = asyncio.run(run())
+    by_user = {}
+    for entry in kept:
+        by_user.setdefault(entry['user_id'], set()).add(entry['query'])
+    assert by_user == {
+        "heavy": {"heavy 2", "heavy 3", "heavy 4"},
+        "other-heavy": {"other-heavy 1", "other-heavy 2", "other-heavy 3"},
+        "light": {"light 0", "light 1"},
+    }
+
+
+def test_migration_retried_after_a_partial_move_does_not_duplicate(server):
+    history = [{"query": f"search {number}", "created_at": (RECENTLY + timedelta(minutes=number)).isoformat()}
+               for number in range(3)]
+
+    async def run():
+        await ensure_indexes(server.db)
+        await server.db.users.insert_one({"id": "user-1", "search_history": history})
+        # An earlier worker inserted the entries but stopped before removing the array
+        await migrate_embedded_history(server.db)
+        await server.db.users.update_one({"id": "user-1"}, {"$set": {"search_history": history}})
+        moved = await migrate_embedded_history(server.db)
+        user = await server.db.users.find_one({"id": "user-1"}, {"_id": 0})
+        entries = await server.db.search_history.find({"user_id": "user-1"}).to_list(None)
+        return moved, user, entries
+
+    moved, user, entries = asyncio.run(run())
+    assert moved == 0
+    assert 'search_history' not in user
+    assert sorted(entry['query'] for entry in entries) == ["search 0", "search 1", "search 2"]
@@ -0,0 +1,54 @@
+"""Archiving of expired specials (see backend/special_expiry.py)."""
+import asyncio
+from datetime import date
+
+from special_expiry import SpecialExpirySweeper
+
+TODAY = date(2026, 10, 19)
+
+
+def special(special_id: str, end_date: str = None) -> dict:
+    return {"id": special_id, "title": special_id, "days_available": ["monday"], "end_date": end_date}
+
+
+def test_sweep_archives_then_pulls_only_expired_specials(server):
+    changed = []
+
+    async def on_change(restaurant_id, google_place_id):
+        changed.append(restaurant_id)
+
+    asyncio.run(server.db.restaurants.insert_one({"id": "restaurant-1", "specials": [
+        special("ended", "2026-10-18"), special("ends-today", "2026-10-19"), special("undated")]}))
+    sweeper = SpecialExpirySweeper(server.db, on_change)
+
+    async def sweep_twice():
+        return await sweeper.sweep(TODAY), await sweeper.sweep(TODAY)
+
+    assert asyncio.run(sweep_twice()) == (1, 0)
+    restaurant = asyncio.run(server.db.restaurants.find_one({"id": "restaurant-1"}))
+    archived = asyncio.run(server.db.archived_specials.find({}, {"_id": 0}).to_list(None))
+    assert [item['id'] for item in restaurant['specials']] == ["ends-today", "undated"]
+    assert [(item['restaurant_id'], item['id']) for item in archived] == [("restaurant-1", "ended")]
+    assert changed == ["restaurant-1"]
+
+
+def test_past_dated_special_written_during_a_sweep_is_not_pulled_unarchived(server, monkeypatch):
+    asyncio.run(server.db.restaurants.insert_one({"id": "restaurant-1", "specials": [special("ended", "2026-10-01")]}))
+
+    async def on_change(restaurant_id, google_place_id):
+        pass
+
+    sweeper = SpecialExpirySweeper(server.db, on_change)
+    archive = sweeper._archive
+
+    async def archive_after_a_write(restaurant, today):
+        # An owner adds a past-dated special between the sweep's read and its pull
+        await server.db.restaurants.update_one(
+            {"id": restaurant['id']}, {"$push": {"specials": special("late", "2026-10-02")}})
+        return await archive(restaurant, today)
+
+    monkeypatch.setattr(sweeper, '_archive', archive_after_a_write)
+    asyncio.run(sweeper.sweep(TODAY))
+
+    restaurant = asyncio.run(server.db.restaurants.find_one({"id": "restaurant-1"}))
+    assert [item['id'] for item in restaurant['specials']] == ["late"]
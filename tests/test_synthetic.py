@@ -0,0 +1,7 @@
+"""Synthetic catalog generation (see backend/loadtest/synthetic.py)."""
+from loadtest.synthetic import synthetic_catalog
+
+
+def test_a_seed_always_yields_the_same_catalog():
+    assert list(synthetic_catalog(20, seed=5)) == list(synthetic_catalog(20, seed=5))
+    assert list(synthetic_catalog(20, seed=5)) != list(synthetic_catalog(20, seed=6))
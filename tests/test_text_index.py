@@ -0,0 +1,22 @@
+"""Restaurant text search (see backend/text_index.py)."""
+import text_index
+from text_index import TextIndex
+
+
+def test_stopword_only_query_matches():
+    index = TextIndex.build([{"name": "The Grill"}, {"name": "Grill House"}])
+
+    assert set(index.search("the")) == {0}
+    assert set(index.search("the grill")) == {0, 1}
+
+
+def test_wide_prefix_keeps_the_most_common_terms(monkeypatch):
+    monkeypatch.setattr(text_index, 'MAX_PREFIX_EXPANSION', 3)
+    restaurants = [{"name": f"Tavern{suffix}"} for suffix in "abcde"]
+    restaurants += [{"name": "Tavernz Grill"}] * 4 + [{"name": "Taverny Grill"}] * 2
+
+    positions = set(TextIndex.build(restaurants).search("tav"))
+
+    # Tavernz and Taverny beat the alphabetically first single-document terms
+    assert set(range(5, 11)) <= positions
+    assert len(positions) == 7
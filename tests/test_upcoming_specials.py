@@ -0,0 +1,30 @@
+"""Upcoming specials (see backend/schedule_index.py)."""
+import asyncio
+from datetime import datetime
+
+from tests.conftest import SAN_FRANCISCO
+from tests.test_pagination import catalog_restaurant
+
+WEDNESDAY_NIGHT = datetime(2026, 10, 21, 23, 10)
+
+
+def test_special_starting_tomorrow_is_listed_with_tomorrows_window(client, server, monkeypatch):
+    monkeypatch.setenv('CATALOG_SNAPSHOT', 'false')
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return WEDNESDAY_NIGHT
+
+    monkeypatch.setattr(server, 'datetime', Clock)
+    restaurant = catalog_restaurant(0, 50)
+    # Running now, but only in season from tomorrow
+    restaurant['specials'][0].update(time_start="23:00", time_end="23:30", start_date="2026-10-22")
+    asyncio.run(server.db.restaurants.insert_one(restaurant))
+
+    response = client.get('/api/specials/upcoming', params={**SAN_FRANCISCO, "within_hours": 24})
+
+    assert response.status_code == 200
+    listed = [special for special in response.json()['specials'] if special['restaurant']['id'] == 'catalog-0']
+    assert [(special['starts_at'], special['in_progress']) for special in listed] == [
+        ("2026-10-22T23:00:00", False)]